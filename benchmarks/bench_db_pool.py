@@ -0,0 +1,171 @@
+import os
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import threading
+
+from digitex.core.database.ingestion import QuestionIngestor
+from digitex.core.database.pool import ConnectionPool, TestsRepository
+from digitex.core.database.sampling import QuestionSampler
+
+
+# Create a parser
+parser = argparse.ArgumentParser(description="Benchmark tests.db read pool.")
+
+parser.add_argument(
+    "--schema_path",
+    default=os.path.join("src", "digitex", "extraction", "script.sql"),
+    type=str,
+    help="SQL script with tests.db schema.",
+)
+
+parser.add_argument(
+    "--num_questions", default=20000, type=int, help="Questions in synthetic db."
+)
+
+parser.add_argument(
+    "--threads", default="1,2,4,8", type=str, help="Comma separated reader counts."
+)
+
+parser.add_argument(
+    "--duration", default=3.0, type=float, help="Seconds to run every setup."
+)
+
+args = parser.parse_args()
+
+SUBJECTS = ["Биология", "Химия", "Физика"]
+YEARS = [2019, 2020, 2021, 2022]
+
+
+def create_db(db_path: str) -> None:
+    with open(args.schema_path, "r", encoding="utf-8") as schema_file:
+        conn = sqlite3.connect(db_path)
+        conn.executescript(schema_file.read())
+        conn.close()
+
+    def records():
+        rng = random.Random(0)
+        for i in range(args.num_questions):
+            part = rng.choice("AB")
+            options = [
+                {"text": f"вариант {j}", "is_correct": j == 0} for j in range(5)
+            ]
+            yield {
+                "subject": rng.choice(SUBJECTS),
+                "year": rng.choice(YEARS),
+                "type": rng.randint(1, 2),
+                "option": rng.randint(1, 10),
+                "part": part,
+                "number": i,
+                "text": f"Вопрос {i} " + "текст " * rng.randint(10, 40),
+                "options": options if part == "A" else [],
+                "answers": [] if part == "A" else [f"ответ {i}"],
+            }
+
+    QuestionIngestor(db_path).ingest(records())
+
+
+def run_reads(read_func, num_threads: int, max_id: int) -> float:
+    stop_time = time.perf_counter() + args.duration
+    counts = [0] * num_threads
+
+    def worker(i: int) -> None:
+        rng = random.Random(i)
+        while time.perf_counter() < stop_time:
+            read_func(rng, max_id)
+            counts[i] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return sum(counts) / args.duration
+
+
+def run_writer(pool: ConnectionPool, stop_event: threading.Event, max_id: int) -> None:
+    # Ingestion-like load: small write transactions while readers work
+    rng = random.Random(100)
+    while not stop_event.is_set():
+        with pool.writer() as conn:
+            for _ in range(50):
+                conn.execute(
+                    "UPDATE questions SET specification = ? WHERE question_id = ?",
+                    (str(rng.random()), rng.randint(1, max_id)),
+                )
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "tests.db")
+        create_db(db_path)
+        max_id = args.num_questions
+
+        # Baseline: one shared connection behind a lock
+        shared_conn = sqlite3.connect(db_path, check_same_thread=False)
+        shared_lock = threading.Lock()
+
+        def shared_read(rng: random.Random, max_id: int) -> None:
+            question_id = rng.randint(1, max_id)
+            with shared_lock:
+                shared_conn.execute(
+                    TestsRepository.QUESTION_BY_ID, (question_id,)
+                ).fetchone()
+                shared_conn.execute(
+                    TestsRepository.OPTIONS_BY_QUESTION, (question_id,)
+                ).fetchall()
+                shared_conn.execute(
+                    TestsRepository.ANSWERS_BY_QUESTION, (question_id,)
+                ).fetchall()
+                shared_conn.execute(
+                    TestsRepository.IMAGES_BY_QUESTION, (question_id,)
+                ).fetchall()
+
+        for num_threads_str in args.threads.split(","):
+            num_threads = int(num_threads_str)
+
+            with ConnectionPool(db_path, num_readers=num_threads) as pool:
+                repository = TestsRepository(pool)
+
+                def pool_read(rng: random.Random, max_id: int) -> None:
+                    repository.get_question_bundle(rng.randint(1, max_id))
+
+                stop_event = threading.Event()
+                writer = threading.Thread(
+                    target=run_writer, args=(pool, stop_event, max_id)
+                )
+                writer.start()
+                shared_qps = run_reads(shared_read, num_threads, max_id)
+                pool_qps = run_reads(pool_read, num_threads, max_id)
+                test_qps = run_reads(
+                    lambda rng, _: repository.get_random_test(
+                        rng.choice(SUBJECTS), rng.choice(YEARS), "A", 20, rng
+                    ),
+                    num_threads,
+                    max_id,
+                )
+                with QuestionSampler(pool, num_variants=64) as sampler:
+                    sampler_qps = run_reads(
+                        lambda rng, _: sampler.get_test(
+                            rng.choice(SUBJECTS), rng.choice(YEARS), "A", 20
+                        ),
+                        num_threads,
+                        max_id,
+                    )
+                stop_event.set()
+                writer.join()
+
+            print(
+                f"threads={num_threads:2d}  shared: {shared_qps:9.0f} reads/s  "
+                f"pool: {pool_qps:9.0f} reads/s  random test: {test_qps:7.0f} tests/s  "
+                f"ready variants: {sampler_qps:7.0f} tests/s"
+            )
+
+        shared_conn.close()
+
+
+if __name__ == "__main__":
+    main()
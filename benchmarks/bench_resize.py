@@ -0,0 +1,90 @@
+import argparse
+import time
+
+import numpy as np
+import cv2
+
+from digitex.core.processors.img import ImgProcessor, ImgResizer
+
+
+# Create a parser
+parser = argparse.ArgumentParser(description="Benchmark resize modes.")
+
+parser.add_argument(
+    "--image_path", default=None, type=str, help="Page image, synthetic if omitted."
+)
+
+parser.add_argument(
+    "--repeats", default=20, type=int, help="How many times to repeat each resize."
+)
+
+args = parser.parse_args()
+
+# Target sizes: fit to MAX_WIDTH/MAX_HEIGHT, display and thumbnail
+TARGET_SIZES = [(1525, 2048), (760, 1020), (380, 510), (190, 255)]
+MODES = ["quality", "auto", "fast"]
+
+
+def create_page_img(width: int = 3175, height: int = 4490) -> np.ndarray:
+    # White page with lines of text-like strokes
+    img = np.full((height, width, 3), 255, dtype=np.uint8)
+    rng = np.random.default_rng(0)
+    for y in range(120, height - 120, 60):
+        words = "".join(chr(rng.integers(65, 91)) for _ in range(60))
+        cv2.putText(img, words, (100, y), cv2.FONT_HERSHEY_SIMPLEX, 1.4, (0, 0, 0), 2)
+
+    return img
+
+
+def ssim(img_a: np.ndarray, img_b: np.ndarray) -> float:
+    a = cv2.cvtColor(img_a, cv2.COLOR_BGR2GRAY).astype(np.float64)
+    b = cv2.cvtColor(img_b, cv2.COLOR_BGR2GRAY).astype(np.float64)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+
+    def blur(x: np.ndarray) -> np.ndarray:
+        return cv2.GaussianBlur(x, (11, 11), 1.5)
+
+    mu_a, mu_b = blur(a), blur(b)
+    var_a = blur(a * a) - mu_a**2
+    var_b = blur(b * b) - mu_b**2
+    cov = blur(a * b) - mu_a * mu_b
+    ssim_map = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / (
+        (mu_a**2 + mu_b**2 + c1) * (var_a + var_b + c2)
+    )
+
+    return float(ssim_map.mean())
+
+
+def time_resize(img: np.ndarray, size: tuple[int, int], mode: str) -> float:
+    start = time.perf_counter()
+    for _ in range(args.repeats):
+        ImgProcessor.resize_img(img, *size, mode=mode)
+
+    return (time.perf_counter() - start) / args.repeats * 1000
+
+
+def main() -> None:
+    img = cv2.imread(args.image_path) if args.image_path else create_page_img()
+    print(f"Source image {img.shape[1]}x{img.shape[0]}")
+    print(f"{'target':>10} {'mode':>8} {'ms':>8} {'ssim':>7}")
+
+    for size in TARGET_SIZES:
+        reference = ImgProcessor.resize_img(img, *size, mode="quality")
+        for mode in MODES:
+            ms = time_resize(img, size, mode)
+            resized = ImgProcessor.resize_img(img, *size, mode=mode)
+            score = ssim(reference, resized)
+            print(f"{size[0]:>4}x{size[1]:<5} {mode:>8} {ms:>8.2f} {score:>7.4f}")
+
+    # Repeated zoom levels through the memoizing resizer
+    resizer = ImgResizer()
+    start = time.perf_counter()
+    for _ in range(args.repeats):
+        for size in TARGET_SIZES:
+            resizer.resize(img, *size)
+    ms = (time.perf_counter() - start) / args.repeats * 1000
+    print(f"ImgResizer, {len(TARGET_SIZES)} zoom levels: {ms:.2f} ms per round")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,13 @@
 import os
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
 from urllib.parse import quote, unquote
 from PIL import Image
-import numpy as np
 from .processors.img import ImgProcessor, ImgCropper
-from .processors.file import FileProcessor
+from .processors.file import FileProcessor, JsonStreamWriter
+from .handlers.index import ConversionIndex
 
 
 class AnnsConverter:
@@ -77,22 +81,19 @@ class OCRBBOXAnnsConverter(OCRAnnsConverter):
         )
         return bbox_entry
 
-    def convert(self, input_json_path: str, output_dir: str) -> list[dict]:
-        input_json_dicts = FileProcessor.read_json(input_json_path)
-        output_json_dicts = []
+    def convert(self, input_json_path: str, output_dir: str) -> int:
+        output_json_path = os.path.join(output_dir, self.output_json_name)
 
-        for task in input_json_dicts:
-            anns_dict = {
-                "data": task["data"],
-                "predictions": self.extract_bbox_predictions(task),
-            }
-            output_json_dicts.append(anns_dict)
+        # Stream tasks, export is too big to load at once
+        with JsonStreamWriter(output_json_path) as writer:
+            for task in FileProcessor.iter_json_array(input_json_path):
+                anns_dict = {
+                    "data": task["data"],
+                    "predictions": self.extract_bbox_predictions(task),
+                }
+                writer.write(anns_dict)
 
-        output_json_path = os.path.join(output_dir, self.output_json_name)
-        FileProcessor.write_json(
-            json_dicts=output_json_dicts, json_path=output_json_path
-        )
-        return output_json_dicts
+        return writer.num_items
 
 
 class OCRCaptionConverter(OCRAnnsConverter):
@@ -101,6 +102,7 @@ class OCRCaptionConverter(OCRAnnsConverter):
 
         self.convertation_name = "conv_ocr_to_caption"
         self.output_json_name = "converted_data.json"
+        self.index_name = ".converted_data.index.sqlite"
 
     def _get_abs_box(self, entry: dict) -> tuple[int, int, int, int]:
         rel_box = {k: v for k, v in entry["value"].items() if k in self.bbox_keys}
@@ -111,31 +113,42 @@ class OCRCaptionConverter(OCRAnnsConverter):
 
         return x, y, width, height
 
-    def _crop_image(
-        self, image: Image.Image, box: tuple[int, int, int, int], angle: int
-    ) -> np.ndarray:
+    def _crop_images(
+        self,
+        image: Image.Image,
+        boxes: list[tuple[int, int, int, int]],
+        angles: list[int],
+    ) -> list[Image.Image]:
+        # Convert image once and crop all boxes from the same array
         img = self.img_processor.image2img(image)
-        cropped_img = self.img_cropper.crop_img_by_box(img, box, angle)
-        cropped_image = self.img_processor.img2image(cropped_img)
+        cropped_imgs = self.img_cropper.crop_img_by_boxes(img, boxes, angles)
+        cropped_images = [
+            self.img_processor.img2image(cropped_img) for cropped_img in cropped_imgs
+        ]
 
-        return cropped_image
+        return cropped_images
 
     def _get_exist_image_filenames(self, caption_json_path: str) -> set[str]:
-        caption_json_dicts = FileProcessor.read_json(caption_json_path)
         exist_image_filenames = set()
-        for task in caption_json_dicts:
+        for task in FileProcessor.iter_json_array(caption_json_path):
             image_filename = self.get_filename(task["data"]["captioning"])
             image_filename = self.remove_last_filename_index(image_filename)
             image_filename = self.remove_prefixes(image_filename)
             exist_image_filenames.add(image_filename)
         return exist_image_filenames
 
-    def _image_is_exist(
-        self, image_filename: str, exist_image_filenames: set[str]
-    ) -> bool:
+    def _update_exist_image_filenames(
+        self, index: ConversionIndex, caption_json_path: str
+    ) -> None:
+        # Caption export is read again only if it was changed since last run
+        if index.export_is_changed(caption_json_path):
+            exist_image_filenames = self._get_exist_image_filenames(caption_json_path)
+            index.update_export(caption_json_path, exist_image_filenames)
+
+    def _image_is_exist(self, image_filename: str, index: ConversionIndex) -> bool:
         image_filename = self.remove_prefixes(image_filename)
 
-        if image_filename in exist_image_filenames:
+        if index.is_exist(image_filename):
             return True
         return False
 
@@ -168,54 +181,188 @@ class OCRCaptionConverter(OCRAnnsConverter):
         )
         return predictions
 
-    def convert(
+    def _convert_task(self, ocr_images_dir: str, task: dict) -> list[dict]:
+        input_image_filename = self.get_filename(task["data"]["ocr"])
+        entries = [
+            entry
+            for entry in task["annotations"][0]["result"]
+            if entry["type"] == "textarea"
+        ]
+        boxes = [self._get_abs_box(entry) for entry in entries]
+        angles = [entry["value"]["rotation"] for entry in entries]
+
+        # Open image and crop all entries of the task
+        input_image_path = self.create_local_path(ocr_images_dir, input_image_filename)
+        with Image.open(input_image_path) as input_image:
+            cropped_images = self._crop_images(input_image, boxes, angles)
+
+        anns_dicts = []
+        for i, (entry, cropped_image) in enumerate(zip(entries, cropped_images)):
+            # Save image
+            output_image_path = self.create_output_path(input_image_filename, i)
+            cropped_image.save(output_image_path)
+
+            # Add task to output json dict
+            task_image_path = self.create_task_path(output_image_path)
+            anns_dict = {
+                "data": {"captioning": task_image_path},
+                "predictions": self._get_caption_preds(entry),
+            }
+            anns_dicts.append(anns_dict)
+
+        return anns_dicts
+
+    def _get_source_filename(self, anns_dict: dict) -> str:
+        output_filename = self.get_filename(anns_dict["data"]["captioning"])
+        return self.remove_last_filename_index(output_filename)
+
+    def _iter_new_tasks(
         self,
         ocr_images_dir: str,
         ocr_json_path: str,
-        caption_json_path: str,
-        output_dir: str,
-    ) -> None:
-        exist_image_filenames = self._get_exist_image_filenames(caption_json_path)
-
-        output_json_dicts = []
-        ocr_json_dicts = FileProcessor.read_json(ocr_json_path)
-        for task in ocr_json_dicts:
+        index: ConversionIndex,
+        seen_filenames: set[str],
+    ) -> Iterator[tuple[dict, str, str]]:
+        for task in FileProcessor.iter_json_array(ocr_json_path):
             input_image_filename = self.get_filename(task["data"]["ocr"])
+            seen_filenames.add(input_image_filename)
 
             # Check if the image is already exist in the caption project
-            if self._image_is_exist(input_image_filename, exist_image_filenames):
+            if self._image_is_exist(input_image_filename, index):
                 continue
 
-            # Open image
+            # Skip task converted by previous run if task and image are same
             input_image_path = self.create_local_path(
                 ocr_images_dir, input_image_filename
             )
-            input_image = Image.open(input_image_path)
-
-            # Iterate through each entry in the task and crop the image
-            i = 0
-            for entry in task["annotations"][0]["result"]:
-                if entry["type"] == "textarea":
-                    box = self._get_abs_box(entry)
-                    cropped_image = self._crop_image(
-                        input_image, box, entry["value"]["rotation"]
-                    )
-
-                    # Save image
-                    output_image_path = self.create_output_path(input_image_filename, i)
-                    cropped_image.save(output_image_path)
-
-                    # Add task to output json dict
-                    task_image_path = self.create_task_path(output_image_path)
-                    anns_dict = {
-                        "data": {"captioning": task_image_path},
-                        "predictions": self._get_caption_preds(entry),
-                    }
-                    output_json_dicts.append(anns_dict)
-
-                    i += 1
+            task_hash = index.get_hash(
+                {"data": task["data"], "result": task["annotations"][0]["result"]},
+                input_image_path,
+            )
+            if index.is_converted(input_image_filename, task_hash):
+                continue
+
+            yield task, input_image_filename, task_hash
+
+    def _iter_converted_tasks(
+        self,
+        ocr_images_dir: str,
+        tasks: Iterator[tuple[dict, str, str]],
+        workers: int,
+    ) -> Iterator[tuple[str, str, list[dict]]]:
+        if workers == 1:
+            for task, filename, task_hash in tasks:
+                yield filename, task_hash, self._convert_task(ocr_images_dir, task)
+            return
+
+        mp_context = mp.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+            # Bounded window of pending tasks, results are taken in input order
+            futures = deque()
+            for task, filename, task_hash in tasks:
+                future = pool.submit(self._convert_task, ocr_images_dir, task)
+                futures.append((filename, task_hash, future))
+                if len(futures) >= workers * 4:
+                    filename, task_hash, future = futures.popleft()
+                    yield filename, task_hash, future.result()
+
+            while futures:
+                filename, task_hash, future = futures.popleft()
+                yield filename, task_hash, future.result()
+
+    def convert(
+        self,
+        ocr_images_dir: str,
+        ocr_json_path: str,
+        caption_json_path: str,
+        output_dir: str,
+        workers: int = 1,
+        incremental: bool = True,
+    ) -> int:
+        """Crop words of new or changed OCR tasks into caption tasks.
+
+        In incremental mode only tasks missing in the index are converted
+        and appended to the previous output. Old entries of changed and
+        removed tasks are dropped from the output and their surplus crops
+        are deleted. Returns number of caption tasks written by this run.
+        """
+        if workers < 1:
+            raise ValueError("workers must be positive.")
 
         output_json_path = os.path.join(output_dir, self.output_json_name)
-        FileProcessor.write_json(
-            json_dict=output_json_dicts, json_path=output_json_path
-        )
+        index = ConversionIndex(os.path.join(output_dir, self.index_name))
+
+        try:
+            # New entries are appended only to output described by the index
+            old_num_outputs = index.get_num_outputs()
+            append = (
+                incremental
+                and bool(old_num_outputs)
+                and os.path.exists(output_json_path)
+            )
+            if not append:
+                index.clear()
+            self._update_exist_image_filenames(index, caption_json_path)
+
+            seen_filenames = set()
+            new_num_outputs = {}
+            tasks = self._iter_new_tasks(
+                ocr_images_dir, ocr_json_path, index, seen_filenames
+            )
+            with JsonStreamWriter(output_json_path, append=append) as writer:
+                for filename, task_hash, anns_dicts in self._iter_converted_tasks(
+                    ocr_images_dir, tasks, workers
+                ):
+                    for anns_dict in anns_dicts:
+                        writer.write(anns_dict)
+                    index.add(filename, task_hash, len(anns_dicts))
+                    new_num_outputs[filename] = len(anns_dicts)
+
+            for filename in old_num_outputs.keys() - seen_filenames:
+                index.remove(filename)
+                new_num_outputs[filename] = 0
+
+            # Old entries of changed and removed tasks precede appended ones
+            num_stale_entries = {
+                filename: old_num_outputs[filename]
+                for filename in new_num_outputs
+                if append and old_num_outputs.get(filename)
+            }
+            if num_stale_entries:
+                try:
+                    self._drop_stale_entries(output_json_path, num_stale_entries)
+                except BaseException:
+                    # Output no longer matches the index, next run rewrites it
+                    index.clear()
+                    raise
+
+            # Index is updated only after output was written completely
+            index.commit()
+        finally:
+            index.close()
+
+        self._remove_stale_crops(old_num_outputs, new_num_outputs)
+
+        return writer.num_items
+
+    def _drop_stale_entries(
+        self, output_json_path: str, num_stale_entries: dict[str, int]
+    ) -> None:
+        # Output is rewritten only when some of its entries became stale
+        with JsonStreamWriter(output_json_path) as writer:
+            for anns_dict in FileProcessor.iter_json_array(output_json_path):
+                filename = self._get_source_filename(anns_dict)
+                if num_stale_entries.get(filename, 0) > 0:
+                    num_stale_entries[filename] -= 1
+                    continue
+                writer.write(anns_dict)
+
+    def _remove_stale_crops(
+        self, old_num_outputs: dict[str, int], new_num_outputs: dict[str, int]
+    ) -> None:
+        # Changed task may have less entries, removed task has none
+        for filename, num_outputs in new_num_outputs.items():
+            for i in range(num_outputs, old_num_outputs.get(filename, 0)):
+                output_path = self.create_output_path(filename, i)
+                if os.path.exists(output_path):
+                    os.remove(output_path)
@@ -1,15 +1,104 @@
 import os
+import time
 import random
+import queue
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from PIL import Image
 
 from digitex.core.processors.img import ImgProcessor, ImgCropper
 from digitex.core.processors.file import FileProcessor
+from digitex.core.processors.writer import ImgWriter
 from digitex.core.handlers.pdf import PDFHandler
 from digitex.core.handlers.label import LabelHandler
 
+from .journal import CreatorJournal
+
+
+def _run_creator_shard(
+    creator_cls: type,
+    creator_kwargs: dict,
+    method_name: str,
+    shard: list,
+    kwargs: dict,
+    progress_queue,
+    journal_args: tuple,
+    shared_quota,
+    quota_lock,
+) -> int | dict[str, int]:
+    # Each process creates its own creator, predictors and journal file
+    creator = creator_cls(**creator_kwargs)
+    creator.progress_queue = progress_queue
+    creator.journal = CreatorJournal(*journal_args)
+    creator.shared_quota = shared_quota
+    creator.quota_lock = quota_lock
+
+    result = getattr(creator, method_name)(shard, **kwargs)
+    creator.img_writer.close()
+    creator._record_written_units()
+    creator.journal.close()
+
+    return result
+
+
+class HarvestCounter:
+    def __init__(
+        self,
+        quotas: dict[str, int],
+        page_caps: dict[str, int] | None = None,
+        is_spent=None,
+    ) -> None:
+        self.quotas = quotas
+        self.page_caps = page_caps or {}
+
+        # Quota shared with other workers can run out before the local one
+        self.is_spent = is_spent or (lambda level: False)
+
+        self.num_saved = {level: 0 for level in quotas}
+        self.page_saved = {level: 0 for level in quotas}
+
+    def new_page(self) -> None:
+        self.page_saved = {level: 0 for level in self.quotas}
+
+    def is_open(self, *levels: str) -> bool:
+        for level in levels:
+            if level not in self.quotas:
+                continue
+
+            page_cap = self.page_caps.get(level)
+            if (
+                self.num_saved[level] < self.quotas[level]
+                and (page_cap is None or self.page_saved[level] < page_cap)
+                and not self.is_spent(level)
+            ):
+                return True
+
+        return False
+
+    def is_filled(self) -> bool:
+        return all(
+            self.num_saved[level] >= quota or self.is_spent(level)
+            for level, quota in self.quotas.items()
+        )
+
+    def update(self, level: str, num_saved: int) -> None:
+        self.page_saved[level] += num_saved - self.num_saved[level]
+        self.num_saved[level] = num_saved
+
 
 class BaseDataCreator:
-    def __init__(self) -> None:
+    MODES = ("random", "enumerate")
+    HARVEST_LEVELS = ("question", "part", "word")
+    PART_CLASSES = ["answer", "number", "option", "question", "spec"]
+
+    def __init__(
+        self,
+        img_format: str = "jpg",
+        quality: int = 95,
+        num_threads: int = 4,
+        progress_interval: float = 1.0,
+        output_backend: str = "dir",
+    ) -> None:
         self.img_processor = ImgProcessor()
         self.img_cropper = ImgCropper()
 
@@ -17,10 +106,322 @@ class BaseDataCreator:
         self.pdf_handler = PDFHandler()
         self.label_handler = LabelHandler()
 
+        # Kept to recreate the creator in worker processes
+        self.creator_kwargs = {
+            "img_format": img_format,
+            "quality": quality,
+            "num_threads": num_threads,
+            "progress_interval": progress_interval,
+            "output_backend": output_backend,
+        }
+        self.img_writer = ImgWriter(
+            img_format=img_format,
+            quality=quality,
+            num_threads=num_threads,
+            backend=output_backend,
+        )
+
+        self.progress_queue = None
+        self.progress_interval = progress_interval
+        self._last_progress_time = 0.0
+
+        self.journal = None
+        self._unit_outputs = []
+        self._unit_futures = []
+        self._pending_units = []
+
+        # Remaining quota shared by worker processes, None in a single process
+        self.shared_quota = None
+        self.quota_lock = None
+
     def _read_classes(self, classes_path: str) -> dict[int, str]:
         classes = self.file_processor.read_txt(classes_path)
         return {i: cl.strip() for i, cl in enumerate(classes)}
 
+    def _check_mode(self, mode: str) -> None:
+        if mode not in self.MODES:
+            raise ValueError(f"mode must be one of {self.MODES}.")
+
+    def _check_workers(self, mode: str, workers: int) -> None:
+        if workers < 1:
+            raise ValueError("workers must be positive.")
+        if workers > 1 and mode != "enumerate":
+            raise ValueError("workers > 1 requires mode='enumerate'.")
+
+    def _check_resume(self, mode: str, resume: bool) -> None:
+        if resume and mode != "enumerate":
+            raise ValueError("resume requires mode='enumerate'.")
+
+    def _get_harvest_output_dir(self, train_dirs: dict[str, str]) -> str:
+        # Harvest journal lives next to outputs of the first level
+        for level in self.HARVEST_LEVELS:
+            if level in train_dirs:
+                return train_dirs[level]
+
+        return next(iter(train_dirs.values()))
+
+    def _get_shared_quota(self, level: str | None):
+        if isinstance(self.shared_quota, dict):
+            return self.shared_quota[level]
+
+        return self.shared_quota
+
+    def _is_quota_spent(self, level: str | None = None) -> bool:
+        if self.shared_quota is None:
+            return False
+
+        return self._get_shared_quota(level).value <= 0
+
+    def _claim_quota(self, level: str | None = None) -> bool:
+        # Take one image of the quota shared by workers
+        if self.shared_quota is None:
+            return True
+
+        with self.quota_lock:
+            remaining = self._get_shared_quota(level)
+            if remaining.value <= 0:
+                return False
+            remaining.value -= 1
+
+        return True
+
+    def _release_quota(self, level: str | None = None) -> None:
+        if self.shared_quota is None:
+            return
+
+        with self.quota_lock:
+            self._get_shared_quota(level).value += 1
+
+    def _get_remaining_quota(
+        self, quota: int | dict[str, int], train_dirs: dict[str, str] = None
+    ) -> int | dict[str, int]:
+        # Outputs of previous runs count towards quota if they are still there
+        if isinstance(quota, dict):
+            return {
+                level: max(0, value - self._count_written(train_dirs[level]))
+                for level, value in quota.items()
+            }
+
+        return max(0, quota - self._count_written())
+
+    def _count_written(self, output_dir: str = None) -> int:
+        return sum(
+            self.img_writer.exists(path)
+            for path in self.journal.get_outputs(output_dir)
+        )
+
+    def _start_unit(self, candidate: tuple) -> bool:
+        if self.journal is not None and self.journal.is_done(candidate):
+            return False
+
+        self._unit_outputs = []
+        self._unit_futures = []
+        return True
+
+    def _finish_unit(self, candidate: tuple, is_partial: bool = False) -> None:
+        if self.journal is None:
+            return
+
+        if is_partial:
+            outcome = "partial"
+        else:
+            outcome = "saved" if self._unit_outputs else "empty"
+
+        # Unit is recorded once its images are written, killed run redoes it
+        self._pending_units.append(
+            (candidate, outcome, self._unit_outputs, self._unit_futures)
+        )
+        self._unit_outputs = []
+        self._unit_futures = []
+        self._record_written_units()
+
+    def _record_written_units(self) -> None:
+        pending_units = []
+        for candidate, outcome, outputs, futures in self._pending_units:
+            # Failed writes keep the unit out of journal, writer raises them
+            if any(future.done() and future.exception() for future in futures):
+                continue
+
+            # Finished futures are dropped, unit waits only for running ones
+            futures = [future for future in futures if not future.done()]
+            if futures:
+                pending_units.append((candidate, outcome, outputs, futures))
+            else:
+                self.journal.record(candidate, outcome, outputs)
+
+        self._pending_units = pending_units
+
+    def _run_candidates(
+        self,
+        method_name: str,
+        candidates: list,
+        workers: int,
+        quota_key: str,
+        output_dir: str,
+        resume: bool = False,
+        **kwargs,
+    ) -> int | dict[str, int]:
+        """Shard candidates across processes and merge saved counts.
+
+        Shards are disjoint and output names are built from candidate ids,
+        so workers never write the same file. Workers take images from one
+        shared remaining quota, so a shard that runs out of usable
+        candidates leaves its share to the others. Processed candidates are
+        recorded in a journal beside output_dir, resume skips the completed
+        ones.
+        """
+        # Journal stays out of output dir, which holds only images
+        output_dir = os.path.abspath(output_dir)
+        journal_dir = os.path.dirname(output_dir)
+        run_name = ".".join(
+            [os.path.basename(output_dir), type(self).__name__, method_name.strip("_")]
+        )
+        self.journal = CreatorJournal(journal_dir, run_name)
+        self._pending_units = []
+        if not resume:
+            self.journal.clear()
+
+        kwargs[quota_key] = self._get_remaining_quota(
+            kwargs[quota_key], kwargs.get("train_dirs")
+        )
+
+        if workers == 1:
+            result = getattr(self, method_name)(candidates, **kwargs)
+            self.img_writer.close()
+            self._record_written_units()
+            self.journal.close()
+            self.journal = None
+            return result
+
+        quota = kwargs[quota_key]
+        total = sum(quota.values()) if isinstance(quota, dict) else quota
+        shards = [candidates[i::workers] for i in range(workers)]
+
+        # Spawn, because forked processes can't reuse CUDA context
+        mp_context = mp.get_context("spawn")
+        with mp_context.Manager() as manager:
+            progress_queue = manager.Queue()
+            quota_lock = manager.Lock()
+            if isinstance(quota, dict):
+                shared_quota = {
+                    level: manager.Value("i", value) for level, value in quota.items()
+                }
+            else:
+                shared_quota = manager.Value("i", quota)
+
+            with ProcessPoolExecutor(workers, mp_context=mp_context) as executor:
+                futures = set()
+                for i, shard in enumerate(shards):
+                    # Every shard may fill the whole quota, shared counter stops it
+                    shard_kwargs = dict(kwargs)
+                    if shard_kwargs.get("seed") is not None:
+                        shard_kwargs["seed"] += i
+
+                    future = executor.submit(
+                        _run_creator_shard,
+                        type(self),
+                        self.creator_kwargs,
+                        method_name,
+                        shard,
+                        shard_kwargs,
+                        progress_queue,
+                        (journal_dir, run_name, i),
+                        shared_quota,
+                        quota_lock,
+                    )
+                    futures.add(future)
+
+                # Merge progress reported by workers
+                num_saved = 0
+                pending = futures
+                while pending:
+                    _, pending = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                    num_new = self._drain_progress(progress_queue)
+                    if num_new:
+                        num_saved += num_new
+                        print(f"{num_saved}/{total} images was saved.")
+
+                results = [future.result() for future in futures]
+
+        self.journal = None
+
+        if isinstance(quota, dict):
+            return {
+                level: sum(result[level] for result in results) for level in quota
+            }
+
+        return sum(results)
+
+    @staticmethod
+    def _drain_progress(progress_queue) -> int:
+        num_saved = 0
+        while True:
+            try:
+                num_saved += progress_queue.get_nowait()
+            except queue.Empty:
+                return num_saved
+
+    def _report_progress(self, num_saved: int, num_images: int) -> None:
+        if self.progress_queue is not None:
+            self.progress_queue.put(1)
+            return
+
+        # Print at most once per progress interval and on the last image
+        now = time.monotonic()
+        if (
+            num_saved == num_images
+            or now - self._last_progress_time >= self.progress_interval
+        ):
+            print(f"{num_saved}/{num_images} images was saved.")
+            self._last_progress_time = now
+
+    @staticmethod
+    def _sample_candidates(candidates: list, seed: int | None = None) -> list:
+        # Shuffled copy, so iterating it samples without replacement
+        candidates = list(candidates)
+        random.Random(seed).shuffle(candidates)
+        return candidates
+
+    def _get_pdf_candidates(
+        self, pdf_listdir: list, pdf_dir: str
+    ) -> list[tuple[str, int]]:
+        candidates = []
+        for pdf_name in sorted(pdf_listdir):
+            pdf_path = os.path.join(pdf_dir, pdf_name)
+            page_count = self.pdf_handler.get_page_count(pdf_path)
+            candidates.extend((pdf_name, page_idx) for page_idx in range(page_count))
+
+        return candidates
+
+    def _get_label_candidates(
+        self,
+        images_listdir: list,
+        labels_dir: str,
+        classes_dict: dict,
+        target_classes: list,
+    ) -> list[tuple[str, int, int, list[float]]]:
+        candidates = []
+        for image_name in sorted(images_listdir):
+            all_points = self.label_handler.get_all_points(
+                image_name=image_name,
+                labels_dir=labels_dir,
+                classes_dict=classes_dict,
+                target_classes=target_classes,
+            )
+            candidates.extend(
+                (image_name, class_idx, points_idx, points)
+                for class_idx, points_idx, points in all_points
+            )
+
+        return candidates
+
+    def _get_pdf_image(
+        self, pdf_name: str, pdf_dir: str, page_idx: int
+    ) -> tuple[Image.Image, str]:
+        return self.pdf_handler.get_image(
+            pdf_name=pdf_name, pdf_dir=pdf_dir, page_idx=page_idx
+        )
+
     def _get_listdir_random_image(
         self, images_listdir: list, images_dir: str
     ) -> tuple[Image.Image, str]:
@@ -43,10 +444,15 @@ class BaseDataCreator:
         return image
 
     def _cut_out_image(
-        self, image: Image.Image, polygon: list[tuple[int, int]]
+        self,
+        image: Image.Image,
+        polygon: list[tuple[int, int]],
+        return_alpha: bool = False,
     ) -> Image.Image:
         img = self.img_processor.image2img(image)
-        cutted_img = self.img_cropper.cut_out_img_by_polygon(img, polygon)
+        cutted_img = self.img_cropper.cut_out_img_by_polygon(
+            img, polygon, return_alpha=return_alpha
+        )
         cutted_image = self.img_processor.img2image(cutted_img)
         return cutted_image
 
@@ -66,16 +472,31 @@ class BaseDataCreator:
         image_name: str,
         num_saved: int,
         num_images: int,
+        level: str | None = None,
     ) -> int:
         image_stem = os.path.splitext(image_name)[0]
         str_ids = "_".join([str(i) for i in args])
-        image_path = os.path.join(output_dir, image_stem) + "_" + str_ids + ".jpg"
+        image_path = os.path.join(output_dir, image_stem) + "_" + str_ids
+        image_path += self.img_writer.ext
+
+        if self.img_writer.exists(image_path):
+            return num_saved
+        if not self._claim_quota(level):
+            return num_saved
 
-        if not os.path.exists(image_path):
-            image.save(image_path, "JPEG")
+        # Encoding and writing happen in background threads
+        img = self.img_processor.image2img(image)
+        image.close()
+        future = self.img_writer.write(img, image_path)
+        if future is not None:
+            # Only units recorded in journal track their writes
+            if self.journal is not None:
+                self._unit_outputs.append(image_path)
+                self._unit_futures.append(future)
             num_saved += 1
-            print(f"{num_saved}/{num_images} images was saved.")
-            image.close()
+            self._report_progress(num_saved, num_images)
+        else:
+            self._release_quota(level)
 
         return num_saved
 
@@ -96,6 +517,250 @@ class BaseDataCreator:
             points=points, image_width=image_width, image_height=image_height
         )
 
+    def _get_all_polygons(
+        self, pred_result, target_classes: list
+    ) -> list[tuple[int, int, list[tuple[int, int]]]]:
+        if not pred_result:
+            return []
+
+        return self.label_handler.filter_points(
+            classes_dict=pred_result.id2label,
+            points_dict=pred_result.id2polygons,
+            target_classes=target_classes,
+        )
+
+    def _extract_label_candidates(
+        self,
+        candidates: list[tuple[str, int, int, list[float]]],
+        images_dir: str,
+        train_dir: str,
+        num_images: int,
+        cut_out: bool = True,
+        with_class_idx: bool = False,
+    ) -> int:
+        crop_func = self._cut_out_image if cut_out else self._crop_image
+        num_saved = 0
+
+        for candidate in candidates:
+            if num_saved == num_images or self._is_quota_spent():
+                break
+            if not self._start_unit(candidate):
+                continue
+
+            image_name, class_idx, points_idx, points = candidate
+
+            image = Image.open(os.path.join(images_dir, image_name))
+            polygon = self._convert_points_to_polygon(
+                points=points, image_width=image.width, image_height=image.height
+            )
+            cropped_image = crop_func(image=image, polygon=polygon)
+
+            # Points indexes repeat across classes, so keep class in name
+            ids = (class_idx, points_idx) if with_class_idx else (points_idx,)
+            num_saved = self._save_image(
+                *ids,
+                output_dir=train_dir,
+                image=cropped_image,
+                image_name=image_name,
+                num_saved=num_saved,
+                num_images=num_images,
+            )
+            self._finish_unit(candidate)
+
+        return num_saved
+
+    def _check_harvest_levels(
+        self, quotas: dict[str, int], train_dirs: dict[str, str], levels: tuple
+    ) -> None:
+        for level in quotas:
+            if level not in levels:
+                raise ValueError(f"Harvest levels must be one of {levels}.")
+            if level not in train_dirs:
+                raise ValueError(f"Output directory for level '{level}' is missing.")
+
+    def _harvest_save(
+        self,
+        level: str,
+        *args,
+        counter: HarvestCounter,
+        train_dirs: dict[str, str],
+        image: Image.Image,
+        image_name: str,
+    ) -> None:
+        if not counter.is_open(level):
+            return
+
+        num_saved = self._save_image(
+            *args,
+            output_dir=train_dirs[level],
+            image=image,
+            image_name=image_name,
+            num_saved=counter.num_saved[level],
+            num_images=counter.quotas[level],
+            level=level,
+        )
+        counter.update(level, num_saved)
+
+    def _harvest_pages(
+        self,
+        candidates: list[tuple[str, int]],
+        pdf_dir: str,
+        train_dirs: dict[str, str],
+        predictors: dict,
+        part_classes: list[str],
+        quotas: dict[str, int],
+        page_caps: dict[str, int] | None = None,
+        seed: int | None = None,
+    ) -> dict[str, int]:
+        rng = random.Random(seed)
+        counter = HarvestCounter(quotas, page_caps, is_spent=self._is_quota_spent)
+
+        for candidate in candidates:
+            if counter.is_filled():
+                break
+            if not self._start_unit(candidate):
+                continue
+
+            pdf_name, page_idx = candidate
+
+            page_image, page_image_name = self._get_pdf_image(
+                pdf_name, pdf_dir, page_idx
+            )
+            page_image = self._process_image(image=page_image)
+            page_pred_result = predictors["page"](page_image)
+            counter.new_page()
+
+            # Shuffle crops of each level, so page caps keep a random subset
+            question_polygons = self._get_all_polygons(page_pred_result, ["question"])
+            rng.shuffle(question_polygons)
+
+            for _, question_idx, question_polygon in question_polygons:
+                if not counter.is_open(*self.HARVEST_LEVELS):
+                    break
+
+                question_image = self._cut_out_image(
+                    image=page_image, polygon=question_polygon
+                )
+                self._harvest_save(
+                    "question",
+                    page_idx,
+                    question_idx,
+                    counter=counter,
+                    train_dirs=train_dirs,
+                    image=question_image,
+                    image_name=page_image_name,
+                )
+
+                # Run deeper models only if their crops are still needed
+                if not counter.is_open("part", "word"):
+                    continue
+
+                question_pred_result = predictors["question"](question_image)
+                part_polygons = self._get_all_polygons(
+                    question_pred_result, part_classes
+                )
+                rng.shuffle(part_polygons)
+
+                for class_idx, part_idx, part_polygon in part_polygons:
+                    if not counter.is_open("part", "word"):
+                        break
+
+                    part_image = self._cut_out_image(
+                        image=question_image, polygon=part_polygon
+                    )
+                    self._harvest_save(
+                        "part",
+                        page_idx,
+                        question_idx,
+                        class_idx,
+                        part_idx,
+                        counter=counter,
+                        train_dirs=train_dirs,
+                        image=part_image,
+                        image_name=page_image_name,
+                    )
+
+                    if not counter.is_open("word"):
+                        continue
+
+                    word_pred_result = predictors["word"](part_image)
+                    word_polygons = self._get_all_polygons(word_pred_result, ["text"])
+                    rng.shuffle(word_polygons)
+
+                    for _, word_idx, word_polygon in word_polygons:
+                        if not counter.is_open("word"):
+                            break
+
+                        word_image = self._crop_image(
+                            image=part_image, polygon=word_polygon
+                        )
+                        self._harvest_save(
+                            "word",
+                            page_idx,
+                            question_idx,
+                            class_idx,
+                            part_idx,
+                            word_idx,
+                            counter=counter,
+                            train_dirs=train_dirs,
+                            image=word_image,
+                            image_name=page_image_name,
+                        )
+
+            self._finish_unit(candidate, is_partial=counter.is_filled())
+
+        return counter.num_saved
+
+    def _create_predictors(self, **model_paths) -> dict:
+        # Predictors of cascade levels ("page", "question", "word") of a creator
+        raise NotImplementedError("This method should be overridden by subclasses.")
+
+    def _predict_candidates(
+        self,
+        candidates: list[tuple[str, int]],
+        pdf_dir: str,
+        train_dir: str,
+        level: str,
+        num_images: int,
+        part_classes: list[str] | None = None,
+        seed: int | None = None,
+        **model_paths,
+    ) -> int:
+        # Cascade pass which saves crops of one level only
+        num_saved = self._harvest_pages(
+            candidates,
+            pdf_dir=pdf_dir,
+            train_dirs={level: train_dir},
+            predictors=self._create_predictors(**model_paths),
+            part_classes=part_classes or self.PART_CLASSES,
+            quotas={level: num_images},
+            seed=seed,
+        )
+
+        return num_saved[level]
+
+    def _harvest_candidates(
+        self,
+        candidates: list[tuple[str, int]],
+        pdf_dir: str,
+        train_dirs: dict[str, str],
+        quotas: dict[str, int],
+        page_caps: dict[str, int] | None = None,
+        part_classes: list[str] | None = None,
+        seed: int | None = None,
+        **model_paths,
+    ) -> dict[str, int]:
+        return self._harvest_pages(
+            candidates,
+            pdf_dir=pdf_dir,
+            train_dirs=train_dirs,
+            predictors=self._create_predictors(**model_paths),
+            part_classes=part_classes or self.PART_CLASSES,
+            quotas=quotas,
+            page_caps=page_caps,
+            seed=seed,
+        )
+
     def extract(self, *args):
         raise NotImplementedError("This method should be overridden by subclasses.")
 
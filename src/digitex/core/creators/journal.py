@@ -0,0 +1,125 @@
+import os
+import json
+
+
+class CreatorJournal:
+    """Append-only JSONL record of processed candidates of a creator run.
+
+    Worker processes write separate files with a worker index, loading
+    reads all files of the run.
+    """
+
+    EXT = ".journal.jsonl"
+    DONE_OUTCOMES = ("saved", "empty")
+
+    def __init__(
+        self, journal_dir: str, run_name: str, worker_idx: int = None
+    ) -> None:
+        self.journal_dir = journal_dir
+        self.run_name = run_name
+        self.worker_idx = worker_idx
+
+        filename = f".{run_name}"
+        if worker_idx is not None:
+            filename += f".{worker_idx}"
+        self.journal_path = os.path.join(journal_dir, filename + self.EXT)
+
+        self._file = None
+        self._done_keys = None
+        self._outputs = None
+
+    @staticmethod
+    def get_key(candidate: tuple) -> str:
+        # Points of label candidates are data, not part of the id
+        ids = [value for value in candidate if not isinstance(value, list)]
+        return json.dumps(ids, ensure_ascii=False)
+
+    def _get_paths(self) -> list[str]:
+        if not os.path.isdir(self.journal_dir):
+            return []
+
+        prefix = f".{self.run_name}."
+        run_filename = f".{self.run_name}{self.EXT}"
+
+        paths = []
+        for filename in sorted(os.listdir(self.journal_dir)):
+            if filename == run_filename or (
+                filename.startswith(prefix)
+                and filename.endswith(self.EXT)
+                and filename[len(prefix) : -len(self.EXT)].isdigit()
+            ):
+                paths.append(os.path.join(self.journal_dir, filename))
+
+        return paths
+
+    def _load(self) -> None:
+        self._done_keys = set()
+        self._outputs = []
+
+        for path in self._get_paths():
+            with open(path, "r", encoding="utf-8") as journal_file:
+                for line in journal_file:
+                    # Skip line cut by killed run
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+
+                    if record["outcome"] in self.DONE_OUTCOMES:
+                        self._done_keys.add(record["key"])
+                    self._outputs.extend(record["outputs"])
+
+    @property
+    def done_keys(self) -> set[str]:
+        if self._done_keys is None:
+            self._load()
+
+        return self._done_keys
+
+    @property
+    def outputs(self) -> list[str]:
+        if self._outputs is None:
+            self._load()
+
+        return self._outputs
+
+    def clear(self) -> None:
+        for path in self._get_paths():
+            os.remove(path)
+
+        self._done_keys = set()
+        self._outputs = []
+
+    def is_done(self, candidate: tuple) -> bool:
+        return self.get_key(candidate) in self.done_keys
+
+    def get_outputs(self, output_dir: str = None) -> list[str]:
+        if output_dir is None:
+            return list(self.outputs)
+
+        output_dir = os.path.normpath(output_dir)
+        return [
+            path
+            for path in self.outputs
+            if os.path.normpath(os.path.dirname(path)) == output_dir
+        ]
+
+    def record(self, candidate: tuple, outcome: str, outputs: list[str]) -> None:
+        if self._file is None:
+            os.makedirs(self.journal_dir, exist_ok=True)
+            self._file = open(self.journal_path, "a", encoding="utf-8")
+
+        record = {
+            "key": self.get_key(candidate),
+            "outcome": outcome,
+            "outputs": outputs,
+        }
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        # Flush every line, killed run keeps all finished units
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -3,8 +3,68 @@ from .base import BaseDataCreator
 
 
 class PageDataCreator(BaseDataCreator):
-    def extract(self, pdf_dir: str, train_dir: str, num_images: int) -> None:
+    def _extract_pdf_candidates(
+        self,
+        candidates: list[tuple[str, int]],
+        pdf_dir: str,
+        train_dir: str,
+        num_images: int,
+    ) -> int:
+        num_saved = 0
+
+        for candidate in candidates:
+            if num_saved == num_images:
+                break
+            if not self._start_unit(candidate):
+                continue
+
+            pdf_name, page_idx = candidate
+
+            image, image_name = self._get_pdf_image(pdf_name, pdf_dir, page_idx)
+            image = self._process_image(image=image)
+            num_saved = self._save_image(
+                page_idx,
+                output_dir=train_dir,
+                image=image,
+                image_name=image_name,
+                num_saved=num_saved,
+                num_images=num_images,
+            )
+
+            self._finish_unit(candidate, is_partial=num_saved == num_images)
+
+        return num_saved
+
+    def extract(
+        self,
+        pdf_dir: str,
+        train_dir: str,
+        num_images: int,
+        mode: str = "random",
+        seed: int | None = None,
+        workers: int = 1,
+        resume: bool = False,
+    ) -> None:
+        self._check_mode(mode)
+        self._check_workers(mode, workers)
+        self._check_resume(mode, resume)
         pdf_listdir = [pdf for pdf in os.listdir(pdf_dir) if pdf.endswith("pdf")]
+
+        if mode == "enumerate":
+            candidates = self._get_pdf_candidates(pdf_listdir, pdf_dir)
+            self._run_candidates(
+                "_extract_pdf_candidates",
+                self._sample_candidates(candidates, seed),
+                workers=workers,
+                quota_key="num_images",
+                output_dir=train_dir,
+                resume=resume,
+                pdf_dir=pdf_dir,
+                train_dir=train_dir,
+                num_images=num_images,
+            )
+            return
+
         num_saved = 0
 
         while num_images != num_saved:
@@ -20,3 +80,5 @@ class PageDataCreator(BaseDataCreator):
                 num_saved=num_saved,
                 num_images=num_images,
             )
+
+        self.img_writer.close()
@@ -13,12 +13,38 @@ class PartDataCreator(BaseDataCreator):
         train_dir: str,
         num_images: int,
         target_classes: list[str] = ["answer", "number", "option", "question", "spec"],
+        mode: str = "random",
+        seed: int | None = None,
+        workers: int = 1,
+        resume: bool = False,
     ) -> None:
+        self._check_mode(mode)
+        self._check_workers(mode, workers)
+        self._check_resume(mode, resume)
         source_images_dir = os.path.join(question_raw_dir, "images")
         annotation_dir = os.path.join(question_raw_dir, "labels")
         classes_file = os.path.join(question_raw_dir, "classes.txt")
         class_mapping = self._read_classes(classes_file)
         available_images = os.listdir(source_images_dir)
+
+        if mode == "enumerate":
+            candidates = self._get_label_candidates(
+                available_images, annotation_dir, class_mapping, target_classes
+            )
+            self._run_candidates(
+                "_extract_label_candidates",
+                self._sample_candidates(candidates, seed),
+                workers=workers,
+                quota_key="num_images",
+                output_dir=train_dir,
+                resume=resume,
+                images_dir=source_images_dir,
+                train_dir=train_dir,
+                num_images=num_images,
+                with_class_idx=True,
+            )
+            return
+
         processed_count = 0
 
         while num_images != processed_count:
@@ -49,6 +75,60 @@ class PartDataCreator(BaseDataCreator):
                 num_images=num_images,
             )
 
+        self.img_writer.close()
+
+    def _create_predictors(
+        self, yolo_page_model_path: str, yolo_question_model_path: str
+    ) -> dict:
+        return {
+            "page": YOLO_SegmentationPredictor(
+                yolo_page_model_path, device=settings.DEVICE
+            ),
+            "question": YOLO_SegmentationPredictor(
+                yolo_question_model_path, device=settings.DEVICE
+            ),
+        }
+
+    def harvest(
+        self,
+        pdf_dir: str,
+        train_dirs: dict[str, str],
+        yolo_page_model_path: str,
+        yolo_question_model_path: str,
+        quotas: dict[str, int],
+        page_caps: dict[str, int] | None = None,
+        target_classes: list[str] = ["answer", "number", "option", "question", "spec"],
+        seed: int | None = None,
+        workers: int = 1,
+        resume: bool = False,
+    ) -> dict[str, int]:
+        """Save question and part crops of one cascade pass per page.
+
+        quotas and page_caps map a level ("question", "part") to the total
+        number of crops and the max number of crops per page.
+        """
+        self._check_workers("enumerate", workers)
+        self._check_harvest_levels(quotas, train_dirs, ("question", "part"))
+        pdf_listdir = [pdf for pdf in os.listdir(pdf_dir) if pdf.endswith("pdf")]
+        candidates = self._get_pdf_candidates(pdf_listdir, pdf_dir)
+
+        return self._run_candidates(
+            "_harvest_candidates",
+            self._sample_candidates(candidates, seed),
+            workers=workers,
+            quota_key="quotas",
+            output_dir=self._get_harvest_output_dir(train_dirs),
+            resume=resume,
+            pdf_dir=pdf_dir,
+            train_dirs=train_dirs,
+            quotas=quotas,
+            page_caps=page_caps,
+            part_classes=target_classes,
+            seed=seed,
+            yolo_page_model_path=yolo_page_model_path,
+            yolo_question_model_path=yolo_question_model_path,
+        )
+
     def predict(
         self,
         pdf_dir: str,
@@ -57,14 +137,42 @@ class PartDataCreator(BaseDataCreator):
         yolo_question_model_path: str,
         num_images: int,
         target_classes: list[str] = ["answer", "number", "option", "question", "spec"],
+        mode: str = "random",
+        seed: int | None = None,
+        workers: int = 1,
+        resume: bool = False,
     ) -> None:
+        self._check_mode(mode)
+        self._check_workers(mode, workers)
+        self._check_resume(mode, resume)
+        pdf_listdir = [pdf for pdf in os.listdir(pdf_dir) if pdf.endswith("pdf")]
+
+        if mode == "enumerate":
+            candidates = self._get_pdf_candidates(pdf_listdir, pdf_dir)
+            self._run_candidates(
+                "_predict_candidates",
+                self._sample_candidates(candidates, seed),
+                workers=workers,
+                quota_key="num_images",
+                output_dir=train_dir,
+                resume=resume,
+                pdf_dir=pdf_dir,
+                train_dir=train_dir,
+                level="part",
+                num_images=num_images,
+                part_classes=target_classes,
+                seed=seed,
+                yolo_page_model_path=yolo_page_model_path,
+                yolo_question_model_path=yolo_question_model_path,
+            )
+            return
+
         yolo_page_predictor = YOLO_SegmentationPredictor(
             yolo_page_model_path, device=settings.DEVICE
         )
         yolo_question_predictor = YOLO_SegmentationPredictor(
             yolo_question_model_path, device=settings.DEVICE
         )
-        pdf_listdir = [pdf for pdf in os.listdir(pdf_dir) if pdf.endswith("pdf")]
         num_saved = 0
 
         while num_images != num_saved:
@@ -107,3 +215,5 @@ class PartDataCreator(BaseDataCreator):
                 num_saved=num_saved,
                 num_images=num_images,
             )
+
+        self.img_writer.close()
@@ -5,12 +5,42 @@ from ..predictors.segmentation import YOLO_SegmentationPredictor
 
 
 class QuestionDataCreator(BaseDataCreator):
-    def extract(self, page_raw_dir: str, train_dir: str, num_images: int) -> None:
+    def extract(
+        self,
+        page_raw_dir: str,
+        train_dir: str,
+        num_images: int,
+        mode: str = "random",
+        seed: int | None = None,
+        workers: int = 1,
+        resume: bool = False,
+    ) -> None:
+        self._check_mode(mode)
+        self._check_workers(mode, workers)
+        self._check_resume(mode, resume)
         images_dir = os.path.join(page_raw_dir, "images")
         labels_dir = os.path.join(page_raw_dir, "labels")
         classes_path = os.path.join(page_raw_dir, "classes.txt")
         classes_dict = self._read_classes(classes_path)
         images_listdir = os.listdir(images_dir)
+
+        if mode == "enumerate":
+            candidates = self._get_label_candidates(
+                images_listdir, labels_dir, classes_dict, ["question"]
+            )
+            self._run_candidates(
+                "_extract_label_candidates",
+                self._sample_candidates(candidates, seed),
+                workers=workers,
+                quota_key="num_images",
+                output_dir=train_dir,
+                resume=resume,
+                images_dir=images_dir,
+                train_dir=train_dir,
+                num_images=num_images,
+            )
+            return
+
         num_saved = 0
 
         while num_images != num_saved:
@@ -38,17 +68,53 @@ class QuestionDataCreator(BaseDataCreator):
                 num_images=num_images,
             )
 
+        self.img_writer.close()
+
+    def _create_predictors(self, yolo_question_model_path: str) -> dict:
+        # Question model segments pages
+        return {
+            "page": YOLO_SegmentationPredictor(
+                model_path=yolo_question_model_path, device=settings.DEVICE
+            ),
+        }
+
     def predict(
         self,
         pdf_dir: str,
         train_dir: str,
         yolo_question_model_path: str,
         num_images: int,
+        mode: str = "random",
+        seed: int | None = None,
+        workers: int = 1,
+        resume: bool = False,
     ) -> None:
+        self._check_mode(mode)
+        self._check_workers(mode, workers)
+        self._check_resume(mode, resume)
+        pdf_listdir = [pdf for pdf in os.listdir(pdf_dir) if pdf.endswith("pdf")]
+
+        if mode == "enumerate":
+            candidates = self._get_pdf_candidates(pdf_listdir, pdf_dir)
+            self._run_candidates(
+                "_predict_candidates",
+                self._sample_candidates(candidates, seed),
+                workers=workers,
+                quota_key="num_images",
+                output_dir=train_dir,
+                resume=resume,
+                pdf_dir=pdf_dir,
+                train_dir=train_dir,
+                level="question",
+                num_images=num_images,
+                seed=seed,
+                yolo_question_model_path=yolo_question_model_path,
+            )
+            return
+
         yolo_predictor = YOLO_SegmentationPredictor(
             model_path=yolo_question_model_path, device=settings.DEVICE
         )
-        pdf_listdir = [pdf for pdf in os.listdir(pdf_dir) if pdf.endswith("pdf")]
         num_saved = 0
 
         while num_images != num_saved:
@@ -77,3 +143,5 @@ class QuestionDataCreator(BaseDataCreator):
                 num_saved=num_saved,
                 num_images=num_images,
             )
+
+        self.img_writer.close()
@@ -6,13 +6,44 @@ from ..predictors.detection import DB_RepVitDetectionPredictor
 
 
 class WordDataCreator(BaseDataCreator):
-    def extract(self, parts_raw_dir: str, train_dir: str, num_images: int) -> None:
+    def extract(
+        self,
+        parts_raw_dir: str,
+        train_dir: str,
+        num_images: int,
+        mode: str = "random",
+        seed: int | None = None,
+        workers: int = 1,
+        resume: bool = False,
+    ) -> None:
+        self._check_mode(mode)
+        self._check_workers(mode, workers)
+        self._check_resume(mode, resume)
         images_dir = os.path.join(parts_raw_dir, "images")
         labels_dir = os.path.join(parts_raw_dir, "labels")
         classes_path = os.path.join(parts_raw_dir, "classes.txt")
         classes_dict = self._read_classes(classes_path)
         target_classes = ["text"]
         images_listdir = os.listdir(images_dir)
+
+        if mode == "enumerate":
+            candidates = self._get_label_candidates(
+                images_listdir, labels_dir, classes_dict, target_classes
+            )
+            self._run_candidates(
+                "_extract_label_candidates",
+                self._sample_candidates(candidates, seed),
+                workers=workers,
+                quota_key="num_images",
+                output_dir=train_dir,
+                resume=resume,
+                images_dir=images_dir,
+                train_dir=train_dir,
+                num_images=num_images,
+                cut_out=False,
+            )
+            return
+
         num_saved = 0
 
         while num_images != num_saved:
@@ -41,6 +72,71 @@ class WordDataCreator(BaseDataCreator):
                 num_images=num_images,
             )
 
+        self.img_writer.close()
+
+    def _create_predictors(
+        self,
+        yolo_page_model_path: str,
+        yolo_question_model_path: str,
+        db_repvit_word_model_path: str,
+        db_repvit_word_config_path: str,
+    ) -> dict:
+        return {
+            "page": YOLO_SegmentationPredictor(
+                yolo_page_model_path, device=settings.DEVICE
+            ),
+            "question": YOLO_SegmentationPredictor(
+                yolo_question_model_path, device=settings.DEVICE
+            ),
+            "word": DB_RepVitDetectionPredictor(
+                config_path=db_repvit_word_config_path,
+                model_path=db_repvit_word_model_path,
+                device=settings.DEVICE,
+            ),
+        }
+
+    def harvest(
+        self,
+        pdf_dir: str,
+        train_dirs: dict[str, str],
+        yolo_page_model_path: str,
+        yolo_question_model_path: str,
+        db_repvit_word_model_path: str,
+        db_repvit_word_config_path: str,
+        quotas: dict[str, int],
+        page_caps: dict[str, int] | None = None,
+        seed: int | None = None,
+        workers: int = 1,
+        resume: bool = False,
+    ) -> dict[str, int]:
+        """Save question, part and word crops of one cascade pass per page.
+
+        quotas and page_caps map a level ("question", "part", "word") to the
+        total number of crops and the max number of crops per page.
+        """
+        self._check_workers("enumerate", workers)
+        self._check_harvest_levels(quotas, train_dirs, self.HARVEST_LEVELS)
+        pdf_listdir = [pdf for pdf in os.listdir(pdf_dir) if pdf.endswith("pdf")]
+        candidates = self._get_pdf_candidates(pdf_listdir, pdf_dir)
+
+        return self._run_candidates(
+            "_harvest_candidates",
+            self._sample_candidates(candidates, seed),
+            workers=workers,
+            quota_key="quotas",
+            output_dir=self._get_harvest_output_dir(train_dirs),
+            resume=resume,
+            pdf_dir=pdf_dir,
+            train_dirs=train_dirs,
+            quotas=quotas,
+            page_caps=page_caps,
+            seed=seed,
+            yolo_page_model_path=yolo_page_model_path,
+            yolo_question_model_path=yolo_question_model_path,
+            db_repvit_word_model_path=db_repvit_word_model_path,
+            db_repvit_word_config_path=db_repvit_word_config_path,
+        )
+
     def predict(
         self,
         pdf_dir: str,
@@ -50,7 +146,37 @@ class WordDataCreator(BaseDataCreator):
         db_repvit_word_model_path: str,
         db_repvit_word_config_path: str,
         num_images: int,
+        mode: str = "random",
+        seed: int | None = None,
+        workers: int = 1,
+        resume: bool = False,
     ) -> None:
+        self._check_mode(mode)
+        self._check_workers(mode, workers)
+        self._check_resume(mode, resume)
+        pdf_listdir = [pdf for pdf in os.listdir(pdf_dir) if pdf.endswith("pdf")]
+
+        if mode == "enumerate":
+            candidates = self._get_pdf_candidates(pdf_listdir, pdf_dir)
+            self._run_candidates(
+                "_predict_candidates",
+                self._sample_candidates(candidates, seed),
+                workers=workers,
+                quota_key="num_images",
+                output_dir=train_dir,
+                resume=resume,
+                pdf_dir=pdf_dir,
+                train_dir=train_dir,
+                level="word",
+                num_images=num_images,
+                seed=seed,
+                yolo_page_model_path=yolo_page_model_path,
+                yolo_question_model_path=yolo_question_model_path,
+                db_repvit_word_model_path=db_repvit_word_model_path,
+                db_repvit_word_config_path=db_repvit_word_config_path,
+            )
+            return
+
         yolo_page_predictor = YOLO_SegmentationPredictor(
             yolo_page_model_path, device=settings.DEVICE
         )
@@ -58,11 +184,10 @@ class WordDataCreator(BaseDataCreator):
             yolo_question_model_path, device=settings.DEVICE
         )
         db_repvit_word_predictor = DB_RepVitDetectionPredictor(
-            db_repvit_word_model_path,
-            db_repvit_word_config_path,
+            config_path=db_repvit_word_config_path,
+            model_path=db_repvit_word_model_path,
             device=settings.DEVICE,
         )
-        pdf_listdir = [pdf for pdf in os.listdir(pdf_dir) if pdf.endswith("pdf")]
         parts_target_classes = ["answer", "number", "option", "question", "spec"]
         num_saved = 0
 
@@ -119,3 +244,5 @@ class WordDataCreator(BaseDataCreator):
                 num_saved=num_saved,
                 num_images=num_images,
             )
+
+        self.img_writer.close()
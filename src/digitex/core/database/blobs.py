@@ -0,0 +1,283 @@
+import io
+import os
+import uuid
+import hashlib
+import sqlite3
+
+from PIL import Image
+
+
+class BlobStore:
+    """Content-addressed store of question images next to tests.db.
+
+    Every unique image is saved once under its sha256 in a sharded
+    directory with pre-rendered JPEG variants for Telegram. The blobs
+    table of tests.db keeps reference counts, which triggers on images
+    update, and Telegram file ids, so every image is uploaded once.
+    """
+
+    # Longest side of size variants
+    VARIANTS = {"photo": 1280, "thumb": 320}
+    VARIANT_QUALITY = 90
+
+    # Same as in script.sql, for databases created before the store
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS blobs (
+            blob_hash TEXT PRIMARY KEY,
+            ext TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            ref_count INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS blob_file_ids (
+            blob_hash TEXT NOT NULL,
+            variant TEXT NOT NULL,
+            file_id TEXT NOT NULL,
+            FOREIGN KEY (blob_hash) REFERENCES blobs(blob_hash),
+            PRIMARY KEY (blob_hash, variant)
+        )
+        """,
+    )
+    IMAGES_SCHEMA = """
+        CREATE TABLE {table} (
+            image_id INTEGER PRIMARY KEY,
+            question_id INTEGER NOT NULL,
+            blob_hash TEXT NOT NULL,
+            is_table BOOLEAN NOT NULL,
+            image_order INTEGER NOT NULL,
+            FOREIGN KEY (question_id) REFERENCES questions(question_id),
+            FOREIGN KEY (blob_hash) REFERENCES blobs(blob_hash),
+            UNIQUE (question_id, image_order),
+            CHECK (is_table IN (0, 1))
+        )
+    """
+    TRIGGERS = (
+        """
+        CREATE TRIGGER IF NOT EXISTS images_blob_insert AFTER INSERT ON images BEGIN
+            UPDATE blobs SET ref_count = ref_count + 1
+            WHERE blob_hash = new.blob_hash;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS images_blob_delete AFTER DELETE ON images BEGIN
+            UPDATE blobs SET ref_count = ref_count - 1
+            WHERE blob_hash = old.blob_hash;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS images_blob_update
+        AFTER UPDATE OF blob_hash ON images BEGIN
+            UPDATE blobs SET ref_count = ref_count - 1
+            WHERE blob_hash = old.blob_hash;
+            UPDATE blobs SET ref_count = ref_count + 1
+            WHERE blob_hash = new.blob_hash;
+        END
+        """,
+    )
+
+    def __init__(self, root_dir: str) -> None:
+        self.root_dir = root_dir
+
+    @staticmethod
+    def get_hash(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def get_path(self, blob_hash: str, ext: str, variant: str | None = None) -> str:
+        # Two levels of shards keep directories small
+        if variant is None:
+            filename = f"{blob_hash}.{ext}"
+            return os.path.join(
+                self.root_dir, "original", blob_hash[:2], blob_hash[2:4], filename
+            )
+
+        filename = f"{blob_hash}.jpg"
+        return os.path.join(
+            self.root_dir, variant, blob_hash[:2], blob_hash[2:4], filename
+        )
+
+    @staticmethod
+    def _write_file(path: str, data: bytes) -> None:
+        # Write to temporary file first, so a file under its hash is complete
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+
+    def _write_variants(
+        self, blob_hash: str, image: Image.Image, new_paths: list[str]
+    ) -> None:
+        image = image if image.mode == "RGB" else image.convert("RGB")
+
+        for variant, max_side in self.VARIANTS.items():
+            variant_path = self.get_path(blob_hash, "jpg", variant)
+            if os.path.exists(variant_path):
+                continue
+
+            variant_image = image.copy()
+            variant_image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            variant_image.save(buffer, format="JPEG", quality=self.VARIANT_QUALITY)
+            self._write_file(variant_path, buffer.getvalue())
+            new_paths.append(variant_path)
+
+    def put_many(
+        self,
+        conn: sqlite3.Connection,
+        datas: list[bytes],
+        new_paths: list[str] | None = None,
+    ) -> list[str]:
+        """Save images that aren't stored yet and return their hashes.
+
+        References are counted when images rows point to the hashes. Paths
+        of written files are appended to new_paths, so a caller can remove
+        them if its transaction is rolled back.
+        """
+        new_paths = [] if new_paths is None else new_paths
+        blob_hashes = [self.get_hash(data) for data in datas]
+
+        rows = {}
+        for blob_hash, data in zip(blob_hashes, datas):
+            if blob_hash in rows:
+                continue
+
+            with Image.open(io.BytesIO(data)) as image:
+                ext = "jpg" if image.format == "JPEG" else image.format.lower()
+                path = self.get_path(blob_hash, ext)
+                if not os.path.exists(path):
+                    self._write_file(path, data)
+                    new_paths.append(path)
+                self._write_variants(blob_hash, image, new_paths)
+
+            rows[blob_hash] = (blob_hash, ext, len(data))
+
+        conn.executemany(
+            "INSERT OR IGNORE INTO blobs (blob_hash, ext, size) VALUES (?, ?, ?)",
+            rows.values(),
+        )
+
+        return blob_hashes
+
+    def put(self, conn: sqlite3.Connection, data: bytes) -> str:
+        return self.put_many(conn, [data])[0]
+
+    def migrate(
+        self,
+        conn: sqlite3.Connection,
+        new_paths: list[str] | None = None,
+        batch_size: int = 1000,
+    ) -> None:
+        """Create tables of the store and move image_data of images into it.
+
+        Runs inside the caller's transaction. Images rows keep their ids,
+        reference counts are set once after all rows are moved.
+        """
+        for statement in self.SCHEMA:
+            conn.execute(statement)
+
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(images)")]
+        if "image_data" in columns:
+            conn.execute(self.IMAGES_SCHEMA.format(table="images_blobs"))
+
+            # Image data is read in batches, whole table may not fit in memory
+            last_image_id = -1
+            while True:
+                rows = conn.execute(
+                    "SELECT image_id, question_id, image_data, is_table, image_order "
+                    "FROM images WHERE image_id > ? ORDER BY image_id LIMIT ?",
+                    (last_image_id, batch_size),
+                ).fetchall()
+                if not rows:
+                    break
+
+                blob_hashes = self.put_many(conn, [row[2] for row in rows], new_paths)
+                conn.executemany(
+                    "INSERT INTO images_blobs VALUES (?, ?, ?, ?, ?)",
+                    (
+                        (*row[:2], blob_hash, *row[3:])
+                        for row, blob_hash in zip(rows, blob_hashes)
+                    ),
+                )
+                last_image_id = rows[-1][0]
+
+            conn.execute("DROP TABLE images")
+            conn.execute("ALTER TABLE images_blobs RENAME TO images")
+            conn.execute(
+                "UPDATE blobs SET ref_count = "
+                "(SELECT COUNT(*) FROM images WHERE images.blob_hash = blobs.blob_hash)"
+            )
+
+        for statement in self.TRIGGERS:
+            conn.execute(statement)
+
+    def read(
+        self, conn: sqlite3.Connection, blob_hash: str, variant: str | None = None
+    ) -> bytes:
+        (ext,) = conn.execute(
+            "SELECT ext FROM blobs WHERE blob_hash = ?", (blob_hash,)
+        ).fetchone()
+        with open(self.get_path(blob_hash, ext, variant), "rb") as blob_file:
+            return blob_file.read()
+
+    @staticmethod
+    def get_file_id(
+        conn: sqlite3.Connection, blob_hash: str, variant: str
+    ) -> str | None:
+        row = conn.execute(
+            "SELECT file_id FROM blob_file_ids WHERE blob_hash = ? AND variant = ?",
+            (blob_hash, variant),
+        ).fetchone()
+        return None if row is None else row[0]
+
+    @staticmethod
+    def set_file_id(
+        conn: sqlite3.Connection, blob_hash: str, variant: str, file_id: str
+    ) -> None:
+        # Telegram file id of uploaded variant, later sends reuse it
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO blob_file_ids (blob_hash, variant, file_id) "
+                "VALUES (?, ?, ?)",
+                (blob_hash, variant, file_id),
+            )
+
+    def collect_garbage(self, conn: sqlite3.Connection) -> int:
+        """Delete blobs without references and their files."""
+        removed_rows = []
+        with conn:
+            # Write lock is taken before select, so no reference comes between
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT blob_hash, ext FROM blobs WHERE ref_count <= 0"
+            ).fetchall()
+
+            for blob_hash, ext in rows:
+                conn.execute(
+                    "DELETE FROM blob_file_ids WHERE blob_hash = ? AND EXISTS "
+                    "(SELECT 1 FROM blobs WHERE blob_hash = ? AND ref_count <= 0)",
+                    (blob_hash, blob_hash),
+                )
+                cursor = conn.execute(
+                    "DELETE FROM blobs WHERE blob_hash = ? AND ref_count <= 0",
+                    (blob_hash,),
+                )
+                if cursor.rowcount:
+                    removed_rows.append((blob_hash, ext))
+
+        # Files are removed after rows, a failure leaves only unused files
+        for blob_hash, ext in removed_rows:
+            variant_paths = [
+                self.get_path(blob_hash, "jpg", variant) for variant in self.VARIANTS
+            ]
+            self.remove_files([self.get_path(blob_hash, ext)] + variant_paths)
+
+        return len(removed_rows)
+
+    @staticmethod
+    def remove_files(paths: list[str]) -> None:
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,393 @@
+import os
+import json
+import hashlib
+import sqlite3
+from typing import Iterable, Iterator
+
+from digitex.core.database.blobs import BlobStore
+from digitex.core.database.sampling import QuestionSampler
+from digitex.core.database.search import QuestionSearch
+from digitex.core.processors.file import FileProcessor
+
+
+class QuestionIngestor:
+    """Load digitized questions into tests.db in large batched transactions.
+
+    A record is a dict with subject, year, type, option, part, number, text
+    and optional specification, options ({"text", "is_correct"}), answers
+    and images ({"path" or "data", "is_table"}). Questions are keyed by part
+    and number and rewritten only if their content hash changed, so loading
+    the same book again doesn't add rows. Images go to a content-addressed
+    blob store, by default in "blobs" next to the database. Bulk loads drop
+    sampling indexes, full-text and sampling triggers and recreate them
+    once at the end, rebuilding the full-text index in one pass.
+    """
+
+    # Replacing children of a changed question deletes answers by question_id
+    INDEXES = {"idx_answers_question_id": "answers (question_id)"}
+    # Kept up to date row by row otherwise, bulk loads build them once
+    FTS_TRIGGERS = (
+        "questions_fts_insert",
+        "questions_fts_delete",
+        "questions_fts_update",
+    )
+
+    def __init__(
+        self,
+        db_path: str,
+        batch_size: int = 1000,
+        commit_size: int = 50000,
+        blob_store: BlobStore | None = None,
+    ) -> None:
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.commit_size = commit_size
+        self.blob_store = blob_store or BlobStore(
+            os.path.join(os.path.dirname(os.path.abspath(db_path)), "blobs")
+        )
+
+        self._reset_caches()
+
+    def _reset_caches(self) -> None:
+        self._ids = {}
+        self._part_questions = {}
+        self._next_question_id = None
+        self._new_blob_paths = []
+
+    def _connect(self) -> sqlite3.Connection:
+        # Transactions are opened and committed explicitly
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA cache_size = -65536")
+        return conn
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        # Databases created before content hashes get the column
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(questions)")]
+        if "content_hash" not in columns:
+            conn.execute(
+                "ALTER TABLE questions "
+                "ADD COLUMN content_hash TEXT NOT NULL DEFAULT ''"
+            )
+
+        # Index of content hashes was never queried
+        conn.execute("DROP INDEX IF EXISTS idx_questions_content_hash")
+        for index_name, index_columns in self.INDEXES.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {index_columns}")
+
+        # Databases created before the blob store keep image data in images
+        self.blob_store.migrate(conn, self._new_blob_paths)
+
+    def _drop_bulk_objects(self, conn: sqlite3.Connection) -> dict[str, list[str]]:
+        rows = conn.execute(
+            "SELECT type, name FROM sqlite_master WHERE type IN ('index', 'trigger')"
+        )
+        names = {name: object_type for object_type, name in rows}
+
+        dropped = {
+            "indexes": [
+                name for name in QuestionSampler.COVERING_INDEXES if name in names
+            ],
+            "fts_triggers": [name for name in self.FTS_TRIGGERS if name in names],
+            "sampling_triggers": [
+                name
+                for name, object_type in names.items()
+                if object_type == "trigger" and name.startswith("sampling_")
+            ],
+        }
+        for name in dropped["indexes"]:
+            conn.execute(f"DROP INDEX {name}")
+        for name in dropped["fts_triggers"] + dropped["sampling_triggers"]:
+            conn.execute(f"DROP TRIGGER {name}")
+
+        return dropped
+
+    @staticmethod
+    def _restore_bulk_objects(
+        conn: sqlite3.Connection, dropped: dict[str, list[str]]
+    ) -> None:
+        if dropped["indexes"]:
+            QuestionSampler.create_indexes(conn)
+
+        # Full-text index missed the whole load, so it is built again at once
+        if dropped["fts_triggers"]:
+            conn.executescript(QuestionSearch.get_schema())
+            QuestionSearch.rebuild(conn)
+
+        # Samplers reload buckets after one bump instead of one per row
+        if dropped["sampling_triggers"]:
+            QuestionSampler.create_version_triggers(conn)
+            with conn:
+                conn.execute("UPDATE sampling_version SET version = version + 1")
+
+    @staticmethod
+    def get_content_hash(record: dict, images: list[tuple[bytes, bool]]) -> str:
+        content = {
+            "text": record["text"],
+            "specification": record.get("specification"),
+            "options": [
+                [option["text"], bool(option.get("is_correct", False))]
+                for option in record.get("options", [])
+            ],
+            "answers": record.get("answers", []),
+            "images": [
+                [hashlib.sha256(data).hexdigest(), is_table]
+                for data, is_table in images
+            ],
+        }
+        content_json = json.dumps(content, sort_keys=True, ensure_ascii=False)
+
+        return hashlib.sha256(content_json.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _read_images(record: dict) -> list[tuple[bytes, bool]]:
+        images = []
+        for image in record.get("images", []):
+            if "data" in image:
+                data = image["data"]
+            else:
+                with open(image["path"], "rb") as image_file:
+                    data = image_file.read()
+            images.append((data, bool(image.get("is_table", False))))
+
+        return images
+
+    def _get_id(
+        self, conn: sqlite3.Connection, table: str, id_column: str, values: dict
+    ) -> int:
+        key = (table, *values.values())
+        if key in self._ids:
+            return self._ids[key]
+
+        columns = ", ".join(values)
+        placeholders = ", ".join("?" * len(values))
+        conditions = " AND ".join(f"{column} = ?" for column in values)
+        params = tuple(values.values())
+        conn.execute(
+            f"INSERT OR IGNORE INTO {table} ({columns}) VALUES ({placeholders})",
+            params,
+        )
+        row_id = conn.execute(
+            f"SELECT {id_column} FROM {table} WHERE {conditions}", params
+        ).fetchone()[0]
+
+        self._ids[key] = row_id
+        return row_id
+
+    def _get_part_id(self, conn: sqlite3.Connection, record: dict) -> int:
+        subject_id = self._get_id(
+            conn, "subjects", "subject_id", {"name": record["subject"]}
+        )
+        year_id = self._get_id(
+            conn,
+            "years",
+            "year_id",
+            {"subject_id": subject_id, "year_value": record["year"]},
+        )
+        type_id = self._get_id(
+            conn,
+            "types",
+            "type_id",
+            {"year_id": year_id, "type_number": record["type"]},
+        )
+        option_id = self._get_id(
+            conn,
+            "options",
+            "option_id",
+            {"type_id": type_id, "option_number": record["option"]},
+        )
+        return self._get_id(
+            conn,
+            "parts",
+            "part_id",
+            {"option_id": option_id, "part_type": record["part"]},
+        )
+
+    def _get_part_questions(
+        self, conn: sqlite3.Connection, part_id: int
+    ) -> dict[int, tuple[int, str]]:
+        # Existing questions are read once per part instead of once per row
+        if part_id not in self._part_questions:
+            rows = conn.execute(
+                "SELECT question_number, question_id, content_hash "
+                "FROM questions WHERE part_id = ?",
+                (part_id,),
+            )
+            self._part_questions[part_id] = {
+                number: (question_id, content_hash)
+                for number, question_id, content_hash in rows
+            }
+
+        return self._part_questions[part_id]
+
+    @staticmethod
+    def _new_rows() -> dict[str, list]:
+        return {
+            "insert": [],
+            "update": [],
+            "changed": [],
+            "options": [],
+            "answers": [],
+            "images": [],
+        }
+
+    @staticmethod
+    def _write_rows(conn: sqlite3.Connection, rows: dict[str, list]) -> None:
+        conn.executemany(
+            "INSERT INTO questions (question_id, part_id, question_number, text, "
+            "specification, content_hash) VALUES (?, ?, ?, ?, ?, ?)",
+            rows["insert"],
+        )
+        conn.executemany(
+            "UPDATE questions SET text = ?, specification = ?, content_hash = ? "
+            "WHERE question_id = ?",
+            rows["update"],
+        )
+
+        # Children of changed questions are replaced
+        for table in ("question_options", "answers", "images"):
+            conn.executemany(
+                f"DELETE FROM {table} WHERE question_id = ?", rows["changed"]
+            )
+        conn.executemany(
+            "INSERT INTO question_options (question_id, option_text, is_correct, "
+            "display_order) VALUES (?, ?, ?, ?)",
+            rows["options"],
+        )
+        conn.executemany(
+            "INSERT INTO answers (question_id, answer_text) VALUES (?, ?)",
+            rows["answers"],
+        )
+        conn.executemany(
+            "INSERT INTO images (question_id, blob_hash, is_table, image_order) "
+            "VALUES (?, ?, ?, ?)",
+            rows["images"],
+        )
+
+    def _ingest_batch(
+        self, conn: sqlite3.Connection, batch: list[dict], stats: dict[str, int]
+    ) -> None:
+        rows = self._new_rows()
+        batch_question_ids = set()
+
+        for record in batch:
+            part_id = self._get_part_id(conn, record)
+            part_questions = self._get_part_questions(conn, part_id)
+            images = self._read_images(record)
+            content_hash = self.get_content_hash(record, images)
+
+            number = record["number"]
+            question = part_questions.get(number)
+            if question is not None and question[1] == content_hash:
+                stats["unchanged"] += 1
+                continue
+
+            # Same question twice in batch, write first one before replacing it
+            if question is not None and question[0] in batch_question_ids:
+                self._write_rows(conn, rows)
+                rows = self._new_rows()
+                batch_question_ids = set()
+
+            question_row = (record["text"], record.get("specification"), content_hash)
+            if question is None:
+                question_id = self._next_question_id
+                self._next_question_id += 1
+                rows["insert"].append((question_id, part_id, number, *question_row))
+                stats["inserted"] += 1
+            else:
+                question_id = question[0]
+                rows["update"].append((*question_row, question_id))
+                rows["changed"].append((question_id,))
+                stats["updated"] += 1
+
+            part_questions[number] = (question_id, content_hash)
+            batch_question_ids.add(question_id)
+
+            rows["options"].extend(
+                (question_id, option["text"], bool(option.get("is_correct", False)), i)
+                for i, option in enumerate(record.get("options", []), start=1)
+            )
+            rows["answers"].extend(
+                (question_id, answer) for answer in record.get("answers", [])
+            )
+            # Images already in store are only referenced again
+            blob_hashes = self.blob_store.put_many(
+                conn, [data for data, _ in images], self._new_blob_paths
+            )
+            rows["images"].extend(
+                (question_id, blob_hash, is_table, i)
+                for i, (blob_hash, (_, is_table)) in enumerate(
+                    zip(blob_hashes, images), start=1
+                )
+            )
+
+        self._write_rows(conn, rows)
+
+    def _iter_batches(self, records: Iterable[dict]) -> Iterator[list[dict]]:
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+    def ingest(self, records: Iterable[dict], bulk: bool = True) -> dict[str, int]:
+        stats = {"inserted": 0, "updated": 0, "unchanged": 0}
+        self._reset_caches()
+
+        conn = self._connect()
+        dropped = None
+        try:
+            conn.execute("BEGIN")
+            self._migrate(conn)
+            bulk_dropped = self._drop_bulk_objects(conn) if bulk else None
+            conn.execute("COMMIT")
+            dropped = bulk_dropped
+            self._new_blob_paths = []
+
+            # Explicit ids let children rows be batched with their questions
+            self._next_question_id = conn.execute(
+                "SELECT COALESCE(MAX(question_id), 0) + 1 FROM questions"
+            ).fetchone()[0]
+
+            conn.execute("BEGIN")
+            num_pending = 0
+            for batch in self._iter_batches(records):
+                self._ingest_batch(conn, batch, stats)
+
+                num_pending += len(batch)
+                if num_pending >= self.commit_size:
+                    conn.execute("COMMIT")
+                    self._new_blob_paths = []
+                    conn.execute("BEGIN")
+                    num_pending = 0
+            conn.execute("COMMIT")
+            self._new_blob_paths = []
+
+        except BaseException:
+            # Blob files written in rolled back transaction have no rows
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self.blob_store.remove_files(self._new_blob_paths)
+            self._reset_caches()
+            raise
+
+        finally:
+            # Dropped objects come back after failed loads too
+            try:
+                if dropped is not None:
+                    self._restore_bulk_objects(conn, dropped)
+            finally:
+                conn.close()
+
+        return stats
+
+    def ingest_json(self, json_path: str, bulk: bool = True) -> dict[str, int]:
+        # JSON array or JSONL with one question per item, read item by item
+        return self.ingest(FileProcessor.iter_json_array(json_path), bulk=bulk)
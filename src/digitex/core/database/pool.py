@@ -0,0 +1,178 @@
+import queue
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+from digitex.core.database.sampling import QuestionSampler
+
+
+class ConnectionPool:
+    """Pool of read-only connections and one serialized writer for tests.db.
+
+    Database runs in WAL mode, so readers don't block the writer and see
+    the last committed state. Every connection keeps its own cache of
+    prepared statements, hot queries use constant SQL to hit it.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        num_readers: int = 4,
+        mmap_size: int = 256 * 1024 * 1024,
+        cache_size_kib: int = 32 * 1024,
+        cached_statements: int = 256,
+        timeout: float = 30.0,
+    ) -> None:
+        self.db_path = db_path
+        self.num_readers = num_readers
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+
+        self._write_lock = threading.Lock()
+        self._writer = self._connect(read_only=False)
+        self._writer.execute("PRAGMA journal_mode = WAL")
+        self._writer.execute("PRAGMA synchronous = NORMAL")
+
+        self._readers = queue.LifoQueue()
+        self._all_readers = []
+        for _ in range(num_readers):
+            conn = self._connect(read_only=True)
+            self._readers.put(conn)
+            self._all_readers.append(conn)
+
+    def _connect(self, read_only: bool) -> sqlite3.Connection:
+        if read_only:
+            conn = sqlite3.connect(
+                f"file:{self.db_path}?mode=ro",
+                uri=True,
+                timeout=self.timeout,
+                check_same_thread=False,
+                cached_statements=self.cached_statements,
+            )
+            conn.execute("PRAGMA query_only = ON")
+        else:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=self.timeout,
+                check_same_thread=False,
+                cached_statements=self.cached_statements,
+            )
+
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = {-int(self.cache_size_kib)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        # Waits for a free connection if all are taken
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        # Writes go one at a time in a transaction, committed on exit
+        with self._write_lock:
+            with self._writer:
+                yield self._writer
+
+    def close(self) -> None:
+        for conn in self._all_readers:
+            conn.close()
+        self._writer.close()
+
+    def __enter__(self) -> "ConnectionPool":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class TestsRepository:
+    """Hot read queries of the bot over a connection pool."""
+
+    QUESTION_BY_ID = (
+        "SELECT question_id, part_id, question_number, text, specification "
+        "FROM questions WHERE question_id = ?"
+    )
+    OPTIONS_BY_QUESTION = (
+        "SELECT option_text, is_correct, display_order FROM question_options "
+        "WHERE question_id = ? ORDER BY display_order"
+    )
+    ANSWERS_BY_QUESTION = "SELECT answer_text FROM answers WHERE question_id = ?"
+    IMAGES_BY_QUESTION = (
+        "SELECT blob_hash, is_table, image_order FROM images "
+        "WHERE question_id = ? ORDER BY image_order"
+    )
+    def __init__(
+        self, pool: ConnectionPool, sampler: QuestionSampler | None = None
+    ) -> None:
+        self.pool = pool
+        self._sampler = sampler
+
+    @property
+    def sampler(self) -> QuestionSampler:
+        if self._sampler is None:
+            self._sampler = QuestionSampler(self.pool)
+
+        return self._sampler
+
+    def get_question(self, question_id: int) -> tuple | None:
+        with self.pool.reader() as conn:
+            return conn.execute(self.QUESTION_BY_ID, (question_id,)).fetchone()
+
+    def get_options(self, question_id: int) -> list[tuple]:
+        with self.pool.reader() as conn:
+            return conn.execute(self.OPTIONS_BY_QUESTION, (question_id,)).fetchall()
+
+    def get_answers(self, question_id: int) -> list[str]:
+        with self.pool.reader() as conn:
+            rows = conn.execute(self.ANSWERS_BY_QUESTION, (question_id,))
+            return [answer_text for (answer_text,) in rows]
+
+    def get_images(self, question_id: int) -> list[tuple]:
+        with self.pool.reader() as conn:
+            return conn.execute(self.IMAGES_BY_QUESTION, (question_id,)).fetchall()
+
+    def get_question_bundle(self, question_id: int) -> dict | None:
+        # One checkout for all queries of a question shown to the student
+        with self.pool.reader() as conn:
+            question = conn.execute(self.QUESTION_BY_ID, (question_id,)).fetchone()
+            if question is None:
+                return None
+
+            return {
+                "question": question,
+                "options": conn.execute(
+                    self.OPTIONS_BY_QUESTION, (question_id,)
+                ).fetchall(),
+                "answers": [
+                    answer_text
+                    for (answer_text,) in conn.execute(
+                        self.ANSWERS_BY_QUESTION, (question_id,)
+                    )
+                ],
+                "images": conn.execute(
+                    self.IMAGES_BY_QUESTION, (question_id,)
+                ).fetchall(),
+            }
+
+    def get_random_test(
+        self,
+        subject: str,
+        year: int,
+        part: str,
+        num_questions: int,
+        rng: random.Random | None = None,
+    ) -> list[int]:
+        # Buckets are reloaded only if questions moved since the last test
+        self.sampler.refresh()
+        return self.sampler.get_test(subject, year, part, num_questions, rng=rng)
@@ -0,0 +1,242 @@
+import random
+import sqlite3
+import threading
+from array import array
+from collections import deque
+from typing import TYPE_CHECKING
+
+# Pool module builds its repository on the sampler
+if TYPE_CHECKING:
+    from digitex.core.database.pool import ConnectionPool
+
+
+class QuestionSampler:
+    """Random tests of tests.db questions sampled from in-memory buckets.
+
+    Question ids of every (subject, year, option, part) bucket and of every
+    (subject, year, part) bucket over all options are read once through
+    covering indexes into dense arrays. A test of N questions is sampled
+    without replacement in O(N), no matter how large the bucket is.
+    Optionally a background thread keeps a pool of ready test variants and
+    reloads buckets when questions change. Changes are detected by a
+    version counter which triggers bump on every write that moves
+    question ids between buckets.
+    """
+
+    # Indexes covering bucket query, so it doesn't touch table rows
+    COVERING_INDEXES = {
+        "idx_sampling_years": "years (subject_id, year_value, year_id)",
+        "idx_sampling_types": "types (year_id, type_id)",
+        "idx_sampling_options": "options (type_id, option_number, option_id)",
+        "idx_sampling_parts": "parts (option_id, part_type, part_id)",
+        "idx_sampling_questions": "questions (part_id, question_id)",
+    }
+    BUCKETS_QUERY = """
+        SELECT s.name, y.year_value, o.option_number, p.part_type, q.question_id
+        FROM subjects s
+        JOIN years y ON y.subject_id = s.subject_id
+        JOIN types t ON t.year_id = y.year_id
+        JOIN options o ON o.type_id = t.type_id
+        JOIN parts p ON p.option_id = o.option_id
+        JOIN questions q ON q.part_id = p.part_id
+    """
+    VERSION_QUERY = "SELECT version FROM sampling_version"
+
+    # Columns of bucket query, updates of other columns keep buckets
+    BUCKET_COLUMNS = {
+        "subjects": "name",
+        "years": "subject_id, year_value",
+        "types": "year_id",
+        "options": "type_id, option_number",
+        "parts": "option_id, part_type",
+        "questions": "part_id",
+    }
+
+    @classmethod
+    def create_indexes(cls, conn: sqlite3.Connection) -> None:
+        with conn:
+            for index_name, index_columns in cls.COVERING_INDEXES.items():
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {index_name} ON {index_columns}"
+                )
+
+    @classmethod
+    def create_version_triggers(cls, conn: sqlite3.Connection) -> None:
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sampling_version "
+                "(version INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "INSERT INTO sampling_version (version) SELECT 0 "
+                "WHERE NOT EXISTS (SELECT 1 FROM sampling_version)"
+            )
+
+            for table, columns in cls.BUCKET_COLUMNS.items():
+                for event in ("INSERT", f"UPDATE OF {columns}", "DELETE"):
+                    trigger_name = f"sampling_{table}_{event.split()[0].lower()}"
+                    conn.execute(
+                        f"CREATE TRIGGER IF NOT EXISTS {trigger_name} "
+                        f"AFTER {event} ON {table} BEGIN "
+                        "UPDATE sampling_version SET version = version + 1; END"
+                    )
+
+    @staticmethod
+    def sample_indices(size: int, num_samples: int, rng: random.Random) -> list[int]:
+        # Floyd's algorithm: num_samples draws, no copy of population
+        selected = set()
+        for j in range(size - num_samples, size):
+            i = rng.randint(0, j)
+            selected.add(j if i in selected else i)
+
+        indices = list(selected)
+        rng.shuffle(indices)
+        return indices
+
+    def __init__(
+        self,
+        pool: "ConnectionPool",
+        num_variants: int = 0,
+        refresh_interval: float = 60.0,
+        rng: random.Random | None = None,
+    ) -> None:
+        self.pool = pool
+        self.num_variants = num_variants
+        self.refresh_interval = refresh_interval
+        self.rng = rng or random.Random()
+        self._variants_rng = random.Random(self.rng.random())
+
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._version = None
+        self._variants = {}
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        # Databases created before the counter get it on first use
+        with self.pool.writer() as conn:
+            self.create_version_triggers(conn)
+
+        self.refresh()
+        if num_variants > 0:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    @staticmethod
+    def get_key(
+        subject: str, year: int, part: str, option: int | None = None
+    ) -> tuple:
+        return subject, year, option, part
+
+    def _load_buckets(self, conn: sqlite3.Connection) -> dict[tuple, array]:
+        buckets = {}
+        for subject, year, option, part, question_id in conn.execute(
+            self.BUCKETS_QUERY
+        ):
+            for key in (
+                self.get_key(subject, year, part, option),
+                self.get_key(subject, year, part),
+            ):
+                bucket = buckets.get(key)
+                if bucket is None:
+                    bucket = buckets[key] = array("q")
+                bucket.append(question_id)
+
+        return buckets
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reload buckets if questions were added, moved or removed."""
+        with self.pool.reader() as conn:
+            version = conn.execute(self.VERSION_QUERY).fetchone()
+            if not force and version == self._version:
+                return False
+            buckets = self._load_buckets(conn)
+
+        # Ready variants were sampled from old buckets
+        with self._lock:
+            self._buckets = buckets
+            self._version = version
+            for variants in self._variants.values():
+                variants.clear()
+
+        return True
+
+    def get_bucket_size(
+        self, subject: str, year: int, part: str, option: int | None = None
+    ) -> int:
+        bucket = self._buckets.get(self.get_key(subject, year, part, option))
+        return 0 if bucket is None else len(bucket)
+
+    def _sample(
+        self, key: tuple, num_questions: int, rng: random.Random
+    ) -> list[int]:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return []
+
+        num_questions = min(num_questions, len(bucket))
+        return [bucket[i] for i in self.sample_indices(len(bucket), num_questions, rng)]
+
+    def get_test(
+        self,
+        subject: str,
+        year: int,
+        part: str,
+        num_questions: int,
+        option: int | None = None,
+        rng: random.Random | None = None,
+    ) -> list[int]:
+        """Return ids of a random test, taken from ready variants if any."""
+        key = self.get_key(subject, year, part, option)
+
+        if self.num_variants > 0 and rng is None:
+            with self._lock:
+                variants = self._variants.setdefault(
+                    (key, num_questions), deque(maxlen=self.num_variants)
+                )
+                if variants:
+                    return variants.popleft()
+
+        return self._sample(key, num_questions, rng or self.rng)
+
+    def _fill_variants(self) -> None:
+        # Only test shapes asked for at least once are pre-generated
+        with self._lock:
+            version = self._version
+            shapes = [
+                (key, num_questions, self.num_variants - len(variants))
+                for (key, num_questions), variants in self._variants.items()
+            ]
+
+        for key, num_questions, num_missing in shapes:
+            tests = [
+                self._sample(key, num_questions, self._variants_rng)
+                for _ in range(num_missing)
+            ]
+            with self._lock:
+                # Buckets were reloaded while sampling, tests may be stale
+                if self._version != version:
+                    return
+                self._variants[(key, num_questions)].extend(tests)
+
+    def _run(self) -> None:
+        last_refresh = 0.0
+        while not self._stop_event.wait(0.1):
+            last_refresh += 0.1
+            if last_refresh >= self.refresh_interval:
+                last_refresh = 0.0
+                self.refresh()
+            self._fill_variants()
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "QuestionSampler":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
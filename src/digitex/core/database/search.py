@@ -0,0 +1,259 @@
+import re
+import sqlite3
+
+
+class QuestionSearch:
+    """FTS5 full-text search over question text of tests.db.
+
+    The index reads questions through a view with "ё" folded to "е" and is
+    kept in sync by triggers. unicode61 tokenizer folds case of Cyrillic,
+    Russian word endings are cut from query terms, which are then matched
+    as prefixes, so different word forms find each other. Stems with a
+    fleeting vowel ("клеток", "клетка") also match their other form.
+    Snippets are cut from the original text, not from the folded one.
+    """
+
+    # Longest endings go first, so the longest matching one is cut
+    RU_ENDINGS = sorted(
+        (
+            "иями ями ами ией ого его ому ему ыми ими ых их ая яя ое ее ые ие "
+            "ой ей ий ый ом ем ам ям ах ях ов ев ую юю ия ья ть ся сь ет ит ут ют "
+            "ат ят ешь ишь а я о е ы и у ю ь"
+        ).split(),
+        key=len,
+        reverse=True,
+    )
+    MIN_STEM_LEN = 3
+    RU_CONSONANTS = "бвгджзклмнпрстфхцчшщ"
+    FLEETING_VOWELS = "ое"
+
+    # Marks of matched tokens in highlighted text, never found in questions
+    MATCH_MARKS = ("\x02", "\x03")
+
+    @staticmethod
+    def _fold_sql(column: str) -> str:
+        return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+    @classmethod
+    def get_schema(cls) -> str:
+        text, spec = cls._fold_sql("text"), cls._fold_sql("specification")
+        new_text = cls._fold_sql("new.text")
+        new_spec = cls._fold_sql("new.specification")
+        old_text = cls._fold_sql("old.text")
+        old_spec = cls._fold_sql("old.specification")
+
+        return f"""
+            CREATE VIEW IF NOT EXISTS questions_fts_content AS
+            SELECT question_id, {text} AS text, {spec} AS specification
+            FROM questions;
+
+            CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+                text,
+                specification,
+                content = 'questions_fts_content',
+                content_rowid = 'question_id',
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3 4'
+            );
+
+            CREATE TRIGGER IF NOT EXISTS questions_fts_insert
+            AFTER INSERT ON questions BEGIN
+                INSERT INTO questions_fts (rowid, text, specification)
+                VALUES (new.question_id, {new_text}, {new_spec});
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS questions_fts_delete
+            AFTER DELETE ON questions BEGIN
+                INSERT INTO questions_fts (questions_fts, rowid, text, specification)
+                VALUES ('delete', old.question_id, {old_text}, {old_spec});
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS questions_fts_update
+            AFTER UPDATE OF text, specification ON questions BEGIN
+                INSERT INTO questions_fts (questions_fts, rowid, text, specification)
+                VALUES ('delete', old.question_id, {old_text}, {old_spec});
+                INSERT INTO questions_fts (rowid, text, specification)
+                VALUES (new.question_id, {new_text}, {new_spec});
+            END;
+        """
+
+    @classmethod
+    def create_index(cls, conn: sqlite3.Connection) -> None:
+        is_created = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'questions_fts'"
+        ).fetchone()
+        conn.executescript(cls.get_schema())
+
+        # Index questions loaded before the index existed
+        if not is_created:
+            cls.rebuild(conn)
+
+    @staticmethod
+    def rebuild(conn: sqlite3.Connection) -> None:
+        with conn:
+            conn.execute("INSERT INTO questions_fts (questions_fts) VALUES ('rebuild')")
+
+    @staticmethod
+    def optimize(conn: sqlite3.Connection) -> None:
+        # Merge index segments after bulk loads
+        with conn:
+            conn.execute(
+                "INSERT INTO questions_fts (questions_fts) VALUES ('optimize')"
+            )
+
+    @classmethod
+    def stem(cls, word: str) -> str:
+        for ending in cls.RU_ENDINGS:
+            if word.endswith(ending) and len(word) - len(ending) >= cls.MIN_STEM_LEN:
+                return word[: -len(ending)]
+
+        return word
+
+    @classmethod
+    def get_stem_variants(cls, stem: str) -> list[str]:
+        # Fleeting vowel drops in some forms: "клеток" -> "клетк", "клетк" -> "клеток"
+        if len(stem) < cls.MIN_STEM_LEN:
+            return []
+        is_consonant = [char in cls.RU_CONSONANTS for char in stem[-3:]]
+
+        if is_consonant == [True, False, True] and stem[-2] in cls.FLEETING_VOWELS:
+            return [stem[:-2] + stem[-1]]
+        if is_consonant[-2:] == [True, True]:
+            return [stem[:-1] + vowel + stem[-1] for vowel in cls.FLEETING_VOWELS]
+
+        return []
+
+    @classmethod
+    def build_match_query(cls, query: str) -> str | None:
+        # Every word must be found, as a prefix of its stem or of a variant
+        words = re.findall(r"\w+", query.lower().replace("ё", "е"))
+        if not words:
+            return None
+
+        terms = []
+        for word in words:
+            stem = cls.stem(word)
+            stems = [stem, *cls.get_stem_variants(stem)]
+            terms.append("(" + " OR ".join(f'"{stem}"*' for stem in stems) + ")")
+
+        return " AND ".join(terms)
+
+    @classmethod
+    def get_match_spans(cls, marked_text: str) -> list[tuple[int, int]]:
+        # Positions of marked tokens in text without marks
+        spans = []
+        num_marks = 0
+        for match in re.finditer("|".join(cls.MATCH_MARKS), marked_text):
+            position = match.start() - num_marks
+            if match.group() == cls.MATCH_MARKS[0]:
+                spans.append([position, position])
+            else:
+                spans[-1][1] = position
+            num_marks += 1
+
+        return [tuple(span) for span in spans]
+
+    @staticmethod
+    def build_snippet(
+        text: str,
+        spans: list[tuple[int, int]],
+        highlight: tuple[str, str],
+        num_tokens: int,
+    ) -> str:
+        """Cut num_tokens words of text around first match and mark matches."""
+        words = [match.span() for match in re.finditer(r"\w+", text)]
+        if not words:
+            return text
+
+        # Window starts a quarter before first matched word
+        first_idx = 0
+        if spans:
+            first_idx = next(
+                (i for i, (_, end) in enumerate(words) if end > spans[0][0]), 0
+            )
+        start_idx = max(0, min(first_idx - num_tokens // 4, len(words) - num_tokens))
+        end_idx = min(len(words), start_idx + num_tokens)
+        start = words[start_idx][0] if start_idx > 0 else 0
+        end = words[end_idx - 1][1] if end_idx < len(words) else len(text)
+
+        parts = ["…"] if start_idx > 0 else []
+        position = start
+        for span_start, span_end in spans:
+            span_start, span_end = max(span_start, start), min(span_end, end)
+            if span_start >= span_end:
+                continue
+            parts += [text[position:span_start], highlight[0]]
+            parts += [text[span_start:span_end], highlight[1]]
+            position = span_end
+        parts.append(text[position:end])
+        if end_idx < len(words):
+            parts.append("…")
+
+        return "".join(parts)
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+
+    def search(
+        self,
+        query: str,
+        subject: str | None = None,
+        year: int | None = None,
+        option: int | None = None,
+        part: str | None = None,
+        limit: int = 20,
+        highlight: tuple[str, str] = ("<b>", "</b>"),
+        snippet_tokens: int = 12,
+    ) -> list[dict]:
+        """Return ranked question ids with highlighted snippets of text."""
+        match_query = self.build_match_query(query)
+        if match_query is None:
+            return []
+
+        # Filters by metadata of the question hierarchy
+        filters = {
+            "s.name": subject,
+            "y.year_value": year,
+            "o.option_number": option,
+            "p.part_type": part,
+        }
+        conditions = ["questions_fts MATCH ?"]
+        params = [*self.MATCH_MARKS, match_query]
+        for column, value in filters.items():
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        params.append(limit)
+
+        rows = self.conn.execute(
+            f"""
+            SELECT
+                questions_fts.rowid,
+                q.text,
+                highlight(questions_fts, 0, ?, ?),
+                bm25(questions_fts, 1.0, 0.5) AS rank
+            FROM questions_fts
+            JOIN questions q ON q.question_id = questions_fts.rowid
+            JOIN parts p ON p.part_id = q.part_id
+            JOIN options o ON o.option_id = p.option_id
+            JOIN types t ON t.type_id = o.type_id
+            JOIN years y ON y.year_id = t.year_id
+            JOIN subjects s ON s.subject_id = y.subject_id
+            WHERE {" AND ".join(conditions)}
+            ORDER BY rank
+            LIMIT ?
+            """,
+            params,
+        )
+
+        # Folding keeps length of text, so marks map to the original text
+        return [
+            {
+                "question_id": question_id,
+                "snippet": self.build_snippet(
+                    text, self.get_match_spans(marked_text), highlight, snippet_tokens
+                ),
+                "rank": rank,
+            }
+            for question_id, text, marked_text, rank in rows
+        ]
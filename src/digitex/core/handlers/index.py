@@ -0,0 +1,159 @@
+import os
+import json
+import hashlib
+import sqlite3
+
+
+class ConversionIndex:
+    """SQLite index of converted source images and known target images.
+
+    sources keeps content hash and number of outputs of every converted
+    task, so unchanged tasks are skipped and outputs of changed or removed
+    tasks can be found. Content hashes of source files are cached with
+    their stat, so only new or modified files are read. Filenames found in
+    the target export are cached with the export file stat and read again
+    only after the export changed.
+    """
+
+    def __init__(self, index_path: str) -> None:
+        self.index_path = index_path
+
+        self._conn = sqlite3.connect(index_path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sources (
+                filename TEXT PRIMARY KEY,
+                task_hash TEXT NOT NULL,
+                num_outputs INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                file_hash TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS exports (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS exist_filenames (
+                filename TEXT PRIMARY KEY
+            );
+            """
+        )
+
+        self._pending = []
+        self._removed = []
+        self._pending_files = []
+
+    def get_file_hash(self, file_path: str, chunk_size: int = 1 << 20) -> str:
+        # File is read again only if its stat differs from the cached one
+        stat = os.stat(file_path)
+        row = self._conn.execute(
+            "SELECT size, mtime_ns, file_hash FROM files WHERE path = ?",
+            (file_path,),
+        ).fetchone()
+        if row is not None and row[:2] == (stat.st_size, stat.st_mtime_ns):
+            return row[2]
+
+        file_hash = hashlib.sha1()
+        with open(file_path, "rb") as file:
+            while chunk := file.read(chunk_size):
+                file_hash.update(chunk)
+        file_hash = file_hash.hexdigest()
+
+        self._pending_files.append(
+            (file_path, stat.st_size, stat.st_mtime_ns, file_hash)
+        )
+
+        return file_hash
+
+    def get_hash(self, data: dict, file_path: str | None = None) -> str:
+        content = json.dumps(data, sort_keys=True, ensure_ascii=False)
+        if file_path is not None and os.path.exists(file_path):
+            content += "|" + self.get_file_hash(file_path)
+
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+    def is_converted(self, filename: str, task_hash: str) -> bool:
+        row = self._conn.execute(
+            "SELECT task_hash FROM sources WHERE filename = ?", (filename,)
+        ).fetchone()
+
+        return row is not None and row[0] == task_hash
+
+    def get_num_outputs(self) -> dict[str, int]:
+        rows = self._conn.execute("SELECT filename, num_outputs FROM sources")
+        return dict(rows)
+
+    def add(self, filename: str, task_hash: str, num_outputs: int) -> None:
+        # Stored on commit together with written output
+        self._pending.append((filename, task_hash, num_outputs))
+
+    def remove(self, filename: str) -> None:
+        self._removed.append((filename,))
+
+    def commit(self) -> None:
+        with self._conn:
+            self._conn.executemany(
+                "DELETE FROM sources WHERE filename = ?", self._removed
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?, ?)", self._pending
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                self._pending_files,
+            )
+        self._pending = []
+        self._removed = []
+        self._pending_files = []
+
+    def rollback(self) -> None:
+        self._pending = []
+        self._removed = []
+        self._pending_files = []
+
+    def clear(self) -> None:
+        with self._conn:
+            self._conn.execute("DELETE FROM sources")
+            self._conn.execute("DELETE FROM exports")
+            self._conn.execute("DELETE FROM exist_filenames")
+        self._pending = []
+        self._removed = []
+
+    def export_is_changed(self, export_path: str) -> bool:
+        if not os.path.exists(export_path):
+            return False
+
+        stat = os.stat(export_path)
+        row = self._conn.execute(
+            "SELECT size, mtime_ns FROM exports WHERE path = ?", (export_path,)
+        ).fetchone()
+
+        return row != (stat.st_size, stat.st_mtime_ns)
+
+    def update_export(self, export_path: str, filenames) -> None:
+        stat = os.stat(export_path)
+        with self._conn:
+            # Export lists all target images, names missing in it are gone
+            self._conn.execute("DELETE FROM exist_filenames")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO exist_filenames VALUES (?)",
+                ((filename,) for filename in filenames),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO exports VALUES (?, ?, ?)",
+                (export_path, stat.st_size, stat.st_mtime_ns),
+            )
+
+    def is_exist(self, filename: str) -> bool:
+        row = self._conn.execute(
+            "SELECT 1 FROM exist_filenames WHERE filename = ?", (filename,)
+        ).fetchone()
+
+        return row is not None
+
+    def close(self) -> None:
+        self._conn.close()
@@ -43,6 +43,24 @@ class LabelHandler:
 
         return rand_points_idx, rand_points
 
+    @staticmethod
+    def filter_points(
+        classes_dict: dict[int, str],
+        points_dict: dict[int, list],
+        target_classes: list[str],
+    ) -> list[tuple[int, int, list[float]]]:
+        all_points = []
+
+        # Collect class index, points index and points of target classes
+        for class_idx, points in points_dict.items():
+            if classes_dict[class_idx] not in target_classes:
+                continue
+
+            for points_idx, point in enumerate(points):
+                all_points.append((class_idx, points_idx, point))
+
+        return all_points
+
     @staticmethod
     def get_random_label(image_name: str, labels_dir: str) -> str:
         label_name = os.path.splitext(image_name)[0] + ".txt"
@@ -82,3 +100,25 @@ class LabelHandler:
         )
 
         return rand_points_idx, rand_points
+
+    def get_all_points(
+        self,
+        image_name: str,
+        labels_dir: str,
+        classes_dict: dict[int, str],
+        target_classes: list[str],
+    ) -> list[tuple[int, int, list[float]]]:
+        _, label_path = self.get_random_label(
+            image_name=image_name, labels_dir=labels_dir
+        )
+
+        if label_path is None:
+            return []
+
+        points_dict = self._read_points(label_path)
+
+        return self.filter_points(
+            classes_dict=classes_dict,
+            points_dict=points_dict,
+            target_classes=target_classes,
+        )
@@ -0,0 +1,68 @@
+import os
+import re
+
+
+class NameAllocator:
+    """Unique "{stem}_aug_{n}" names allocated from one scan of a directory.
+
+    The last used n of every stem is read once, new names come from
+    counters in memory. Parallel workers share the scanned counters and
+    reserve disjoint numbers: worker i of num_workers takes every
+    num_workers-th number starting from offset i.
+    """
+
+    def __init__(
+        self,
+        dir_path: str,
+        ext: str,
+        counters: dict[str, int] | None = None,
+        worker_idx: int = 0,
+        num_workers: int = 1,
+        suffix: str = "_aug_",
+    ) -> None:
+        if not 0 <= worker_idx < num_workers:
+            raise ValueError("worker_idx must be in range [0, num_workers).")
+
+        self.dir_path = dir_path
+        self.ext = ext
+        self.worker_idx = worker_idx
+        self.num_workers = num_workers
+        self.suffix = suffix
+
+        if counters is None:
+            counters = self.scan(dir_path, ext, suffix)
+        self.counters = counters
+
+        self._num_allocated = {}
+
+    @staticmethod
+    def scan(dir_path: str, ext: str, suffix: str = "_aug_") -> dict[str, int]:
+        # Largest used number of every stem
+        pattern = re.compile(rf"^(.*){re.escape(suffix)}(\d+){re.escape(ext)}$")
+
+        counters = {}
+        if not os.path.isdir(dir_path):
+            return counters
+
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                match = pattern.match(entry.name)
+                if match is None:
+                    continue
+
+                stem, number = match.group(1), int(match.group(2))
+                counters[stem] = max(counters.get(stem, 0), number)
+
+        return counters
+
+    def allocate(self, stem: str) -> str:
+        num_allocated = self._num_allocated.get(stem, 0)
+        self._num_allocated[stem] = num_allocated + 1
+
+        number = (
+            self.counters.get(stem, 0)
+            + 1
+            + self.worker_idx
+            + num_allocated * self.num_workers
+        )
+        return f"{stem}{self.suffix}{number}"
@@ -42,6 +42,49 @@ class PDFHandler:
 
         return image
 
+    def get_page_tile(
+        self, page: pdfium.PdfPage, scale: float, box: tuple[int, int, int, int]
+    ) -> Image.Image:
+        # Box is (left, top, right, bottom) in pixels of the page rendered at scale
+        left, top, right, bottom = box
+        page_width, page_height = page.get_size()
+        crop = (
+            left / scale,
+            page_height - bottom / scale,
+            page_width - right / scale,
+            top / scale,
+        )
+
+        # pdfium renders only the cropped area of the page
+        bitmap = page.render(scale=scale, rotation=0, crop=crop)
+        image = bitmap.to_pil()
+
+        image = image if image.mode == "RGB" else image.convert("RGB")
+
+        return image
+
+    def get_page_count(self, pdf_path: str) -> int:
+        pdf_obj = self.open_pdf(pdf_path)
+        page_count = len(pdf_obj)
+        pdf_obj.close()
+
+        return page_count
+
+    def get_image(
+        self, pdf_name: str, pdf_dir: str, page_idx: int, dpi: int = 96
+    ) -> tuple[Image.Image, str]:
+        pdf_path = os.path.join(pdf_dir, pdf_name)
+        pdf_obj = self.open_pdf(pdf_path)
+
+        # Get image of the page and name
+        image = self.get_page_image(page=pdf_obj[page_idx], dpi=dpi)
+        image_name = os.path.splitext(pdf_name)[0] + ".jpg"
+
+        # Close pdf file-object
+        pdf_obj.close()
+
+        return image, image_name
+
     def get_random_image(
         self, pdf_listdir: list[str], pdf_dir: str
     ) -> tuple[str, int, Image.Image]:
@@ -0,0 +1,176 @@
+import os
+import io
+import json
+import uuid
+import tarfile
+import threading
+
+
+class TarShardWriter:
+    """Append files to WebDataset-style tar shards with a JSONL index.
+
+    Every shard gets its own index file, so several writers (processes)
+    can fill the same directory if they use different prefixes.
+    """
+
+    SHARD_EXT = ".tar"
+    INDEX_EXT = ".idx.jsonl"
+
+    def __init__(
+        self, shards_dir: str, max_shard_files: int = 10000, prefix: str = None
+    ) -> None:
+        self.shards_dir = shards_dir
+        self.max_shard_files = max_shard_files
+        self.prefix = prefix if prefix is not None else uuid.uuid4().hex[:8]
+
+        os.makedirs(shards_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._shard_idx = 0
+        self._tar = None
+        self._index_file = None
+        self._num_files = 0
+
+    def _open_shard(self) -> None:
+        # Find shard name that isn't used by previous runs
+        while True:
+            shard_name = f"{self.prefix}-{self._shard_idx:06d}"
+            shard_path = os.path.join(self.shards_dir, shard_name + self.SHARD_EXT)
+            if not os.path.exists(shard_path):
+                break
+            self._shard_idx += 1
+
+        index_path = os.path.join(self.shards_dir, shard_name + self.INDEX_EXT)
+        self._tar = tarfile.open(shard_path, "w")
+        self._index_file = open(index_path, "w", encoding="utf-8")
+        self._shard_name = shard_name + self.SHARD_EXT
+        self._num_files = 0
+
+    def _close_shard(self) -> None:
+        if self._tar is None:
+            return
+
+        self._tar.close()
+        self._index_file.close()
+        self._tar = None
+        self._index_file = None
+        self._shard_idx += 1
+
+    def write(self, name: str, data: bytes) -> None:
+        with self._lock:
+            if self._tar is None:
+                self._open_shard()
+
+            # Add member, its data ends padded to a block at the tar offset
+            tarinfo = tarfile.TarInfo(name)
+            tarinfo.size = len(data)
+            self._tar.addfile(tarinfo, io.BytesIO(data))
+            num_blocks = -(-tarinfo.size // tarfile.BLOCKSIZE)
+            offset = self._tar.offset - num_blocks * tarfile.BLOCKSIZE
+            self._tar.fileobj.flush()
+
+            # Index line is flushed after member, so it implies complete data
+            entry = {
+                "name": name,
+                "shard": self._shard_name,
+                "offset": offset,
+                "size": tarinfo.size,
+            }
+            self._index_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._index_file.flush()
+            self._num_files += 1
+
+            if self._num_files >= self.max_shard_files:
+                self._close_shard()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._tar is not None:
+                self._tar.fileobj.flush()
+                self._index_file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_shard()
+
+
+class TarShardReader:
+    def __init__(self, shards_dir: str) -> None:
+        self.shards_dir = shards_dir
+        self._index = None
+
+    @staticmethod
+    def is_sharded(dir: str) -> bool:
+        if not os.path.isdir(dir):
+            return False
+
+        return any(
+            filename.endswith(TarShardWriter.INDEX_EXT) for filename in os.listdir(dir)
+        )
+
+    @property
+    def index(self) -> dict[str, dict]:
+        if self._index is None:
+            self._index = self._read_index()
+
+        return self._index
+
+    def _read_index(self) -> dict[str, dict]:
+        index = {}
+
+        for filename in sorted(os.listdir(self.shards_dir)):
+            if not filename.endswith(TarShardWriter.INDEX_EXT):
+                continue
+
+            index_path = os.path.join(self.shards_dir, filename)
+            with open(index_path, "r", encoding="utf-8") as index_file:
+                for line in index_file:
+                    # Skip line cut by interrupted writer
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    index[entry["name"]] = entry
+
+        return index
+
+    def listdir(self) -> list[str]:
+        return list(self.index.keys())
+
+    def exists(self, name: str) -> bool:
+        return name in self.index
+
+    def read(self, name: str) -> bytes:
+        entry = self.index[name]
+        shard_path = os.path.join(self.shards_dir, entry["shard"])
+
+        with open(shard_path, "rb") as shard_file:
+            shard_file.seek(entry["offset"])
+            data = shard_file.read(entry["size"])
+
+        return data
+
+    def copy(self, name: str, dst_path: str) -> None:
+        with open(dst_path, "wb") as dst_file:
+            dst_file.write(self.read(name))
+
+    def __iter__(self):
+        # Read shards sequentially in order of offsets
+        entries = sorted(
+            self.index.values(), key=lambda entry: (entry["shard"], entry["offset"])
+        )
+
+        shard_file = None
+        shard_name = None
+        for entry in entries:
+            if entry["shard"] != shard_name:
+                if shard_file is not None:
+                    shard_file.close()
+                shard_name = entry["shard"]
+                shard_file = open(os.path.join(self.shards_dir, shard_name), "rb")
+
+            shard_file.seek(entry["offset"])
+            yield entry["name"], shard_file.read(entry["size"])
+
+        if shard_file is not None:
+            shard_file.close()
@@ -0,0 +1,256 @@
+import os
+import json
+import uuid
+import errno
+import shutil
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tqdm import tqdm
+
+from digitex.core.handlers.shard import TarShardReader
+
+
+class SplitAssigner:
+    """Stable splits from a salted hash of every key.
+
+    A key falls into a split by where its hash lands among cumulative
+    fractions of splits, so its split doesn't depend on other keys and
+    doesn't change when data is added. Keys are image IDs (file names or
+    paths relative to raw dir), renamed images are new images.
+    """
+
+    def __init__(self, fractions: dict[str, float], salt: str = "") -> None:
+        if any(fraction < 0 for fraction in fractions.values()):
+            raise ValueError("fractions must be non-negative.")
+        if sum(fractions.values()) > 1 + 1e-9:
+            raise ValueError("fractions must sum to at most 1.")
+
+        self.fractions = fractions
+        self.salt = salt
+
+        # Upper bounds of splits on [0, 1)
+        self.bounds = []
+        total = 0.0
+        for split, fraction in fractions.items():
+            total += fraction
+            self.bounds.append((total, split))
+
+    def get_position(self, key: str) -> float:
+        digest = hashlib.sha256(f"{self.salt}{key}".encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big") / 2**64
+
+    def assign(self, key: str) -> str | None:
+        # None if fractions don't cover the position of key
+        position = self.get_position(key)
+        for bound, split in self.bounds:
+            if position < bound:
+                return split
+
+        return None
+
+    def split(self, keys) -> dict[str, list[str]]:
+        """Keys of every split, in the order they are given."""
+        splits = {split: [] for split in self.fractions}
+        for key in keys:
+            split = self.assign(key)
+            if split is not None:
+                splits[split].append(key)
+
+        return splits
+
+
+class DatasetPartitioner:
+    """Place files of dataset splits by links instead of copies.
+
+    "auto" tries a hardlink, then a reflink (copy-on-write clone), then a
+    copy. Other modes try only the given link before copying. Files are
+    placed by a thread pool. Linked dataset files share data with raw
+    files, so they must be replaced, not rewritten in place. place()
+    replaces an existing dst atomically.
+    """
+
+    MODES = ("auto", "hardlink", "reflink", "symlink", "copy")
+
+    # ioctl of Linux filesystems with copy-on-write clones (btrfs, xfs)
+    FICLONE = 0x40049409
+
+    # Errors of links that the filesystem or device pair doesn't support
+    UNSUPPORTED_ERRNOS = {
+        errno.EXDEV,
+        errno.EPERM,
+        errno.EINVAL,
+        errno.ENOTTY,
+        errno.EOPNOTSUPP,
+        errno.ENOTSUP,
+        errno.EMLINK,
+    }
+
+    def __init__(self, mode: str = "auto", num_threads: int = 8) -> None:
+        if mode not in self.MODES:
+            raise ValueError(f"mode must be one of {self.MODES}.")
+
+        self.mode = mode
+        self.num_threads = num_threads
+
+        if mode == "auto":
+            self.methods = ["hardlink", "reflink", "copy"]
+        elif mode == "copy":
+            self.methods = ["copy"]
+        else:
+            self.methods = [mode, "copy"]
+
+        # Methods which failed for a pair of src and dst dirs aren't tried again
+        self._unsupported = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _hardlink(src_path: str, dst_path: str) -> None:
+        os.link(src_path, dst_path)
+
+    @classmethod
+    def _reflink(cls, src_path: str, dst_path: str) -> None:
+        try:
+            import fcntl
+        except ImportError:
+            raise OSError(errno.ENOTSUP, "Reflinks are not supported.")
+
+        with open(src_path, "rb") as src_file, open(dst_path, "wb") as dst_file:
+            try:
+                fcntl.ioctl(dst_file.fileno(), cls.FICLONE, src_file.fileno())
+            except OSError:
+                dst_file.close()
+                os.remove(dst_path)
+                raise
+
+    @staticmethod
+    def _symlink(src_path: str, dst_path: str) -> None:
+        os.symlink(os.path.abspath(src_path), dst_path)
+
+    @staticmethod
+    def _copy(src_path: str, dst_path: str) -> None:
+        shutil.copyfile(src_path, dst_path)
+
+    def place(
+        self,
+        src_path: str,
+        dst_path: str,
+        shard_reader: TarShardReader | None = None,
+    ) -> str:
+        """Place src file at dst and return the used method."""
+        # Placed under temporary name and renamed over file of earlier build
+        tmp_path = f"{dst_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            method = self._place(src_path, tmp_path, shard_reader)
+            os.replace(tmp_path, dst_path)
+        finally:
+            # Rename does nothing if both names are links to the same file
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+
+        return method
+
+    def _place(
+        self,
+        src_path: str,
+        dst_path: str,
+        shard_reader: TarShardReader | None = None,
+    ) -> str:
+        # Files in tar shards can only be copied out
+        if shard_reader is not None:
+            shard_reader.copy(src_path, dst_path)
+            return "copy"
+
+        dirs_key = (os.path.dirname(src_path), os.path.dirname(dst_path))
+        for method in self.methods:
+            if (method, dirs_key) in self._unsupported:
+                continue
+
+            try:
+                getattr(self, f"_{method}")(src_path, dst_path)
+                return method
+            except OSError as e:
+                if method == "copy" or e.errno not in self.UNSUPPORTED_ERRNOS:
+                    raise
+                with self._lock:
+                    self._unsupported.add((method, dirs_key))
+
+    def place_many(
+        self,
+        pairs: list[tuple[str, str]],
+        shard_reader: TarShardReader | None = None,
+        desc: str | None = None,
+    ) -> dict[str, int]:
+        """Place (src, dst) pairs in parallel, return counts of used methods."""
+        counts = {}
+        if not pairs:
+            return counts
+
+        # Index of shards is read once before threads use it
+        if shard_reader is not None:
+            shard_reader.index
+
+        with ThreadPoolExecutor(self.num_threads) as executor:
+            futures = [
+                executor.submit(self.place, src_path, dst_path, shard_reader)
+                for src_path, dst_path in pairs
+            ]
+            for future in tqdm(as_completed(futures), total=len(futures), desc=desc):
+                method = future.result()
+                counts[method] = counts.get(method, 0) + 1
+
+        return counts
+
+    @staticmethod
+    def remove_many(paths: list[str]) -> None:
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def diff_splits(
+        old_splits: dict[str, list[str]], splits: dict[str, list[str]]
+    ) -> tuple[dict[str, list[str]], dict[str, list[str]]]:
+        """Keys added to and removed from every split since old splits."""
+        added, removed = {}, {}
+        for split in splits.keys() | old_splits.keys():
+            old_keys = set(old_splits.get(split, []))
+            keys = splits.get(split, [])
+            keys_set = set(keys)
+            added[split] = [key for key in keys if key not in old_keys]
+            removed[split] = [
+                key for key in old_splits.get(split, []) if key not in keys_set
+            ]
+
+        return added, removed
+
+    @staticmethod
+    def read_manifest(manifest_path: str) -> dict:
+        # Empty manifest if the dataset wasn't built yet
+        if not os.path.exists(manifest_path):
+            return {}
+
+        with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+            return json.load(manifest_file)
+
+    @staticmethod
+    def write_manifest(
+        manifest_path: str,
+        splits: dict[str, list[str]],
+        paths: dict[str, dict[str, str]] | None = None,
+    ) -> None:
+        # Dataset paths of keys of every split, if they aren't derived from keys
+        manifest = {"splits": splits}
+        if paths is not None:
+            manifest["paths"] = paths
+
+        # Temporary file is renamed, so a manifest is never half-written
+        tmp_path = f"{manifest_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as tmp_file:
+            json.dump(manifest, tmp_file, indent=4, ensure_ascii=False)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, manifest_path)
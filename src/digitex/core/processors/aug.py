@@ -0,0 +1,227 @@
+import copy
+import time
+import random
+
+import albumentations as A
+
+
+def get_default_transforms() -> list[A.BasicTransform]:
+    # Transforms shared by augmenters of page datasets
+    return [
+        A.AdditiveNoise(p=0.3),
+        A.Downscale(scale_range=[0.4, 0.9], p=0.3),
+        A.RGBShift(p=0.3),
+        A.RingingOvershoot(p=0.3),
+        A.Spatter(mean=[0.5, 0.6], p=0.2),
+        A.ToGray(p=0.4),
+        A.ChannelShuffle(p=0.3),
+        A.Emboss(p=0.3),
+        A.GaussNoise(std_range=[0.05, 0.15], p=0.3),
+        A.HueSaturationValue(p=0.3),
+        A.MedianBlur(p=0.3),
+        A.PlanckianJitter(p=0.3),
+        A.RandomBrightnessContrast(p=0.3),
+        A.RandomShadow(shadow_intensity_range=[0.1, 0.4], p=0.3),
+        A.SaltAndPepper(amount=[0.01, 0.03], p=0.2),
+        A.GaussianBlur(blur_limit=6, p=0.3),
+        A.ISONoise(p=0.2),
+        A.MotionBlur(p=0.3),
+        A.PlasmaBrightnessContrast(p=0.3),
+        A.RandomFog(p=0.3),
+        A.Sharpen(p=0.4),
+        A.Blur(p=0.3),
+        A.Illumination(p=0.3),
+        A.CLAHE(p=0.3),
+        A.Posterize(p=0.3),
+        A.Affine(scale=[0.92, 1.08], fill=255, p=0.4),
+        A.CoarseDropout(fill=255, p=0.1),
+        A.Pad(padding=[15, 15], fill=255, p=0.4),
+        A.RandomScale(p=0.4),
+        A.SafeRotate(limit=(-3, 3), fill=255, p=0.4),
+    ]
+
+
+class AugPipeline:
+    """Cached albumentations pipeline with profiling and a time budget.
+
+    In profiling mode transforms are applied one by one with their own
+    probability rolls, recording time and hits of every transform. With
+    time_budget (seconds per sample) the first budget_warmup samples are
+    profiled, then the costliest transforms are replaced by cheaper ones
+    or dropped until the expected time of a sample fits the budget.
+    """
+
+    # Cheaper transforms with a similar effect, others are dropped
+    REPLACEMENTS = {
+        "RandomFog": lambda p: A.RandomBrightnessContrast(
+            brightness_limit=(0.0, 0.2), contrast_limit=(-0.3, 0.0), p=p
+        ),
+        "PlasmaBrightnessContrast": lambda p: A.RandomBrightnessContrast(p=p),
+        "ISONoise": lambda p: A.GaussNoise(std_range=[0.02, 0.08], p=p),
+        "MedianBlur": lambda p: A.Blur(p=p),
+    }
+
+    def __init__(
+        self,
+        transforms: list[A.BasicTransform] | None = None,
+        keypoints: bool = False,
+        seed: int | None = None,
+        profile: bool = False,
+        time_budget: float | None = None,
+        budget_warmup: int = 50,
+    ) -> None:
+        self.transforms = transforms or get_default_transforms()
+        self.keypoints = keypoints
+        self.seed = seed
+        self.profile = profile
+        self.time_budget = time_budget
+        self.budget_warmup = budget_warmup
+
+        self._rng = random.Random(seed)
+        self._compose = None
+        self._single_composes = None
+        self._num_samples = 0
+        self._is_fitted = time_budget is None
+
+        self.stats = {}
+        self._reset_stats()
+
+    def _reset_stats(self) -> None:
+        self.stats = {
+            i: {"name": type(transform).__name__, "hits": 0, "time": 0.0}
+            for i, transform in enumerate(self.transforms)
+        }
+        self._num_samples = 0
+
+    def _create_compose(self, transforms: list, seed: int | None) -> A.Compose:
+        keypoint_params = None
+        if self.keypoints:
+            keypoint_params = A.KeypointParams(format="xy", remove_invisible=False)
+
+        return A.Compose(transforms, keypoint_params=keypoint_params, seed=seed)
+
+    @property
+    def compose(self) -> A.Compose:
+        if self._compose is None:
+            self._compose = self._create_compose(self.transforms, self.seed)
+
+        return self._compose
+
+    @property
+    def single_composes(self) -> list[A.Compose]:
+        # One transform per compose, always applied, probability is rolled here
+        if self._single_composes is None:
+            self._single_composes = []
+            for i, transform in enumerate(self.transforms):
+                transform = copy.deepcopy(transform)
+                transform.p = 1.0
+                seed = None if self.seed is None else self.seed + i
+                self._single_composes.append(self._create_compose([transform], seed))
+
+        return self._single_composes
+
+    def _call_profiled(self, data: dict) -> dict:
+        for i, (transform, compose) in enumerate(
+            zip(self.transforms, self.single_composes)
+        ):
+            if self._rng.random() >= transform.p:
+                continue
+
+            start_time = time.perf_counter()
+            data = compose(**data)
+            self.stats[i]["time"] += time.perf_counter() - start_time
+            self.stats[i]["hits"] += 1
+
+        self._num_samples += 1
+        return data
+
+    def __call__(self, **data) -> dict:
+        if not self._is_fitted:
+            data = self._call_profiled(data)
+            if self._num_samples >= self.budget_warmup:
+                self.fit_budget()
+
+            return data
+
+        if self.profile:
+            return self._call_profiled(data)
+
+        return self.compose(**data)
+
+    def get_costs(self) -> dict[int, float]:
+        # Mean seconds per application of every transform
+        return {
+            i: stat["time"] / stat["hits"] if stat["hits"] else 0.0
+            for i, stat in self.stats.items()
+        }
+
+    def fit_budget(self) -> None:
+        """Replace or drop costliest transforms to fit time budget."""
+        costs = self.get_costs()
+
+        # Cost of replacements is known if the same transform was applied
+        class_costs = {}
+        for i, transform in enumerate(self.transforms):
+            if not self.stats[i]["hits"]:
+                continue
+            name = type(transform).__name__
+            class_costs[name] = max(class_costs.get(name, 0.0), costs[i])
+
+        transforms = dict(enumerate(self.transforms))
+        expected_costs = {
+            i: transform.p * costs[i] for i, transform in transforms.items()
+        }
+        replaced = set()
+
+        while transforms and sum(expected_costs.values()) > self.time_budget:
+            i = max(
+                (i for i in transforms if i not in replaced),
+                key=lambda i: expected_costs[i],
+                default=None,
+            )
+            if i is None:
+                break
+
+            transform = transforms[i]
+            name = type(transform).__name__
+            if name in self.REPLACEMENTS:
+                transforms[i] = self.REPLACEMENTS[name](transform.p)
+                # Unprofiled replacement is taken as costly as the replaced one
+                replacement_name = type(transforms[i]).__name__
+                replacement_cost = class_costs.get(replacement_name, costs[i])
+                expected_costs[i] = transform.p * replacement_cost
+                replaced.add(i)
+            else:
+                del transforms[i]
+                del expected_costs[i]
+
+        self.transforms = [transforms[i] for i in sorted(transforms)]
+        self._compose = None
+        self._single_composes = None
+        self._is_fitted = True
+        self._reset_stats()
+
+    def get_report(self) -> list[dict]:
+        """Per transform stats, costliest per sample first."""
+        num_samples = max(self._num_samples, 1)
+        costs = self.get_costs()
+        rows = [
+            {
+                "name": stat["name"],
+                "hit_rate": stat["hits"] / num_samples,
+                "ms_per_hit": 1000 * costs[i],
+                "ms_per_sample": 1000 * stat["time"] / num_samples,
+            }
+            for i, stat in self.stats.items()
+        ]
+
+        return sorted(rows, key=lambda row: row["ms_per_sample"], reverse=True)
+
+    def print_report(self) -> None:
+        print(f"Augmentation profile over {self._num_samples} samples:")
+        for row in self.get_report():
+            print(
+                f"{row['name']:>26}  hit rate {row['hit_rate']:5.2f}  "
+                f"{row['ms_per_hit']:8.2f} ms/hit  "
+                f"{row['ms_per_sample']:8.2f} ms/sample"
+            )
@@ -1,4 +1,8 @@
+import os
 import json
+import textwrap
+from typing import Any, Iterator
+
 import yaml
 
 
@@ -40,6 +44,69 @@ class FileProcessor:
 
         return None
 
+    @staticmethod
+    def iter_json_array(json_path: str, chunk_size: int = 1 << 16) -> Iterator[Any]:
+        """Yield items of a top-level JSON array one by one.
+
+        Only the current item and one chunk of the file are kept in memory.
+        JSONL files (one item per line) are read as well.
+        """
+        if not os.path.exists(json_path):
+            return
+
+        decoder = json.JSONDecoder()
+        with open(json_path, "r", encoding="utf-8") as json_file:
+            buffer = json_file.read(chunk_size).lstrip("\ufeff \t\r\n")
+            is_eof = not buffer
+            if buffer.startswith("["):
+                buffer = buffer[1:]
+
+            while True:
+                # Skip separators between items
+                buffer = buffer.lstrip(", \t\r\n")
+                if not buffer:
+                    if is_eof:
+                        break
+                    chunk = json_file.read(chunk_size)
+                    is_eof = not chunk
+                    buffer += chunk
+                    continue
+                if buffer[0] == "]":
+                    break
+
+                try:
+                    item, end = decoder.raw_decode(buffer)
+                except json.JSONDecodeError:
+                    if is_eof:
+                        raise
+                    item, end = None, len(buffer)
+
+                # Item may be cut at buffer end, decode it again with more data
+                if end == len(buffer) and not is_eof:
+                    chunk = json_file.read(max(chunk_size, len(buffer)))
+                    is_eof = not chunk
+                    buffer += chunk
+                    continue
+
+                yield item
+                buffer = buffer[end:]
+
+    @staticmethod
+    def write_json_stream(
+        json_path: str,
+        items: Iterator[Any],
+        lines: bool = False,
+        indent: int = 4,
+        append: bool = False,
+    ) -> int:
+        with JsonStreamWriter(
+            json_path, lines=lines, indent=indent, append=append
+        ) as writer:
+            for item in items:
+                writer.write(item)
+
+        return writer.num_items
+
     @staticmethod
     def write_yaml(yaml_path: str, data: dict, comment: str = None) -> None:
         with open(yaml_path, "w", encoding="utf-8") as yaml_file:
@@ -48,3 +115,109 @@ class FileProcessor:
             yaml.dump(data, yaml_file, default_flow_style=False, allow_unicode=True)
 
         return None
+
+
+class JsonStreamWriter:
+    """Write JSON array or JSONL file item by item.
+
+    Data goes to a temporary file that replaces json_path on close, so
+    an interrupted run never leaves a truncated file. With append items
+    are added to the end of an existing file, abort restores its content.
+    """
+
+    def __init__(
+        self,
+        json_path: str,
+        lines: bool = False,
+        indent: int = 4,
+        append: bool = False,
+    ) -> None:
+        self.json_path = json_path
+        self.lines = lines
+        self.indent = None if lines else indent
+        self.num_items = 0
+
+        self._append = append and os.path.exists(json_path)
+        if self._append:
+            self._tail_offset, self._tail, self._has_items = self._cut_tail()
+            self._file = open(json_path, "a", encoding="utf-8")
+            if not lines and self._tail_offset == 0:
+                self._file.write("[")
+        else:
+            self._has_items = False
+            self._tmp_path = json_path + ".tmp"
+            self._file = open(self._tmp_path, "w", encoding="utf-8")
+            if not lines:
+                self._file.write("[")
+
+    def _cut_tail(self, max_tail_size: int = 1 << 16) -> tuple[int, bytes, bool]:
+        size = os.path.getsize(self.json_path)
+        if self.lines or size == 0:
+            return size, b"", size > 0
+
+        # Find closing bracket of the array and cut it off
+        with open(self.json_path, "rb+") as json_file:
+            json_file.seek(max(0, size - max_tail_size))
+            data = json_file.read()
+            bracket_idx = data.rfind(b"]")
+            if bracket_idx == -1:
+                raise ValueError(f"{self.json_path} is not a JSON array.")
+
+            # Whitespace before the bracket is cut too, appends don't pile it up
+            head = data[:bracket_idx].rstrip()
+            tail_offset = size - len(data) + len(head)
+            tail = data[len(head) :]
+            has_items = not head.endswith(b"[")
+            json_file.truncate(tail_offset)
+
+        return tail_offset, tail, has_items
+
+    def write(self, item: Any) -> None:
+        data = json.dumps(item, indent=self.indent, ensure_ascii=False)
+
+        if self.lines:
+            self._file.write(data + "\n")
+        else:
+            # Items are nested one level deeper inside the array
+            if self.indent:
+                data = textwrap.indent(data, " " * self.indent)
+            separator = ",\n" if self._has_items else "\n"
+            self._file.write(separator + data)
+
+        self._has_items = True
+        self.num_items += 1
+
+    def close(self) -> None:
+        if self._file is None:
+            return
+
+        if not self.lines:
+            self._file.write("\n]" if self._has_items else "]")
+        self._file.close()
+        self._file = None
+        if not self._append:
+            os.replace(self._tmp_path, self.json_path)
+
+    def abort(self) -> None:
+        if self._file is None:
+            return
+
+        self._file.close()
+        self._file = None
+        if not self._append:
+            os.remove(self._tmp_path)
+            return
+
+        # Drop written items and put back the cut closing bracket
+        os.truncate(self.json_path, self._tail_offset)
+        with open(self.json_path, "ab") as json_file:
+            json_file.write(self._tail)
+
+    def __enter__(self) -> "JsonStreamWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -1,3 +1,5 @@
+import hashlib
+from collections import OrderedDict
 from PIL import Image
 
 import numpy as np
@@ -14,22 +16,56 @@ class ImgProcessor:
     # Binarization
     BIN_PARAMS = {"window": 30, "k": 0.16}
 
+    # Resize
+    RESIZE_MODES = ("auto", "fast", "quality")
+    LANCZOS_MIN_SCALE = 0.75
+    PYRAMID_MAX_SCALE = 0.25
+
     @staticmethod
     def image2img(image: Image) -> np.ndarray:
-        img = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        if image.mode == "RGBA":
+            img = cv2.cvtColor(np.array(image), cv2.COLOR_RGBA2BGRA)
+        else:
+            img = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
 
         return img
 
     @staticmethod
     def img2image(img: np.ndarray) -> Image:
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        if img.ndim == 3 and img.shape[2] == 4:
+            img = cv2.cvtColor(img, cv2.COLOR_BGRA2RGBA)
+        else:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
         image = Image.fromarray(img)
 
         return image
 
+    @staticmethod
+    def get_resize_interpolation(scale_factor: float, mode: str = "auto") -> int:
+        if mode not in ImgProcessor.RESIZE_MODES:
+            raise ValueError(f"mode must be one of {ImgProcessor.RESIZE_MODES}.")
+
+        # Upscales and small reductions keep Lanczos quality
+        if mode == "quality" or scale_factor >= ImgProcessor.LANCZOS_MIN_SCALE:
+            return cv2.INTER_LANCZOS4
+
+        return cv2.INTER_AREA
+
+    @staticmethod
+    def pyramid_downscale(img: np.ndarray, scale_factor: float) -> np.ndarray:
+        if not 0 < scale_factor <= 1:
+            raise ValueError("scale_factor must be in (0, 1].")
+
+        # Halve image while the remaining reduction is still large
+        while scale_factor <= ImgProcessor.PYRAMID_MAX_SCALE:
+            img = cv2.pyrDown(img)
+            scale_factor *= 2
+
+        return img
+
     @staticmethod
     def resize_img(
-        img: np.ndarray, target_width: int, target_height: int
+        img: np.ndarray, target_width: int, target_height: int, mode: str = "auto"
     ) -> np.ndarray:
         img_height, img_width = img.shape[:2]
 
@@ -42,9 +78,14 @@ class ImgProcessor:
         new_width = int(img_width * scale_factor)
         new_height = int(img_height * scale_factor)
 
+        # Choose interpolation for the reduction and halve big ones first
+        interpolation = ImgProcessor.get_resize_interpolation(scale_factor, mode)
+        if mode == "fast" and scale_factor < 1:
+            img = ImgProcessor.pyramid_downscale(img, scale_factor)
+
         # Resize the image
         resized_img = cv2.resize(
-            img, (new_width, new_height), interpolation=cv2.INTER_LANCZOS4
+            img, (new_width, new_height), interpolation=interpolation
         )
 
         return resized_img
@@ -96,6 +137,59 @@ class ImgProcessor:
         return img
 
 
+class ImgResizer:
+    """Memoizing wrapper around ImgProcessor.resize_img for repeated zoom levels.
+
+    Entries are keyed by a digest of image content, so equal images share
+    them and a new image never gets a resize of another one. Digest is
+    computed once per array, arrays must not be changed after resizing.
+    """
+
+    def __init__(self, max_size: int = 8, mode: str = "auto") -> None:
+        self.max_size = max_size
+        self.mode = mode
+
+        self._cache = OrderedDict()
+        self._digests = OrderedDict()
+
+    def resize(
+        self, img: np.ndarray, target_width: int, target_height: int
+    ) -> np.ndarray:
+        key = (self.get_img_key(img), target_width, target_height)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        resized_img = ImgProcessor.resize_img(
+            img, target_width, target_height, mode=self.mode
+        )
+
+        # Store and evict least recently used entry
+        self._cache[key] = resized_img
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+        return resized_img
+
+    def get_img_key(self, img: np.ndarray) -> tuple:
+        # Array is kept with its digest, so its id can't go to another array
+        entry = self._digests.get(id(img))
+        if entry is not None and entry[0] is img:
+            self._digests.move_to_end(id(img))
+        else:
+            digest = hashlib.blake2b(np.ascontiguousarray(img), digest_size=16)
+            entry = (img, digest.hexdigest())
+            self._digests[id(img)] = entry
+            if len(self._digests) > self.max_size:
+                self._digests.popitem(last=False)
+
+        return img.shape, img.dtype.str, entry[1]
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._digests.clear()
+
+
 class ImgCropper:
     def get_perspective_matrix(
         self, pts: np.ndarray, width: int, height: int
@@ -172,22 +266,29 @@ class ImgCropper:
         return bbox
 
     def paste_img_on_bg(
-        self, img: np.ndarray, pts: np.ndarray, width: int, height: int
+        self,
+        img: np.ndarray,
+        pts: np.ndarray,
+        width: int,
+        height: int,
+        return_alpha: bool = False,
     ) -> np.ndarray:
-        # Create mask for the polygon in the image
-        mask = np.zeros((height, width), dtype=np.uint8)
-        cv2.fillPoly(mask, [pts], 255)
+        # Modifies img in place; pass a copy if the caller still needs it
 
-        # Apply mask to image
-        result = cv2.bitwise_and(img, img, mask=mask)
+        # Return polygon mask as alpha channel instead of compositing
+        if return_alpha:
+            alpha = np.zeros((height, width), dtype=np.uint8)
+            cv2.fillPoly(alpha, [pts], 255)
+            return np.dstack((img[..., :3], alpha))
 
-        # Paste on white background to remove black outside polygon
-        white_bg = np.ones_like(result) * 255
-        mask_inv = cv2.bitwise_not(mask)
-        white_masked = cv2.bitwise_and(white_bg, white_bg, mask=mask_inv)
-        bg_img = cv2.add(result, white_masked)
+        # Create mask of the area outside the polygon
+        outside_mask = np.full((height, width), 255, dtype=np.uint8)
+        cv2.fillPoly(outside_mask, [pts], 0)
 
-        return bg_img
+        # Paint white outside polygon in place of the warped image
+        cv2.bitwise_or(img, (255, 255, 255, 255), dst=img, mask=outside_mask)
+
+        return img
 
     def crop_img_by_box(
         self, img: np.ndarray, box: tuple[int, int, int, int], angle: int = 0
@@ -210,6 +311,40 @@ class ImgCropper:
 
         return cropped_img
 
+    def crop_img_by_boxes(
+        self,
+        img: np.ndarray,
+        boxes: list[tuple[int, int, int, int]],
+        angles: list[int] | None = None,
+    ) -> list[np.ndarray]:
+        if not boxes:
+            return []
+        if angles is None:
+            angles = [0] * len(boxes)
+
+        # Corners of all boxes relative to their rotation origin
+        boxes_np = np.array(boxes, dtype=np.float32)
+        origins, sizes = boxes_np[:, :2], boxes_np[:, 2:]
+        offsets = np.zeros((len(boxes), 4, 2), dtype=np.float32)
+        offsets[:, [1, 2], 0] = sizes[:, None, 0]
+        offsets[:, [2, 3], 1] = sizes[:, None, 1]
+
+        # Rotate all corners at once, clockwise as cv2.getRotationMatrix2D
+        rads = np.deg2rad(np.array(angles, dtype=np.float32))
+        cos, sin = np.cos(rads)[:, None], np.sin(rads)[:, None]
+        rotated_pts = np.empty_like(offsets)
+        rotated_pts[..., 0] = cos * offsets[..., 0] + sin * offsets[..., 1]
+        rotated_pts[..., 1] = -sin * offsets[..., 0] + cos * offsets[..., 1]
+        rotated_pts += origins[:, None, :]
+
+        # Warp only output size of every box from the shared image
+        cropped_imgs = []
+        for (_, _, width, height), pts in zip(boxes, rotated_pts):
+            persp_M = self.get_perspective_matrix(pts, width, height)
+            cropped_imgs.append(self.warp_perspective(img, persp_M, width, height))
+
+        return cropped_imgs
+
     def crop_img_by_polygon(
         self, img: np.ndarray, polygon: list[tuple[int, int]]
     ) -> np.ndarray:
@@ -231,7 +366,10 @@ class ImgCropper:
         return cropped_img
 
     def cut_out_img_by_polygon(
-        self, img: np.ndarray, polygon: list[tuple[int, int]]
+        self,
+        img: np.ndarray,
+        polygon: list[tuple[int, int]],
+        return_alpha: bool = False,
     ) -> np.ndarray:
         # Convert polygon to quadrilateral (minimum area rectangle enclosing the polygon)
         pts = self.polygon_to_quadrilateral(polygon)
@@ -249,6 +387,9 @@ class ImgCropper:
         tr_pts = self.perspective_transform(polygon, persp_M)
 
         # Paste the warped image onto a white background using the transformed polygon points
-        bg_img = self.paste_img_on_bg(warped_img, tr_pts, width, height)
+        # (warped_img is a fresh buffer, so it is safe to composite it in place)
+        bg_img = self.paste_img_on_bg(
+            warped_img, tr_pts, width, height, return_alpha=return_alpha
+        )
 
         return bg_img
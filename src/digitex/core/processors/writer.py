@@ -0,0 +1,184 @@
+import os
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+
+import numpy as np
+import cv2
+
+from digitex.core.handlers.shard import TarShardWriter, TarShardReader
+
+
+class ImgWriter:
+    """Encode and write images in background threads.
+
+    Existence checks use a set of filenames read once per output dir,
+    and at most max_pending images wait in memory for encoding. With the
+    "tar" backend images go to tar shards in the output dir instead of
+    loose files.
+    """
+
+    BACKENDS = ("dir", "tar")
+
+    FORMATS = {
+        "jpg": (".jpg", cv2.IMWRITE_JPEG_QUALITY),
+        "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY),
+        "png": (".png", cv2.IMWRITE_PNG_COMPRESSION),
+    }
+
+    def __init__(
+        self,
+        img_format: str = "jpg",
+        quality: int = 95,
+        num_threads: int = 4,
+        max_pending: int = 64,
+        backend: str = "dir",
+        max_shard_files: int = 10000,
+    ) -> None:
+        if img_format not in self.FORMATS:
+            raise ValueError(f"img_format must be one of {list(self.FORMATS)}.")
+        if backend not in self.BACKENDS:
+            raise ValueError(f"backend must be one of {self.BACKENDS}.")
+
+        self.img_format = img_format
+        self.quality = quality
+        self.num_threads = num_threads
+        self.max_pending = max_pending
+        self.backend = backend
+        self.max_shard_files = max_shard_files
+
+        self._shard_writers = {}
+
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._futures = set()
+        self._exist_names = {}
+
+    @property
+    def ext(self) -> str:
+        return self.FORMATS[self.img_format][0]
+
+    @property
+    def params(self) -> list[int]:
+        flag = self.FORMATS[self.img_format][1]
+
+        # PNG is lossless, quality maps to compression level 0-9
+        if self.img_format == "png":
+            return [flag, min(9, max(0, (100 - self.quality) // 10))]
+
+        return [flag, self.quality]
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.num_threads)
+
+        return self._executor
+
+    def _get_exist_names(self, output_dir: str) -> set[str]:
+        if output_dir not in self._exist_names:
+            exist_names = set()
+            if self.backend == "tar":
+                exist_names = set(TarShardReader(output_dir).listdir())
+            elif os.path.isdir(output_dir):
+                exist_names = set(os.listdir(output_dir))
+            self._exist_names[output_dir] = exist_names
+
+        return self._exist_names[output_dir]
+
+    def exists(self, path: str) -> bool:
+        output_dir, filename = os.path.split(path)
+        with self._lock:
+            return filename in self._get_exist_names(output_dir)
+
+    def encode(self, img: np.ndarray) -> bytes:
+        success, buffer = cv2.imencode(self.ext, img, self.params)
+        if not success:
+            raise ValueError(f"Image can't be encoded to {self.img_format}.")
+
+        return buffer.tobytes()
+
+    def _get_shard_writer(self, output_dir: str) -> TarShardWriter:
+        with self._lock:
+            if output_dir not in self._shard_writers:
+                self._shard_writers[output_dir] = TarShardWriter(
+                    output_dir, max_shard_files=self.max_shard_files
+                )
+
+            return self._shard_writers[output_dir]
+
+    def _write_task(self, img: np.ndarray, path: str) -> None:
+        try:
+            data = self.encode(img)
+
+            if self.backend == "tar":
+                output_dir, filename = os.path.split(path)
+                self._get_shard_writer(output_dir).write(filename, data)
+                return
+
+            # Write bytes with open, cv2.imwrite fails on non-ASCII paths.
+            # Renamed from temporary name, so no image is left half-written
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            try:
+                with open(tmp_path, "wb") as file:
+                    file.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        finally:
+            self._slots.release()
+
+    def _on_done(self, future: Future) -> None:
+        with self._lock:
+            if future.exception() is None:
+                self._futures.discard(future)
+
+    def write(self, img: np.ndarray, path: str) -> Future | None:
+        output_dir, filename = os.path.split(path)
+
+        # Reserve name, so the same path is never queued twice
+        with self._lock:
+            exist_names = self._get_exist_names(output_dir)
+            if filename in exist_names:
+                return None
+            exist_names.add(filename)
+
+        # Block when too many images wait for encoding
+        self._slots.acquire()
+        future = self.executor.submit(self._write_task, img, path)
+
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._on_done)
+
+        return future
+
+    def flush(self) -> None:
+        with self._lock:
+            futures = list(self._futures)
+
+        # Wait for pending writes and raise first failure
+        for future in futures:
+            future.result()
+
+        with self._lock:
+            self._futures.difference_update(futures)
+            shard_writers = list(self._shard_writers.values())
+
+        for shard_writer in shard_writers:
+            shard_writer.flush()
+
+    def close(self) -> None:
+        self.flush()
+
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+        # Finish tar shards, next writes start new ones
+        for shard_writer in self._shard_writers.values():
+            shard_writer.close()
+        self._shard_writers = {}
@@ -1,8 +1,13 @@
 import os
+import queue
 import random
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterator
 from PIL import Image
 
 import numpy as np
+from tqdm import tqdm
 
 from digitex.core.handlers.pdf import PDFHandler
 
@@ -41,3 +46,83 @@ def get_random_img(images_dir, images_listdir: list[str]) -> tuple[np.ndarray, s
     img = np.array(image)
 
     return img_name, img
+
+
+def seed_everything(seed: int | None) -> None:
+    if seed is None:
+        return
+
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+
+
+def iter_augment_progress(num_images: int, progress_queue=None) -> Iterator[int]:
+    # Workers report every image to the parent, which shows one progress bar
+    if progress_queue is None:
+        yield from tqdm(range(num_images), desc="Augmenting images")
+        return
+
+    for i in range(num_images):
+        yield i
+        progress_queue.put(1)
+
+
+def _run_augment_shard(
+    augmenter_cls: type,
+    augmenter_kwargs: dict,
+    num_images: int,
+    seed: int | None,
+    worker_idx: int,
+    progress_queue,
+    shard_kwargs: dict,
+):
+    # Each process creates its own augmenter and transforms
+    augmenter = augmenter_cls(**augmenter_kwargs)
+    augmenter.progress_queue = progress_queue
+
+    return augmenter._augment_shard(num_images, seed, worker_idx, **shard_kwargs)
+
+
+def run_augment_workers(
+    augmenter, num_images: int, workers: int, seed: int | None = None, **shard_kwargs
+) -> list:
+    """Split augmented images across processes and return results of workers.
+
+    Worker i gets seed + i, so workers are reproducible. Augmenters pass
+    name counters scanned once in shard_kwargs, so workers reserve disjoint
+    names and never write the same file.
+    """
+    shard_sizes = [
+        num_images // workers + (i < num_images % workers) for i in range(workers)
+    ]
+
+    mp_context = mp.get_context("spawn")
+    with mp_context.Manager() as manager:
+        progress_queue = manager.Queue()
+
+        with ProcessPoolExecutor(workers, mp_context=mp_context) as executor:
+            futures = [
+                executor.submit(
+                    _run_augment_shard,
+                    type(augmenter),
+                    augmenter.augmenter_kwargs,
+                    shard_size,
+                    None if seed is None else seed + i,
+                    i,
+                    progress_queue,
+                    shard_kwargs,
+                )
+                for i, shard_size in enumerate(shard_sizes)
+            ]
+
+            with tqdm(total=num_images, desc="Augmenting images") as progress_bar:
+                pending = set(futures)
+                while pending:
+                    _, pending = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                    while True:
+                        try:
+                            progress_bar.update(progress_queue.get_nowait())
+                        except queue.Empty:
+                            break
+
+            return [future.result() for future in futures]
@@ -0,0 +1,42 @@
+import os
+import argparse
+import yaml
+
+from components.batch import BatchExtractor
+
+INPUTS_DIR = "inputs"
+CONFIG_PATH = os.path.join(INPUTS_DIR, "config.yaml")
+PDF_DIR = os.path.join(INPUTS_DIR, "pdfs")
+
+
+def load_config(config_path: str) -> dict:
+    with open(config_path, "r") as file:
+        return yaml.safe_load(file)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Extract page and question images from PDFs without the UI."
+    )
+    parser.add_argument("--pdf-dir", default=PDF_DIR)
+    parser.add_argument("--config", default=CONFIG_PATH)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--no-resume",
+        action="store_true",
+        help="Start from scratch instead of skipping pages in the manifest.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    config = load_config(args.config)
+    batch_extractor = BatchExtractor(cfg=config)
+    batch_extractor.extract(
+        args.pdf_dir, workers=args.workers, resume=not args.no_resume
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import os
+import json
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+from modules.handlers import PDFHandler, ImageHandler
+from components.managers import ImageManager, PredictionManager
+
+# Models and handlers of a worker process, loaded once by the initializer
+_worker_state = {}
+
+
+def _init_worker(cfg: dict, base_image_dimensions: tuple) -> None:
+    _worker_state["extractor"] = BatchExtractor(cfg, base_image_dimensions)
+
+
+def _extract_page(pdf_path: str, page_idx: int) -> dict:
+    return _worker_state["extractor"].extract_page(pdf_path, page_idx)
+
+
+class BatchExtractor:
+    """Extract page and question images from PDFs without the UI.
+
+    Uses the same rendering and prediction as ExtractorApp. Every finished
+    page is appended to a JSONL manifest next to the page dir, resume skips
+    pages found in it. Failed pages are recorded with their error and
+    extracted again on resume.
+    """
+
+    MANIFEST_NAME = "manifest.jsonl"
+
+    def __init__(
+        self, cfg: dict, base_image_dimensions: tuple = (1525, 2048)
+    ) -> None:
+        self.cfg = cfg
+        self.base_image_dimensions = base_image_dimensions
+        self.page_dir = cfg["train_data_path"]["page"]
+        self.question_dir = cfg["train_data_path"]["question"]
+        # Manifest stays out of page dir, which holds only train images
+        self.manifest_path = os.path.join(
+            os.path.dirname(os.path.abspath(self.page_dir)), self.MANIFEST_NAME
+        )
+
+        self.pdf_handler = PDFHandler()
+        self.__image_manager = None
+        self.__prediction_manager = None
+
+    @property
+    def image_manager(self) -> ImageManager:
+        if self.__image_manager is None:
+            self.__image_manager = ImageManager(
+                ImageHandler(), self.base_image_dimensions
+            )
+        return self.__image_manager
+
+    @property
+    def prediction_manager(self) -> PredictionManager:
+        # Models are loaded only where pages are predicted
+        if self.__prediction_manager is None:
+            self.__prediction_manager = PredictionManager(self.cfg, ImageHandler())
+        return self.__prediction_manager
+
+    def _read_manifest(self) -> set[tuple[str, int]]:
+        done_pages = set()
+        if not os.path.exists(self.manifest_path):
+            return done_pages
+
+        with open(self.manifest_path, "r", encoding="utf-8") as manifest_file:
+            for line in manifest_file:
+                # Skip line cut by killed run
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if "error" in record:
+                    continue
+                done_pages.add((record["pdf_path"], record["page"]))
+
+        return done_pages
+
+    def _get_pages(self, pdf_dir: str) -> list[tuple[str, int]]:
+        pages = []
+        for pdf_name in sorted(os.listdir(pdf_dir)):
+            if not pdf_name.endswith(".pdf"):
+                continue
+            pdf_path = os.path.abspath(os.path.join(pdf_dir, pdf_name))
+            page_count = self.pdf_handler.get_page_count(pdf_path)
+            pages.extend((pdf_path, page_idx) for page_idx in range(page_count))
+
+        return pages
+
+    def extract_page(self, pdf_path: str, page_idx: int) -> dict:
+        pdf_obj = self.pdf_handler.open_pdf(pdf_path)
+        page_image = self.image_manager.render_page_image(pdf_obj[page_idx])
+        pdf_obj.close()
+
+        _, question_images, _, _ = self.prediction_manager.predict(page_image)
+
+        # Same names as images saved from ExtractorApp
+        pdf_filename = os.path.splitext(os.path.basename(pdf_path))[0]
+        page_path = os.path.join(self.page_dir, f"{pdf_filename}_{page_idx}.jpg")
+        page_image.save(page_path)
+
+        question_paths = []
+        for question_idx, question_image in enumerate(question_images):
+            question_filename = f"{pdf_filename}_{page_idx}_{question_idx}.jpg"
+            question_path = os.path.join(self.question_dir, question_filename)
+            question_image.save(question_path)
+            question_paths.append(question_path)
+
+        return {
+            "pdf_path": pdf_path,
+            "page": page_idx,
+            "page_image": page_path,
+            "question_images": question_paths,
+        }
+
+    def extract(self, pdf_dir: str, workers: int = 1, resume: bool = True) -> int:
+        if workers < 1:
+            raise ValueError("workers must be positive.")
+
+        os.makedirs(self.page_dir, exist_ok=True)
+        os.makedirs(self.question_dir, exist_ok=True)
+
+        if not resume and os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+        done_pages = self._read_manifest()
+        pages = [page for page in self._get_pages(pdf_dir) if page not in done_pages]
+        print(f"{len(done_pages)} pages done before, {len(pages)} pages to extract.")
+
+        num_extracted = 0
+        with open(self.manifest_path, "a", encoding="utf-8") as manifest_file:
+            for record in self._iter_records(pages, workers):
+                manifest_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                manifest_file.flush()
+
+                if "error" in record:
+                    print(
+                        f"Failed {os.path.basename(record['pdf_path'])} "
+                        f"page {record['page']}: {record['error']}"
+                    )
+                    continue
+
+                num_extracted += 1
+                print(
+                    f"Extracted {num_extracted}/{len(pages)}: "
+                    f"{os.path.basename(record['pdf_path'])} page {record['page']}, "
+                    f"{len(record['question_images'])} questions."
+                )
+
+        return num_extracted
+
+    @staticmethod
+    def _get_failed_record(pdf_path: str, page_idx: int, error: Exception) -> dict:
+        return {"pdf_path": pdf_path, "page": page_idx, "error": repr(error)}
+
+    def _iter_records(self, pages: list[tuple[str, int]], workers: int):
+        # One broken page is recorded as failed and doesn't stop the batch
+        if workers == 1:
+            for pdf_path, page_idx in pages:
+                try:
+                    yield self.extract_page(pdf_path, page_idx)
+                except Exception as error:
+                    yield self._get_failed_record(pdf_path, page_idx, error)
+            return
+
+        # Every worker loads its own models once
+        mp_context = mp.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp_context,
+            initializer=_init_worker,
+            initargs=(self.cfg, self.base_image_dimensions),
+        ) as executor:
+            futures = [
+                executor.submit(_extract_page, pdf_path, page_idx)
+                for pdf_path, page_idx in pages
+            ]
+            for (pdf_path, page_idx), future in zip(pages, futures):
+                try:
+                    yield future.result()
+                except Exception as error:
+                    yield self._get_failed_record(pdf_path, page_idx, error)
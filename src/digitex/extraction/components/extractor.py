@@ -1,11 +1,14 @@
 import os
-from PIL import ImageTk
+import math
+from PIL import Image, ImageTk
 import tkinter as tk
 from tkinter import filedialog
 from modules.handlers import PDFHandler, ImageHandler
 from modules.processors import FileProcessor
 from components.ui import UserInterface
 from components.managers import PDFManager, ImageManager, PredictionManager  # Updated import
+from components.managers import TileManager
+from components.workers import PageWorker, PageResult
 
 
 class ExtractorApp:
@@ -18,27 +21,208 @@ class ExtractorApp:
         self.pdf_manager = PDFManager(PDFHandler(), FileProcessor(), "inputs")
         self.image_manager = ImageManager(ImageHandler(), (1525, 2048))
         self.prediction_manager = PredictionManager(cfg, ImageHandler())
+        self.tile_manager = TileManager(PDFHandler())
 
         self.zoom_level = 1.0
         self.dragging = False
         self.question_images = []  # Add this attribute to store question images
 
+        # Pages around the current one are rendered and predicted in background
+        self.page_worker = PageWorker(self.root)
+        self.page_cache = {}
+        self.prefetch_radius = 1
+        self._scheduled_jobs = set()
+        self._ml_requested = False
+        self._open_request = 0
+
+        # Only visible tiles of the shown page are painted on the canvas
+        self.canvas_tiles = {}
+        self._page_key = None
+        self._page_result = None
+        self._display_size = None
+        self._show_overlay = False
+        self._scheduled_tiles = set()
+        self._paint_pending = False
+
     def open_pdf(self) -> None:
         pdf_path = filedialog.askopenfilename(
             filetypes=[("PDF Files", "*.pdf")])
         if pdf_path:
-            self.pdf_manager.open_pdf(pdf_path)
-            self._load_page_image()
-            self.pdf_manager.save_checkpoint()
-            self.question_images = []
-            self.prediction_manager.processed_question_images = []
-            self.ui.setup_question_controls(0)
-            self.ui.clear_top_canvas()
-            self.update_status(f"Opened PDF file: {pdf_path}")
+            self._open_pdf(pdf_path)
+
+    def _open_pdf(self, pdf_path: str, page: int = 0) -> None:
+        # pdfium isn't thread-safe, worker swaps documents after its running
+        # job, so the UI thread never waits for it
+        self.page_worker.cancel_all()
+        old_pdf_obj = self.pdf_manager.detach_pdf()
+        self._open_request += 1
+        open_request = self._open_request
+
+        self.page_cache.clear()
+        self.tile_manager.clear()
+        self._scheduled_jobs.clear()
+        self._scheduled_tiles.clear()
+        self._page_key = None
+        self._page_result = None
+        self.update_status(f"Opening PDF file: {pdf_path}")
+
+        def open_pdf_job() -> tuple:
+            if old_pdf_obj is not None:
+                old_pdf_obj.close()
+            pdf_obj = self.pdf_manager.pdf_handler.open_pdf(pdf_path)
+            return pdf_obj, len(pdf_obj)
+
+        self.page_worker.submit(
+            -2,
+            pdf_path,
+            open_pdf_job,
+            lambda key, result, error: self._on_pdf_opened(
+                open_request, pdf_path, page, result, error
+            ),
+            cancellable=False,
+        )
+
+    def _on_pdf_opened(
+        self, open_request: int, pdf_path: str, page: int, result: tuple, error
+    ) -> None:
+        if error is not None:
+            self.update_status(f"Failed opening PDF file {pdf_path}: {error}")
+            return
+
+        # Another document was asked for while this one was opening
+        pdf_obj, page_count = result
+        if open_request != self._open_request:
+            self.page_worker.submit(
+                -2, pdf_path, pdf_obj.close, lambda *args: None, cancellable=False
+            )
+            return
+
+        self.pdf_manager.set_pdf(pdf_path, pdf_obj, page_count)
+        self.pdf_manager.current_page = page
+        self.pdf_manager.save_checkpoint()
+        self._load_page_image()
+        self.update_status(f"Opened PDF file: {pdf_path}")
+
+    def _get_page_key(self, page_idx: int = None) -> tuple:
+        if page_idx is None:
+            page_idx = self.pdf_manager.current_page
+        return self.pdf_manager.current_pdf_path, page_idx
+
+    def _get_priority(self, page_idx: int) -> int:
+        # Current page goes before prefetched neighbours
+        return 0 if page_idx == self.pdf_manager.current_page else 2
 
     def _load_page_image(self) -> None:
-        pdf_page = self.pdf_manager.current_pdf_obj[self.pdf_manager.current_page]
-        self.image_manager.load_page_image(pdf_page)
+        self.question_images = []
+        self.prediction_manager.question_images = []
+        self.prediction_manager.processed_question_images = []
+        self.ui.setup_question_controls(0)
+        self.ui.clear_top_canvas()
+        self._ml_requested = False
+
+        # Cancel jobs of pages outside of the window and free their cache
+        current_page = self.pdf_manager.current_page
+        page_idxs = [
+            page_idx
+            for page_idx in range(
+                current_page - self.prefetch_radius,
+                current_page + self.prefetch_radius + 1,
+            )
+            if 0 <= page_idx < self.pdf_manager.page_count
+        ]
+        keys = [self._get_page_key(page_idx) for page_idx in page_idxs]
+        self.page_worker.keep_only(keys)
+        for key in list(self.page_cache):
+            if key not in keys:
+                del self.page_cache[key]
+
+        page_result = self.page_cache.get(self._get_page_key())
+        if page_result is not None:
+            self._show_page(self._get_page_key(), page_result)
+
+        # Schedule current page first, then speculatively its neighbours
+        page_idxs.sort(key=lambda page_idx: abs(page_idx - current_page))
+        for page_idx in page_idxs:
+            self._schedule_page(page_idx)
+
+    def _schedule_page(self, page_idx: int) -> None:
+        # Document is still opening
+        if self.pdf_manager.current_pdf_obj is None:
+            return
+
+        key = self._get_page_key(page_idx)
+        priority = self._get_priority(page_idx)
+        page_result = self.page_cache.get(key)
+
+        if page_result is None:
+            if (key, "render") in self._scheduled_jobs:
+                return
+            self._scheduled_jobs.add((key, "render"))
+            pdf_obj = self.pdf_manager.current_pdf_obj
+            self.page_worker.submit(
+                priority,
+                key,
+                lambda: PageResult(
+                    self.image_manager.render_page_image(pdf_obj[page_idx]),
+                    pdf_obj[page_idx].get_size(),
+                ),
+                self._on_page_rendered,
+            )
+        elif not page_result.is_predicted:
+            if (key, "predict") in self._scheduled_jobs:
+                return
+            self._scheduled_jobs.add((key, "predict"))
+            original_image = page_result.original_image
+            self.page_worker.submit(
+                priority + 1,
+                key,
+                lambda: self.prediction_manager.predict(original_image),
+                self._on_page_predicted,
+            )
+
+    def _on_page_rendered(self, key: tuple, page_result: PageResult, error) -> None:
+        self._scheduled_jobs.discard((key, "render"))
+        if error is not None:
+            self.update_status(f"Failed rendering page {key[1] + 1}: {error}")
+            return
+        # Job was cancelled or page left the window while rendering
+        if page_result is None or key[0] != self.pdf_manager.current_pdf_path:
+            return
+        if abs(key[1] - self.pdf_manager.current_page) > self.prefetch_radius:
+            return
+
+        self.page_cache[key] = page_result
+        if key == self._get_page_key():
+            self._show_page(key, page_result)
+        self._schedule_page(key[1])
+
+    def _on_page_predicted(self, key: tuple, predictions: tuple, error) -> None:
+        self._scheduled_jobs.discard((key, "predict"))
+        if error is not None:
+            self.update_status(f"ML processing failed on page {key[1] + 1}: {error}")
+            return
+        page_result = self.page_cache.get(key)
+        if predictions is None or page_result is None:
+            return
+
+        drawn_image, question_images, processed_question_images, id2polygons = (
+            predictions
+        )
+        page_result.drawn_image = self.image_manager.image_handler.resize_image(
+            drawn_image, *self.image_manager.base_image_dimensions
+        )
+        page_result.question_images = question_images
+        page_result.processed_question_images = processed_question_images
+        page_result.id2polygons = id2polygons
+
+        if key == self._get_page_key() and self._ml_requested:
+            self._show_predictions(page_result)
+
+    def _show_page(self, key: tuple, page_result: PageResult) -> None:
+        self.image_manager.set_page_image(page_result.original_image)
+        self._page_key = key
+        self._page_result = page_result
+        self._show_overlay = False
         self.zoom_level = 1.0
         self._update_canvas_image()
 
@@ -47,23 +231,161 @@ class ExtractorApp:
         canvas_height = self.ui.left_canvas.winfo_height()
         if canvas_width <= 1 or canvas_height <= 1:
             return
+        if self._page_result is None:
+            return
 
-        self.image_manager.resized_image = self.image_manager.resize_image(
-            self.zoom_level, canvas_width, canvas_height
+        # Zoom 1.0 fits the page into the canvas
+        base_width, base_height = self.image_manager.base_image.size
+        if self.zoom_level == 1.0:
+            display_scale = min(canvas_width / base_width, canvas_height / base_height)
+        else:
+            display_scale = self.zoom_level
+        self._display_size = (
+            max(1, int(base_width * display_scale)),
+            max(1, int(base_height * display_scale)),
         )
-        self.image_manager.tk_image = ImageTk.PhotoImage(
-            self.image_manager.resized_image)
 
-        if hasattr(self, "canvas_image") and self.canvas_image:
-            self.ui.left_canvas.itemconfig(
-                self.canvas_image, image=self.image_manager.tk_image)
-        else:
-            self.canvas_image = self.ui.left_canvas.create_image(
-                0, 0, anchor=tk.NW, image=self.image_manager.tk_image
+        # Tiles of other size are not reused, paint from scratch
+        self.ui.left_canvas.delete("tile")
+        self.canvas_tiles = {}
+        self.ui.left_canvas.config(scrollregion=(0, 0, *self._display_size))
+        self._paint_visible_tiles()
+
+    def _get_visible_tile_idxs(
+        self, level_size: tuple[int, int], tile_display_size: float
+    ) -> list[tuple[int, int]]:
+        canvas = self.ui.left_canvas
+        left, top = canvas.canvasx(0), canvas.canvasy(0)
+        right = left + canvas.winfo_width()
+        bottom = top + canvas.winfo_height()
+
+        tile_size = self.tile_manager.tile_size
+        num_tiles_x = math.ceil(level_size[0] / tile_size)
+        num_tiles_y = math.ceil(level_size[1] / tile_size)
+        return [
+            (tile_x, tile_y)
+            for tile_y in range(
+                max(0, int(top // tile_display_size)),
+                min(num_tiles_y, int(bottom // tile_display_size) + 1),
+            )
+            for tile_x in range(
+                max(0, int(left // tile_display_size)),
+                min(num_tiles_x, int(right // tile_display_size) + 1),
+            )
+        ]
+
+    def _paint_visible_tiles(self) -> None:
+        self._paint_pending = False
+        page_result = self._page_result
+        if page_result is None or self._display_size is None:
+            return
+
+        # Tiles are rendered at the level above display scale
+        canvas = self.ui.left_canvas
+        display_scale = self._display_size[0] / page_result.page_size[0]
+        level_scale = self.tile_manager.get_level_scale(display_scale)
+        level_size = self.tile_manager.get_level_size(
+            page_result.page_size, level_scale
+        )
+        factor = self._display_size[0] / level_size[0]
+
+        tile_keys = {
+            (self._page_key, level_scale, tile_idx, self._show_overlay): tile_idx
+            for tile_idx in self._get_visible_tile_idxs(
+                level_size, self.tile_manager.tile_size * factor
             )
+        }
+
+        # Drop tiles scrolled out of view
+        for tile_key in list(self.canvas_tiles):
+            if tile_key not in tile_keys:
+                canvas.delete(self.canvas_tiles.pop(tile_key)[0])
+
+        for tile_key, tile_idx in tile_keys.items():
+            canvas_tile = self.canvas_tiles.get(tile_key)
+            if canvas_tile is not None and not canvas_tile[2]:
+                continue
+
+            box = self.tile_manager.get_tile_box(level_size, tile_idx)
+            tile = self.tile_manager.get_tile(tile_key)
+            is_placeholder = tile is None
+            if is_placeholder:
+                if canvas_tile is not None:
+                    continue
+                # Show crop of the base image until tile is rendered
+                self._schedule_tile(tile_key, level_scale, level_size, box)
+                base_factor = self.image_manager.base_image.width / level_size[0]
+                tile = self.image_manager.base_image.crop(
+                    tuple(round(value * base_factor) for value in box)
+                )
+            elif canvas_tile is not None:
+                canvas.delete(canvas_tile[0])
+
+            x, y = round(box[0] * factor), round(box[1] * factor)
+            tile_display_size = (
+                max(1, round(box[2] * factor) - x),
+                max(1, round(box[3] * factor) - y),
+            )
+            if tile.size != tile_display_size:
+                tile = tile.resize(tile_display_size, Image.Resampling.BILINEAR)
+
+            tk_tile = ImageTk.PhotoImage(tile)
+            item = canvas.create_image(x, y, anchor=tk.NW, image=tk_tile, tags="tile")
+            self.canvas_tiles[tile_key] = (item, tk_tile, is_placeholder)
+
+    def _schedule_tile(
+        self,
+        tile_key: tuple,
+        level_scale: float,
+        level_size: tuple[int, int],
+        box: tuple[int, int, int, int],
+    ) -> None:
+        if tile_key in self._scheduled_tiles:
+            return
+        self._scheduled_tiles.add(tile_key)
+
+        pdf_obj = self.pdf_manager.current_pdf_obj
+        page_idx = self._page_key[1]
+        id2polygons = self._page_result.id2polygons if self._show_overlay else None
+        polygons_scale = level_size[0] / self.image_manager.base_image.width
+
+        def render_tile() -> Image.Image:
+            tile = self.tile_manager.render_tile(pdf_obj[page_idx], level_scale, box)
+            if id2polygons:
+                tile_polygons = self.tile_manager.shift_polygons(
+                    id2polygons, polygons_scale, box
+                )
+                tile = self.prediction_manager._draw_polygons(tile, tile_polygons)
+            return tile
+
+        # Visible tiles go before page prefetching
+        self.page_worker.submit(
+            -1,
+            self._page_key,
+            render_tile,
+            lambda key, tile, error: self._on_tile_rendered(tile_key, tile, error),
+        )
 
-        self.ui.left_canvas.config(
-            scrollregion=self.ui.left_canvas.bbox(tk.ALL))
+    def _on_tile_rendered(self, tile_key: tuple, tile: Image.Image, error) -> None:
+        self._scheduled_tiles.discard(tile_key)
+        if error is not None:
+            self.update_status(f"Failed rendering page tile: {error}")
+            return
+        if tile is None:
+            return
+
+        self.tile_manager.put_tile(tile_key, tile)
+        if tile_key in self.canvas_tiles:
+            self._paint_visible_tiles()
+
+    def on_view_changed(self) -> None:
+        # Repaint once per batch of scroll events
+        if not self._paint_pending:
+            self._paint_pending = True
+            self.root.after_idle(self._paint_visible_tiles)
+
+    def on_canvas_configure(self, event: tk.Event) -> None:
+        self._update_canvas_image()
 
     def zoom_in(self) -> None:
         self.zoom_level *= 1.1
@@ -79,10 +401,6 @@ class ExtractorApp:
             self.pdf_manager.current_page = new_page
             self._load_page_image()
             self.pdf_manager.save_checkpoint()
-            self.question_images = []
-            self.prediction_manager.processed_question_images = []
-            self.ui.setup_question_controls(0)
-            self.ui.clear_top_canvas()
 
             # Update status after navigating pages
             self.update_status(
@@ -92,11 +410,23 @@ class ExtractorApp:
         if not self.image_manager.original_image:
             return
 
-        drawn_image, num_questions = self.prediction_manager.run_ml(
-            self.image_manager.original_image
-        )
-        self.image_manager.base_image = self.image_manager.image_handler.resize_image(
-            drawn_image, *self.image_manager.base_image_dimensions
+        # Show speculative predictions or wait for the running job
+        self._ml_requested = True
+        page_result = self.page_cache.get(self._get_page_key())
+        if page_result is None or not page_result.is_predicted:
+            self._schedule_page(self.pdf_manager.current_page)
+            self.update_status("Running ML processing...")
+            return
+
+        self._show_predictions(page_result)
+
+    def _show_predictions(self, page_result: PageResult) -> None:
+        num_questions = len(page_result.question_images)
+        self.image_manager.base_image = page_result.drawn_image
+        self._show_overlay = True
+        self.prediction_manager.question_images = page_result.question_images
+        self.prediction_manager.processed_question_images = (
+            page_result.processed_question_images
         )
         self.question_images = self.prediction_manager.question_images
         self.ui.setup_question_controls(num_questions)
@@ -149,12 +479,7 @@ class ExtractorApp:
     def load_checkpoint(self) -> None:
         checkpoint = self.pdf_manager.load_checkpoint()
         if checkpoint:
-            self.pdf_manager.open_pdf(checkpoint["pdf_path"])
-            self.pdf_manager.current_page = checkpoint["page"]
-            self._load_page_image()
-            self.update_status(
-                f"Opened PDF file {self.pdf_manager.current_pdf_path} from checkpoint"
-            )
+            self._open_pdf(checkpoint["pdf_path"], checkpoint["page"])
         else:
             self.update_status("Failed loading checkpoint")
 
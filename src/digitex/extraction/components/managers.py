@@ -1,4 +1,6 @@
 import os
+import math
+from collections import OrderedDict
 from PIL import Image, ImageDraw
 
 from digitex.settings import settings
@@ -21,10 +23,28 @@ class PDFManager:
         self.page_count = 0
 
     def open_pdf(self, pdf_path: str) -> None:
+        self.close_pdf()
+        pdf_obj = self.pdf_handler.open_pdf(pdf_path)
+        self.set_pdf(pdf_path, pdf_obj, len(pdf_obj))
+
+    def set_pdf(self, pdf_path: str, pdf_obj, page_count: int) -> None:
         self.current_pdf_path = pdf_path
-        self.current_pdf_obj = self.pdf_handler.open_pdf(pdf_path)
+        self.current_pdf_obj = pdf_obj
         self.current_page = 0
-        self.page_count = len(self.current_pdf_obj)
+        self.page_count = page_count
+
+    def detach_pdf(self):
+        # Caller closes the document on the thread that uses pdfium
+        pdf_obj = self.current_pdf_obj
+        self.current_pdf_obj = None
+        self.current_page = 0
+        self.page_count = 0
+        return pdf_obj
+
+    def close_pdf(self) -> None:
+        pdf_obj = self.detach_pdf()
+        if pdf_obj is not None:
+            pdf_obj.close()
 
     def save_checkpoint(self) -> None:
         checkpoint = {"pdf_path": self.current_pdf_path, "page": self.current_page}
@@ -43,27 +63,103 @@ class ImageManager:
         self.base_image_dimensions = base_image_dimensions
         self.original_image = None
         self.base_image = None
-        self.resized_image = None
-        self.tk_image = None
 
-    def load_page_image(self, pdf_page) -> None:
-        self.original_image = self.pdf_handler.get_page_image(pdf_page)
-        self.original_image = self.image_handler.resize_image(
-            self.original_image, *self.base_image_dimensions
+    def render_page_image(self, pdf_page) -> Image.Image:
+        page_image = self.pdf_handler.get_page_image(pdf_page)
+        return self.image_handler.resize_image(
+            page_image, *self.base_image_dimensions
         )
+
+    def set_page_image(self, page_image: Image.Image) -> None:
+        self.original_image = page_image
         self.base_image = self.original_image.copy()
 
-    def resize_image(
-        self, zoom_level: float, canvas_width: int, canvas_height: int
+    def load_page_image(self, pdf_page) -> None:
+        self.set_page_image(self.render_page_image(pdf_page))
+
+
+class TileManager:
+    """Render page tiles from the PDF at power-of-two zoom levels.
+
+    Tiles are cached per page, level and overlay with LRU eviction, so
+    zooming inside one level and scrolling reuse rendered tiles.
+    """
+
+    def __init__(
+        self,
+        pdf_handler: PDFHandler,
+        tile_size: int = 512,
+        max_tiles: int = 96,
+        min_level_scale: float = 0.25,
+        max_level_scale: float = 8.0,
+    ) -> None:
+        self.pdf_handler = pdf_handler
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.min_level_scale = min_level_scale
+        self.max_level_scale = max_level_scale
+        self.tiles = OrderedDict()
+
+    def get_level_scale(self, display_scale: float) -> float:
+        # Next level above display scale, so tiles are only downscaled
+        level_scale = 2.0 ** math.ceil(math.log2(display_scale))
+        return min(max(level_scale, self.min_level_scale), self.max_level_scale)
+
+    def get_level_size(
+        self, page_size: tuple[float, float], level_scale: float
+    ) -> tuple[int, int]:
+        return (
+            math.ceil(page_size[0] * level_scale),
+            math.ceil(page_size[1] * level_scale),
+        )
+
+    def get_tile_box(
+        self, level_size: tuple[int, int], tile_idx: tuple[int, int]
+    ) -> tuple[int, int, int, int]:
+        left = tile_idx[0] * self.tile_size
+        top = tile_idx[1] * self.tile_size
+        right = min(left + self.tile_size, level_size[0])
+        bottom = min(top + self.tile_size, level_size[1])
+        return left, top, right, bottom
+
+    def render_tile(
+        self, pdf_page, level_scale: float, box: tuple[int, int, int, int]
     ) -> Image.Image:
-        if zoom_level == 1.0:
-            return self.image_handler.resize_image(
-                self.base_image, canvas_width, canvas_height
-            )
-        else:
-            width = int(self.base_image.width * zoom_level)
-            height = int(self.base_image.height * zoom_level)
-            return self.base_image.resize((width, height), Image.Resampling.LANCZOS)
+        tile = self.pdf_handler.get_page_tile(pdf_page, level_scale, box)
+
+        # Rounding in pdfium can give a pixel more or less than the box
+        tile_size = (box[2] - box[0], box[3] - box[1])
+        if tile.size != tile_size:
+            tile = tile.resize(tile_size, Image.Resampling.BILINEAR)
+
+        return tile
+
+    @staticmethod
+    def shift_polygons(
+        id2polygons: dict, scale: float, box: tuple[int, int, int, int]
+    ) -> dict:
+        return {
+            cls: [
+                [(x * scale - box[0], y * scale - box[1]) for x, y in polygon]
+                for polygon in polygons
+            ]
+            for cls, polygons in id2polygons.items()
+        }
+
+    def get_tile(self, key: tuple) -> Image.Image | None:
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+        return tile
+
+    def put_tile(self, key: tuple, tile: Image.Image) -> None:
+        self.tiles[key] = tile
+        self.tiles.move_to_end(key)
+        while len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+
+    def clear(self) -> None:
+        self.tiles.clear()
 
 
 class PredictionManager:
@@ -97,31 +193,56 @@ class PredictionManager:
         }
 
     def run_ml(self, original_image: Image.Image) -> tuple:
+        drawn_image, question_images, processed_question_images, _ = self.predict(
+            original_image
+        )
+        self.question_images = question_images
+        self.processed_question_images = processed_question_images
+        return drawn_image, len(self.question_images)
+
+    def predict(self, original_image: Image.Image) -> tuple:
+        # Doesn't change manager state, so it can run on a worker thread
         page_predictions = self.predict_page(original_image)
         drawn_image = self._draw_polygons(original_image, page_predictions.id2polygons)
-        self.predict_questions(original_image, page_predictions)
-        return drawn_image, len(self.question_images)
+        question_images, processed_question_images = self._predict_questions(
+            original_image, page_predictions
+        )
+        return (
+            drawn_image,
+            question_images,
+            processed_question_images,
+            page_predictions.id2polygons,
+        )
 
     def predict_page(self, original_image: Image.Image) -> SegmentationPredictionResult:
         return self.page_predictor.predict(original_image)
 
-    def predict_questions(self, original_image: Image.Image, page_predictions):
+    def _predict_questions(
+        self, original_image: Image.Image, page_predictions
+    ) -> tuple[list[Image.Image], list[Image.Image]]:
         question_data = [
             (self.image_handler.crop_image(original_image, polygon), polygon)
             for cls, polygons in page_predictions.id2polygons.items()
             if page_predictions.id2label[cls] == "question"
             for polygon in polygons
         ]
-        self.question_images = [data[0] for data in question_data]
+        question_images = [data[0] for data in question_data]
 
         # Create copies of question images and draw polygons on them
-        self.processed_question_images = []
-        for question_image in self.question_images:
+        processed_question_images = []
+        for question_image in question_images:
             question_predictions = self.question_predictor.predict(question_image)
             processed_image = self._draw_polygons(
                 question_image, question_predictions.id2polygons
             )
-            self.processed_question_images.append(processed_image)
+            processed_question_images.append(processed_image)
+
+        return question_images, processed_question_images
+
+    def predict_questions(self, original_image: Image.Image, page_predictions):
+        self.question_images, self.processed_question_images = (
+            self._predict_questions(original_image, page_predictions)
+        )
 
     def _draw_polygons(self, image: Image.Image, id2polygons: dict) -> Image.Image:
         drawn_image = image.copy()
@@ -1,7 +1,9 @@
 import ctypes
 import tkinter as tk
 from tkinter import ttk
-from PIL import Image, ImageTk
+from PIL import ImageTk
+
+from digitex.core.processors.img import ImgProcessor, ImgResizer
 
 
 class UserInterface:
@@ -13,6 +15,10 @@ class UserInterface:
         self.right_width_weight = 7
         self.selected_question_index = -1  # Initialize with no selection
 
+        # Question images are shown again on every selection at the same size
+        self.img_resizer = ImgResizer()
+        self._question_imgs = {}
+
     def setup_ui(self) -> None:
         self._setup_root()
         self._setup_menubar()
@@ -71,8 +77,13 @@ class UserInterface:
     def _create_canvas_with_scrollbars(self, parent: ttk.Frame) -> tk.Canvas:
         h_scroll = ttk.Scrollbar(parent, orient=tk.HORIZONTAL)
         v_scroll = ttk.Scrollbar(parent, orient=tk.VERTICAL)
+        # Every view change repaints visible page tiles
         canvas = tk.Canvas(
-            parent, bg="lightgray", xscrollcommand=h_scroll.set, yscrollcommand=v_scroll.set)
+            parent,
+            bg="lightgray",
+            xscrollcommand=lambda *args: self._on_view_changed(h_scroll, *args),
+            yscrollcommand=lambda *args: self._on_view_changed(v_scroll, *args),
+        )
         h_scroll.config(command=canvas.xview)
         v_scroll.config(command=canvas.yview)
         v_scroll.pack(side=tk.RIGHT, fill=tk.Y)
@@ -83,9 +94,14 @@ class UserInterface:
         canvas.bind("<ButtonPress-1>", self.app.start_drag)
         canvas.bind("<B1-Motion>", self.app.on_drag)
         canvas.bind("<ButtonRelease-1>", self.app.stop_drag)
+        canvas.bind("<Configure>", self.app.on_canvas_configure)
 
         return canvas
 
+    def _on_view_changed(self, scrollbar: ttk.Scrollbar, *args) -> None:
+        scrollbar.set(*args)
+        self.app.on_view_changed()
+
     def _setup_navigation_controls(self, parent: ttk.Frame) -> None:
         nav_frame = ttk.Frame(parent)
         ttk.Button(nav_frame, text="< Prev",
@@ -155,6 +171,7 @@ class UserInterface:
         parent.add(bottom_frame, weight=10)
 
     def setup_question_controls(self, num_questions: int) -> None:
+        self._question_imgs = {}
         for widget in self.question_nav_frame.winfo_children():
             widget.destroy()
 
@@ -168,8 +185,9 @@ class UserInterface:
         question_image = self.app.prediction_manager.processed_question_images[index]
         canvas_width, canvas_height = self.top_canvas.winfo_width(
         ), self.top_canvas.winfo_height()
+        question_img = self._get_question_img(index, question_image)
         resized_image = self._resize_image_to_fit_canvas(
-            question_image, canvas_width, canvas_height)
+            question_img, canvas_width, canvas_height)
         tk_image = ImageTk.PhotoImage(resized_image)
         x_offset = (canvas_width - resized_image.width) // 2
         y_offset = (canvas_height - resized_image.height) // 2
@@ -177,12 +195,17 @@ class UserInterface:
             x_offset, y_offset, anchor=tk.NW, image=tk_image)
         self.top_canvas.image = tk_image
 
-    @staticmethod
-    def _resize_image_to_fit_canvas(image, canvas_width, canvas_height):
-        img_width, img_height = image.size
-        scale = min(canvas_width / img_width, canvas_height / img_height)
-        new_dimensions = (int(img_width * scale), int(img_height * scale))
-        return image.resize(new_dimensions, Image.Resampling.LANCZOS)
+    def _get_question_img(self, index, image):
+        # Image is converted once, until another one is shown at the index
+        cached = self._question_imgs.get(index)
+        if cached is None or cached[0] is not image:
+            cached = (image, ImgProcessor.image2img(image))
+            self._question_imgs[index] = cached
+        return cached[1]
+
+    def _resize_image_to_fit_canvas(self, img, canvas_width, canvas_height):
+        resized_img = self.img_resizer.resize(img, canvas_width, canvas_height)
+        return ImgProcessor.img2image(resized_img)
 
     def _setup_status_bar(self) -> None:
         self.status_label = ttk.Label(
@@ -0,0 +1,123 @@
+import queue
+import itertools
+import threading
+from typing import Callable, Hashable
+
+import tkinter as tk
+from PIL import Image
+
+
+class PageResult:
+    def __init__(
+        self, original_image: Image.Image, page_size: tuple[float, float]
+    ) -> None:
+        self.original_image = original_image
+        self.page_size = page_size
+        self.drawn_image = None
+        self.id2polygons = None
+        self.question_images = []
+        self.processed_question_images = []
+
+    @property
+    def is_predicted(self) -> bool:
+        return self.drawn_image is not None
+
+
+class PageWorker:
+    """Run page rendering and inference jobs on a background thread.
+
+    Jobs with lower priority run first. Results are put to a queue that
+    the Tk main thread polls with root.after, because Tk widgets must only
+    be touched from the main thread. Queued jobs with keys outside of the
+    wanted set or submitted before cancel_all are cancelled and their
+    callbacks get None. cancel_all doesn't wait for the running job, its
+    late result goes through the same queue and is replaced by None.
+    Jobs submitted with cancellable=False always run and report result.
+    """
+
+    def __init__(self, root: tk.Tk, poll_interval: int = 30) -> None:
+        self.root = root
+        self.poll_interval = poll_interval
+
+        self._jobs = queue.PriorityQueue()
+        self._results = queue.Queue()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._wanted_keys = None
+        self._generation = 0
+
+        # Single thread, so pdf document and models are never used concurrently
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self.root.after(self.poll_interval, self._poll)
+
+    def submit(
+        self,
+        priority: int,
+        key: Hashable,
+        func: Callable,
+        callback: Callable,
+        cancellable: bool = True,
+    ) -> None:
+        with self._lock:
+            generation = self._generation
+        self._jobs.put(
+            (
+                priority,
+                next(self._counter),
+                generation,
+                cancellable,
+                key,
+                func,
+                callback,
+            )
+        )
+
+    def keep_only(self, keys: list[Hashable]) -> None:
+        with self._lock:
+            self._wanted_keys = set(keys)
+
+    def _is_wanted(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._wanted_keys is None or key in self._wanted_keys
+
+    def _is_cancelled(self, generation: int) -> bool:
+        with self._lock:
+            return generation != self._generation
+
+    def cancel_all(self) -> None:
+        # Returns at once, Tk main thread never waits for the running job
+        with self._lock:
+            self._generation += 1
+            self._wanted_keys = None
+
+    def _run(self) -> None:
+        while True:
+            _, _, generation, cancellable, key, func, callback = self._jobs.get()
+
+            if cancellable and (
+                self._is_cancelled(generation) or not self._is_wanted(key)
+            ):
+                self._results.put((key, callback, None, None))
+                continue
+
+            try:
+                result = func()
+            except Exception as error:
+                self._results.put((key, callback, None, error))
+                continue
+
+            # Job cancelled while running reports like a queued one
+            if cancellable and self._is_cancelled(generation):
+                result = None
+            self._results.put((key, callback, result, None))
+
+    def _poll(self) -> None:
+        while True:
+            try:
+                key, callback, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            callback(key, result, error)
+
+        self.root.after(self.poll_interval, self._poll)
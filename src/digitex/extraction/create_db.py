@@ -1,5 +1,8 @@
 import sqlite3
 
+from digitex.core.database.sampling import QuestionSampler
+from digitex.core.database.search import QuestionSearch
+
 DATABASE_PATH = "data/tests.db"
 SQL_SCRIPT_PATH = "script.sql"
 
@@ -12,6 +15,9 @@ def main():
     cursor = connection.cursor()
     cursor.executescript(creation_queries)
     connection.commit()
+    QuestionSearch.create_index(connection)
+    QuestionSampler.create_indexes(connection)
+    QuestionSampler.create_version_triggers(connection)
     connection.close()
 
 
@@ -0,0 +1,17 @@
+from digitex.core.database.ingestion import QuestionIngestor
+
+DATABASE_PATH = "data/tests.db"
+QUESTIONS_JSON_PATH = "outputs/questions.jsonl"
+
+
+def main():
+    ingestor = QuestionIngestor(DATABASE_PATH)
+    stats = ingestor.ingest_json(QUESTIONS_JSON_PATH)
+    print(
+        f"Inserted {stats['inserted']}, updated {stats['updated']}, "
+        f"unchanged {stats['unchanged']} questions."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -47,6 +47,7 @@ CREATE TABLE questions (
     question_number INTEGER NOT NULL,
     text TEXT NOT NULL,
     specification TEXT,
+    content_hash TEXT NOT NULL,    -- Hash of question content for idempotent loads
     FOREIGN KEY (part_id) REFERENCES parts(part_id),
     UNIQUE (part_id, question_number)
 );
@@ -70,14 +71,47 @@ CREATE TABLE answers (
     FOREIGN KEY (question_id) REFERENCES questions(question_id)
 );
 
+CREATE INDEX idx_answers_question_id ON answers (question_id);
+
+-- Blobs table (unique image files of content-addressed store)
+CREATE TABLE blobs (
+    blob_hash TEXT PRIMARY KEY,    -- sha256 of image file
+    ext TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    ref_count INTEGER NOT NULL DEFAULT 0   -- Kept by triggers on images
+);
+
+-- Telegram file ids of uploaded blob variants
+CREATE TABLE blob_file_ids (
+    blob_hash TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    FOREIGN KEY (blob_hash) REFERENCES blobs(blob_hash),
+    PRIMARY KEY (blob_hash, variant)
+);
+
 -- Images table
 CREATE TABLE images (
     image_id INTEGER PRIMARY KEY,
     question_id INTEGER NOT NULL,
-    image_data BLOB NOT NULL,      -- Changed from image_path to image_data
+    blob_hash TEXT NOT NULL,       -- Changed from image_data to blob store reference
     is_table BOOLEAN NOT NULL,     -- Changed from image_type to is_table
     image_order INTEGER NOT NULL,
     FOREIGN KEY (question_id) REFERENCES questions(question_id),
+    FOREIGN KEY (blob_hash) REFERENCES blobs(blob_hash),
     UNIQUE (question_id, image_order),
     CHECK (is_table IN (0, 1))     -- Ensures boolean values (0 = common, 1 = table)
-);
\ No newline at end of file
+);
+
+CREATE TRIGGER images_blob_insert AFTER INSERT ON images BEGIN
+    UPDATE blobs SET ref_count = ref_count + 1 WHERE blob_hash = new.blob_hash;
+END;
+
+CREATE TRIGGER images_blob_delete AFTER DELETE ON images BEGIN
+    UPDATE blobs SET ref_count = ref_count - 1 WHERE blob_hash = old.blob_hash;
+END;
+
+CREATE TRIGGER images_blob_update AFTER UPDATE OF blob_hash ON images BEGIN
+    UPDATE blobs SET ref_count = ref_count - 1 WHERE blob_hash = old.blob_hash;
+    UPDATE blobs SET ref_count = ref_count + 1 WHERE blob_hash = new.blob_hash;
+END;
\ No newline at end of file
@@ -1,6 +1,4 @@
 import os
-import shutil
-import random
 import json
 import math
 import re
@@ -8,12 +6,21 @@ import re
 from urllib.parse import unquote
 
 from digitex.core.processors.file import FileProcessor
+from digitex.core.partition import DatasetPartitioner, SplitAssigner
 
 
 class DatasetCreator:
     def __init__(
-        self, raw_dir: str, dataset_dir: str, train_split: float = 0.8
+        self,
+        raw_dir: str,
+        dataset_dir: str,
+        train_split: float = 0.8,
+        partition_mode: str = "auto",
+        incremental: bool = False,
     ) -> None:
+        # Only changes of splits are placed into existing dataset
+        self.incremental = incremental
+
         # Paths
         self.raw_dir = raw_dir
         self.raw_images_dir = os.path.join(raw_dir, "images")
@@ -27,6 +34,12 @@ class DatasetCreator:
         # Data split
         self.train_split = train_split
         self.val_split = 1 - self.train_split
+        self.split_assigner = SplitAssigner(
+            {"train": self.train_split, "val": self.val_split}
+        )
+
+        # Images of splits are linked to raw images if possible
+        self.partitioner = DatasetPartitioner(mode=partition_mode)
 
         # Annotation creator
         self.annotation_creator = AnnotationCreator(
@@ -36,29 +49,46 @@ class DatasetCreator:
         )
 
     def _setup_dataset_dirs(self) -> None:
-        os.mkdir(self.dataset_dir)
+        os.makedirs(self.dataset_dir, exist_ok=self.incremental)
+        self.manifest_path = os.path.join(self.dataset_dir, "manifest.json")
 
         # Train dirs
         self.train_dir = os.path.join(self.dataset_dir, "train")
         train_images_dir = os.path.join(self.train_dir, "images")
-        os.makedirs(train_images_dir)
+        os.makedirs(train_images_dir, exist_ok=self.incremental)
 
         # Val dirs
         self.val_dir = os.path.join(self.dataset_dir, "val")
         val_images_dir = os.path.join(self.val_dir, "images")
-        os.makedirs(val_images_dir)
-
-    def _copy_data(self, listdir: list[str], set_dir: str, anns_dict: dict) -> None:
-        # Create empty dict to store formatted annotations
-        set_anns_dict = {}
+        os.makedirs(val_images_dir, exist_ok=self.incremental)
+
+    def _copy_data(
+        self,
+        listdir: list[str],
+        set_dir: str,
+        anns_dict: dict,
+        added: list[str],
+        removed: list[str],
+    ) -> None:
+        # Remove images which left the split
+        self.partitioner.remove_many(
+            [os.path.join(set_dir, "images", image_name) for image_name in removed]
+        )
 
-        # Copy image
-        for image_name in listdir:
-            shutil.copyfile(
+        # Link or copy new images
+        pairs = [
+            (
                 os.path.join(self.raw_images_dir, image_name),
                 os.path.join(set_dir, "images", image_name),
             )
-            set_anns_dict[image_name] = anns_dict[image_name]
+            for image_name in added
+        ]
+        self.partitioner.place_many(
+            pairs, desc=f"Partitioning {os.path.basename(set_dir)} data"
+        )
+
+        # Annotations of all images in the split
+        set_anns_dict = {image_name: anns_dict[image_name] for image_name in listdir}
 
         # Convert annotations to strings
         lines = []
@@ -72,24 +102,32 @@ class DatasetCreator:
         FileProcessor.write_txt(label_path, lines)
 
     def _partitionate_data(self) -> None:
-        # Images listdir and shuffle
-        images_listdir = os.listdir(self.raw_images_dir)
-        random.shuffle(images_listdir)
+        # Stable train and validation listdirs from hashes of image names
+        images_listdir = sorted(os.listdir(self.raw_images_dir))
+        splits = self.split_assigner.split(images_listdir)
 
-        # Create train and validation listdirs
-        num_train = int(len(images_listdir) * self.train_split)
-        num_val = int(len(images_listdir) * self.val_split)
-        train_listdir = images_listdir[:num_train]
-        val_listdir = images_listdir[num_train : num_train + num_val]
+        # Changes since the last build, everything for a new dataset
+        old_splits = {}
+        if self.incremental:
+            manifest = DatasetPartitioner.read_manifest(self.manifest_path)
+            old_splits = manifest.get("splits", {})
+        added, removed = DatasetPartitioner.diff_splits(old_splits, splits)
 
         # Load anns dict
         anns_dict = FileProcessor.read_json(json_path=self.anns_json_path)
 
         # Copy the images to folders and create annotation file
-        for listdir, set_dir in zip(
-            (train_listdir, val_listdir), (self.train_dir, self.val_dir)
-        ):
-            self._copy_data(listdir=listdir, set_dir=set_dir, anns_dict=anns_dict)
+        for split, set_dir in zip(("train", "val"), (self.train_dir, self.val_dir)):
+            self._copy_data(
+                listdir=splits[split],
+                set_dir=set_dir,
+                anns_dict=anns_dict,
+                added=added[split],
+                removed=removed[split],
+            )
+
+        # Manifest of splits is written last, after all files are placed
+        DatasetPartitioner.write_manifest(self.manifest_path, splits)
 
     def create_dataset(self) -> None:
         # Create annotations
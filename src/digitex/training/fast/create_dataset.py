@@ -14,12 +14,26 @@ parser.add_argument("--train_split",
                     type=float,
                     help="Split of training dataset.")
 
+# Get an arg for how files of splits are placed
+parser.add_argument("--partition_mode",
+                    default="auto",
+                    type=str,
+                    choices=["auto", "hardlink", "reflink", "symlink", "copy"],
+                    help="How files of splits are placed, 'auto' links them if possible.")
+
+# Get an arg for incremental rebuilds
+parser.add_argument("--incremental",
+                    action="store_true",
+                    help="Whether to place only changes of splits into existing dataset.")
+
 
 # Get our arguments from the parser
 args = parser.parse_args()
 
 # Setup hyperparameters
 TRAIN_SPLIT = args.train_split
+PARTITION_MODE = args.partition_mode
+INCREMENTAL = args.incremental
 
 HOME = os.getcwd()
 DATA = os.path.join(HOME, "data")
@@ -32,7 +46,9 @@ def main() -> None:
     # Initializing dataset creator and process data
     dataset_creator = DatasetCreator(raw_dir=RAW_DIR,
                                      dataset_dir=DATASET_DIR,
-                                     train_split=TRAIN_SPLIT)
+                                     train_split=TRAIN_SPLIT,
+                                     partition_mode=PARTITION_MODE,
+                                     incremental=INCREMENTAL)
     dataset_creator.create_dataset()
 
     # Visualize dataset annotations
@@ -3,10 +3,16 @@ from PIL import Image
 
 import numpy as np
 import albumentations as A
-from tqdm import tqdm
 
+from digitex.core.handlers.names import NameAllocator
 from digitex.core.processors.file import FileProcessor
-from digitex.core.utils import get_random_img
+from digitex.core.processors.aug import AugPipeline, get_default_transforms
+from digitex.core.utils import (
+    get_random_img,
+    seed_everything,
+    iter_augment_progress,
+    run_augment_workers,
+)
 from digitex.training.superpoint.components.annotation import (
     RelativeKeypoint,
     AbsoluteKeypoint,
@@ -20,6 +26,8 @@ class BaseAugmenter:
         self,
         raw_dir: str,
         dataset_dir: str,
+        profile: bool = False,
+        time_budget: float | None = None,
     ) -> None:
         # Paths
         self.raw_dir = raw_dir
@@ -33,62 +41,73 @@ class BaseAugmenter:
         self._transforms = None
         self._augmenter = None
 
+        # Profiling and time budget (seconds per sample) of AugPipeline
+        self.profile = profile
+        self.time_budget = time_budget
+
+        # Set in workers of multi-process augmentation
+        self.seed = None
+        self.worker_idx = None
+        self.progress_queue = None
+        self.name_allocator = None
+
     @property
-    def transforms(self) -> A.Compose:
+    def transforms(self) -> list[A.BasicTransform]:
         if self._transforms is None:
-            self._transforms = [
-                A.AdditiveNoise(p=0.3),
-                A.Downscale(scale_range=[0.4, 0.9], p=0.3),
-                A.RGBShift(p=0.3),
-                A.RingingOvershoot(p=0.3),
-                A.Spatter(mean=[0.5, 0.6], p=0.2),
-                A.ToGray(p=0.4),
-                A.ChannelShuffle(p=0.3),
-                A.Emboss(p=0.3),
-                A.GaussNoise(std_range=[0.05, 0.15], p=0.3),
-                A.HueSaturationValue(p=0.3),
-                A.MedianBlur(p=0.3),
-                A.PlanckianJitter(p=0.3),
-                A.RandomBrightnessContrast(p=0.3),
-                A.RandomShadow(shadow_intensity_range=[0.1, 0.4], p=0.3),
-                A.SaltAndPepper(amount=[0.01, 0.03], p=0.2),
-                A.GaussianBlur(blur_limit=6, p=0.3),
-                A.ISONoise(p=0.2),
-                A.MotionBlur(p=0.3),
-                A.PlasmaBrightnessContrast(p=0.3),
-                A.RandomFog(p=0.3),
-                A.Sharpen(p=0.4),
-                A.Blur(p=0.3),
-                A.Illumination(p=0.3),
-                A.CLAHE(p=0.3),
-                A.Posterize(p=0.3),
-                A.Affine(scale=[0.92, 1.08], fill=255, p=0.4),
-                A.CoarseDropout(fill=255, p=0.1),
-                A.Pad(padding=[15, 15], fill=255, p=0.4),
-                A.RandomScale(p=0.4),
-                A.SafeRotate(limit=(-3, 3), fill=255, p=0.4),
-            ]
+            self._transforms = get_default_transforms()
 
         return self._transforms
 
     @property
-    def augmenter(self) -> None:
+    def augmenter(self) -> AugPipeline:
         return self._augmenter
 
     @augmenter.setter
     def augmenter(self, value) -> None:
         self._augmenter = value
 
+    def _create_pipeline(self, keypoints: bool) -> AugPipeline:
+        return AugPipeline(
+            self.transforms,
+            keypoints=keypoints,
+            seed=self.seed,
+            profile=self.profile,
+            time_budget=self.time_budget,
+        )
+
+    def print_profile(self) -> None:
+        if self.profile and self._augmenter is not None:
+            self._augmenter.print_report()
+
+    def _setup_shard(
+        self,
+        seed: int | None,
+        worker_idx: int | None,
+        name_counters: dict[str, int] | None = None,
+        num_workers: int = 1,
+    ) -> None:
+        # Transforms are rebuilt with seed of the shard
+        self.seed = seed
+        self.worker_idx = worker_idx
+        self._augmenter = None
+        seed_everything(seed)
+
+        # Workers reserve disjoint name numbers over counters scanned once
+        self.name_allocator = NameAllocator(
+            self.images_dir,
+            self.img_ext,
+            counters=name_counters,
+            worker_idx=worker_idx or 0,
+            num_workers=num_workers,
+        )
+
     def find_path(self, img_path: str) -> str:
-        name = os.path.splitext(img_path)[0]
+        # Images dir is scanned once, next names come from counters
+        if self.name_allocator is None:
+            self.name_allocator = NameAllocator(self.images_dir, self.img_ext)
 
-        increment = 1
-        while True:
-            filename = f"{name}_aug_{increment}{self.img_ext}"
-            filepath = os.path.join(self.train_dir, filename)
-            if not os.path.exists(filepath):
-                return filename
-            increment += 1
+        name = os.path.splitext(img_path)[0]
+        return f"{self.name_allocator.allocate(name)}{self.img_ext}"
 
     def transform_and_save_image(self, img_path: str, img: np.ndarray) -> None:
         aug_img_filename = self.find_path(img_path)
@@ -102,18 +121,27 @@ class BaseAugmenter:
 
 
 class KeypointAugmenter(BaseAugmenter):
-    def __init__(self, raw_dir: str, dataset_dir: str) -> None:
-        super().__init__(raw_dir, dataset_dir)
+    def __init__(
+        self,
+        raw_dir: str,
+        dataset_dir: str,
+        profile: bool = False,
+        time_budget: float | None = None,
+    ) -> None:
+        super().__init__(raw_dir, dataset_dir, profile, time_budget)
+        self.augmenter_kwargs = {
+            "raw_dir": raw_dir,
+            "dataset_dir": dataset_dir,
+            "profile": profile,
+            "time_budget": time_budget,
+        }
 
     @property
-    def augmenter(self) -> A.Compose:
+    def augmenter(self) -> AugPipeline:
         if self._augmenter is None:
-            augmenter = A.Compose(
-                self.transforms,
-                keypoint_params=A.KeypointParams(format="xy", remove_invisible=False),
-            )
+            self._augmenter = self._create_pipeline(keypoints=True)
 
-        return augmenter
+        return self._augmenter
 
     @staticmethod
     def create_rel_kps_from_label(
@@ -203,13 +231,25 @@ class KeypointAugmenter(BaseAugmenter):
 
         return transf_img, transf_label
 
-    def augment(self, num_images) -> None:
+    def _augment_shard(
+        self,
+        num_images: int,
+        seed: int | None = None,
+        worker_idx: int | None = None,
+        name_counters: dict[str, int] | None = None,
+        num_workers: int = 1,
+    ) -> dict[str, list]:
+        self._setup_shard(seed, worker_idx, name_counters, num_workers)
+
         label_path = os.path.join(self.train_dir, "labels.json")
         labels_dict = FileProcessor.read_json(label_path)
+        images_listdir = sorted(labels_dict.keys())
 
-        for _ in tqdm(range(num_images), desc="Augmenting images"):
+        # Labels of augmented images only, merged into labels.json by caller
+        aug_labels_dict = {}
+        for _ in iter_augment_progress(num_images, self.progress_queue):
             # Get random img
-            img_path, img = get_random_img(self.images_dir, list(labels_dict.keys()))
+            img_path, img = get_random_img(self.images_dir, images_listdir)
             orig_height, orig_width = img.shape[:2]
 
             # Create KeypointsObject from labels
@@ -236,10 +276,38 @@ class KeypointAugmenter(BaseAugmenter):
             # Transform and save augmented image
             aug_img_path = self.transform_and_save_image(img_path, transf_img)
 
-            # Add label to labels_dict
-            labels_dict[aug_img_path] = transf_abs_kps_obj.get_label()
+            # Add label to aug_labels_dict
+            aug_labels_dict[aug_img_path] = transf_abs_kps_obj.get_label()
+
+        self.print_profile()
 
-        # Save annotation
+        return aug_labels_dict
+
+    def augment(
+        self, num_images: int, workers: int = 1, seed: int | None = None
+    ) -> None:
+        # Images dir is scanned once for used names
+        name_counters = NameAllocator.scan(self.images_dir, self.img_ext)
+
+        if workers == 1:
+            aug_labels_dicts = [
+                self._augment_shard(num_images, seed, name_counters=name_counters)
+            ]
+        else:
+            aug_labels_dicts = run_augment_workers(
+                self,
+                num_images,
+                workers,
+                seed,
+                name_counters=name_counters,
+                num_workers=workers,
+            )
+
+        # labels.json is rewritten once with labels of all workers
+        label_path = os.path.join(self.train_dir, "labels.json")
+        labels_dict = FileProcessor.read_json(label_path)
+        for aug_labels_dict in aug_labels_dicts:
+            labels_dict.update(aug_labels_dict)
         FileProcessor.write_json(labels_dict, label_path)
 
         return None
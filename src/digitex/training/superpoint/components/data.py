@@ -1,6 +1,4 @@
 import os
-import random
-import shutil
 from PIL import Image
 
 import torch
@@ -8,6 +6,8 @@ import torch
 from tqdm import tqdm
 
 from digitex.core.processors.file import FileProcessor
+from digitex.core.handlers.shard import TarShardReader
+from digitex.core.partition import DatasetPartitioner, SplitAssigner
 
 from .annotation import AnnotationCreator
 from .augmenter import KeypointAugmenter
@@ -20,18 +20,34 @@ class DatasetCreator:
         dataset_dir,
         max_keypoints: int,
         train_split=0.8,
+        partition_mode: str = "auto",
+        incremental: bool = False,
     ) -> None:
+        # Only changes of splits are placed into existing dataset
+        self.incremental = incremental
+
         self.raw_dir = raw_dir
         self.raw_images_dir = os.path.join(raw_dir, "images")
         self.data_json_path = os.path.join(raw_dir, "data.json")
         self.anns_json_path = os.path.join(raw_dir, "anns.json")
 
+        # Raw images can be stored in tar shards
+        self.shard_reader = None
+        if TarShardReader.is_sharded(self.raw_images_dir):
+            self.shard_reader = TarShardReader(self.raw_images_dir)
+
         self.dataset_dir = dataset_dir
         self._setup_dataset_dirs()
 
         # Data split
         self.train_split = train_split
         self.val_split = 1 - self.train_split
+        self.split_assigner = SplitAssigner(
+            {"train": self.train_split, "val": self.val_split}
+        )
+
+        # Images of splits are linked to raw images if possible
+        self.partitioner = DatasetPartitioner(mode=partition_mode)
 
         self.anns_creator = AnnotationCreator(
             data_json_path=self.data_json_path,
@@ -40,64 +56,85 @@ class DatasetCreator:
         )
 
     def _setup_dataset_dirs(self) -> None:
-        os.mkdir(self.dataset_dir)
+        os.makedirs(self.dataset_dir, exist_ok=self.incremental)
+        self.manifest_path = os.path.join(self.dataset_dir, "manifest.json")
 
         self.train_dir = os.path.join(self.dataset_dir, "train")
         self.val_dir = os.path.join(self.dataset_dir, "val")
 
         for set_dir in [self.train_dir, self.val_dir]:
-            os.mkdir(set_dir)
-            os.mkdir(os.path.join(set_dir, "images"))
+            os.makedirs(os.path.join(set_dir, "images"), exist_ok=self.incremental)
 
-    def _train_val_split(self) -> tuple[list[str], list[str]]:
-        # Images listdir and shuffle
-        images_listdir = os.listdir(self.raw_images_dir)
-        random.shuffle(images_listdir)
-
-        # Create train and validation listdirs
-        num_train = int(len(images_listdir) * self.train_split)
-        num_val = int(len(images_listdir) * self.val_split)
-        train_listdir = images_listdir[:num_train]
-        val_listdir = images_listdir[num_train : num_train + num_val]
+    def _train_val_split(self) -> dict[str, list[str]]:
+        # Stable train and validation listdirs from hashes of image names
+        if self.shard_reader is not None:
+            images_listdir = self.shard_reader.listdir()
+        else:
+            images_listdir = os.listdir(self.raw_images_dir)
 
-        return train_listdir, val_listdir
+        return self.split_assigner.split(sorted(images_listdir))
 
-    def _copy_image(self, set_dir: str, image_filename: str) -> None:
-        # Copy image
-        src_path = os.path.join(self.raw_images_dir, image_filename)
-        dst_path = os.path.join(set_dir, "images", image_filename)
+    def _place_images(self, set_dir: str, added: list[str], removed: list[str]) -> None:
+        # Remove images which left the split
+        self.partitioner.remove_many(
+            [os.path.join(set_dir, "images", filename) for filename in removed]
+        )
 
-        # Copy the image file
-        shutil.copy2(src_path, dst_path)
+        # Shard readers take names of images, not paths
+        pairs = []
+        for image_filename in added:
+            src_path = image_filename
+            if self.shard_reader is None:
+                src_path = os.path.join(self.raw_images_dir, image_filename)
+            dst_path = os.path.join(set_dir, "images", image_filename)
+            pairs.append((src_path, dst_path))
+
+        self.partitioner.place_many(
+            pairs,
+            shard_reader=self.shard_reader,
+            desc=f"Partitioning {os.path.basename(set_dir)} data",
+        )
 
         return None
 
     def _partitionate_data(self) -> None:
         # Split listdir
-        train_listdir, val_listdir = self._train_val_split()
+        splits = self._train_val_split()
+
+        # Changes since the last build, everything for a new dataset
+        old_splits = {}
+        if self.incremental:
+            manifest = DatasetPartitioner.read_manifest(self.manifest_path)
+            old_splits = manifest.get("splits", {})
+        added, removed = DatasetPartitioner.diff_splits(old_splits, splits)
 
         # Load anns dict
         total_labels_dict = FileProcessor.read_json(json_path=self.anns_json_path)
 
-        # Copy the images to folders and create annotation file
-        for listdir, set_dir in zip(
-            (train_listdir, val_listdir), (self.train_dir, self.val_dir)
-        ):
-            set_labels_dict = {}
-            for image_filename in tqdm(
-                listdir, desc=f"Partitioning {os.path.basename(set_dir)} data"
-            ):
-                # Image processing
-                self._copy_image(set_dir, image_filename)
+        # Link or copy the images to folders and create annotation file
+        for split, set_dir in zip(("train", "val"), (self.train_dir, self.val_dir)):
+            self._place_images(set_dir, added[split], removed[split])
 
-                # Label processing
-                label = total_labels_dict[image_filename]
-                set_labels_dict[image_filename] = label
+            set_labels_dict = {
+                image_filename: total_labels_dict[image_filename]
+                for image_filename in splits[split]
+            }
 
-            # Write labels
+            # Labels of augmented images, which aren't raw images, are kept
             label_path = os.path.join(set_dir, "labels.json")
+            if self.incremental and os.path.exists(label_path):
+                for image_filename, label in FileProcessor.read_json(
+                    json_path=label_path
+                ).items():
+                    if image_filename not in total_labels_dict:
+                        set_labels_dict[image_filename] = label
+
+            # Write labels
             FileProcessor.write_json(set_labels_dict, label_path)
 
+        # Manifest of splits is written last, after all files are placed
+        DatasetPartitioner.write_manifest(self.manifest_path, splits)
+
     def create_dataset(self) -> None:
         self.anns_creator.create_annotations()
         self._partitionate_data()
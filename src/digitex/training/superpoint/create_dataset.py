@@ -17,6 +17,20 @@ parser.add_argument(
     "--train_split", default=0.8, type=float, help="Split of train set."
 )
 
+parser.add_argument(
+    "--partition_mode",
+    default="auto",
+    type=str,
+    choices=["auto", "hardlink", "reflink", "symlink", "copy"],
+    help="How files of splits are placed, 'auto' links them if possible.",
+)
+
+parser.add_argument(
+    "--incremental",
+    action="store_true",
+    help="Whether to place only changes of splits into existing dataset.",
+)
+
 parser.add_argument(
     "--augment", action="store_true", help="Whether to augment train data."
 )
@@ -25,6 +39,27 @@ parser.add_argument(
     "--aug_images", default=100, type=int, help="How many augmented images to create."
 )
 
+parser.add_argument(
+    "--aug_workers", default=1, type=int, help="Processes to augment images with."
+)
+
+parser.add_argument(
+    "--aug_seed", default=None, type=int, help="Seed of augmentation, per worker."
+)
+
+parser.add_argument(
+    "--aug_profile",
+    action="store_true",
+    help="Whether to print time and hit rate of every transform.",
+)
+
+parser.add_argument(
+    "--aug_time_budget",
+    default=None,
+    type=float,
+    help="Seconds of transforms per image, costly transforms are cut to fit.",
+)
+
 parser.add_argument(
     "--visualize", action="store_true", help="Whether to visualize data."
 )
@@ -38,8 +73,14 @@ args = parser.parse_args()
 
 # Setup hyperparameters
 TRAIN_SPLIT = args.train_split
+PARTITION_MODE = args.partition_mode
+INCREMENTAL = args.incremental
 AUGMENT = args.augment
 AUG_IMAGES = args.aug_images
+AUG_WORKERS = args.aug_workers
+AUG_SEED = args.aug_seed
+AUG_PROFILE = args.aug_profile
+AUG_TIME_BUDGET = args.aug_time_budget
 VISUALIZE = args.visualize
 VIS_IMAGES = args.vis_images
 
@@ -67,6 +108,8 @@ def main() -> None:
         dataset_dir=DATASET_DIR,
         max_keypoints=config["dataset"]["max_keypoints"],
         train_split=TRAIN_SPLIT,
+        partition_mode=PARTITION_MODE,
+        incremental=INCREMENTAL,
     )
     dataset_creator.create_dataset()
 
@@ -75,8 +118,10 @@ def main() -> None:
         augmenter = KeypointAugmenter(
             raw_dir=RAW_DIR,
             dataset_dir=DATASET_DIR,
+            profile=AUG_PROFILE,
+            time_budget=AUG_TIME_BUDGET,
         )
-        augmenter.augment(num_images=AUG_IMAGES)
+        augmenter.augment(num_images=AUG_IMAGES, workers=AUG_WORKERS, seed=AUG_SEED)
 
     heatmaps_creator = HeatmapsCreator(
         dataset_dir=DATASET_DIR,
@@ -1,5 +1,4 @@
 import os
-import shutil
 import random
 
 from urllib.parse import unquote
@@ -7,6 +6,7 @@ from urllib.parse import unquote
 from tqdm import tqdm
 
 from digitex.core.processors.file import FileProcessor
+from digitex.core.partition import DatasetPartitioner, SplitAssigner
 
 
 class DatasetCreator:
@@ -16,7 +16,12 @@ class DatasetCreator:
         dataset_dir: str,
         train_split: float = 0.8,
         max_text_length=31,
+        partition_mode: str = "auto",
+        incremental: bool = False,
     ) -> None:
+        # Only changes of splits are placed into existing dataset
+        self.incremental = incremental
+
         # Input paths
         self.raw_dir = raw_dir
         self.chars_txt_path = os.path.join(raw_dir, "chars.txt")
@@ -25,11 +30,15 @@ class DatasetCreator:
         # Output paths
         self.dataset_dir = dataset_dir
         self.charset_txt_path = os.path.join(dataset_dir, "charset.txt")
+        self.manifest_path = os.path.join(dataset_dir, "manifest.json")
         self.__charset = None
 
         # Data split
         self.__setup_splits(train_split)
 
+        # Images of splits are linked to raw images if possible
+        self.partitioner = DatasetPartitioner(mode=partition_mode)
+
         # Sources
         self.sources = ["ls", "synth"]
 
@@ -43,9 +52,12 @@ class DatasetCreator:
     def __setup_splits(self, train_split: float) -> None:
         self.train_split = train_split
         self.val_split = 1 - self.train_split
+        self.split_assigner = SplitAssigner(
+            {"train": self.train_split, "val": self.val_split}
+        )
 
     def __setup_dataset_dirs(self) -> None:
-        os.mkdir(self.dataset_dir)
+        os.makedirs(self.dataset_dir, exist_ok=self.incremental)
 
         # Dataset dirs
         self.train_dir = os.path.join(self.dataset_dir, "train")
@@ -55,7 +67,7 @@ class DatasetCreator:
         # Create dirs
         for dir in self.dataset_dirs:
             image_dir = os.path.join(dir, "images")
-            os.makedirs(image_dir)
+            os.makedirs(image_dir, exist_ok=self.incremental)
 
     @property
     def charset(self) -> set[str]:
@@ -98,26 +110,46 @@ class DatasetCreator:
 
         return None
 
-    def __copy_data(self, gt: dict[str, str], set_dir: str) -> None:
+    def __copy_data(
+        self,
+        gt: dict[str, str],
+        set_dir: str,
+        added: list[str],
+        removed: list[str],
+    ) -> None:
         dir_name = os.path.basename(set_dir)
 
+        # Remove images which left the split
+        self.partitioner.remove_many(
+            [
+                os.path.join(set_dir, "images", os.path.basename(image_path))
+                for image_path in removed
+            ]
+        )
+
         # Create list to store gt lines for txt gt
         gt_lines = []
 
         # Sort dict and iterate through it
         gt = dict(sorted(gt.items(), key=self.sort_gt_key))
 
-        for image_path, text in tqdm(gt.items(), desc=f"Partitioning {dir_name} data"):
+        for image_path, text in gt.items():
             image_name = os.path.basename(image_path)
-            shutil.copyfile(
-                os.path.join(self.raw_dir, image_path),
-                os.path.join(set_dir, "images", image_name),
-            )
 
             # Create line and append it to the gt_lines
             gt_line = f"{image_name}\t{text}\n"
             gt_lines.append(gt_line)
 
+        # Link or copy new images
+        pairs = [
+            (
+                os.path.join(self.raw_dir, image_path),
+                os.path.join(set_dir, "images", os.path.basename(image_path)),
+            )
+            for image_path in added
+        ]
+        self.partitioner.place_many(pairs, desc=f"Partitioning {dir_name} data")
+
         # Write set gt to txt
         gt_txt_path = os.path.join(set_dir, "gt.txt")
         FileProcessor.write_txt(txt_path=gt_txt_path, lines=gt_lines)
@@ -125,23 +157,36 @@ class DatasetCreator:
     def __partitionate_data(
         self, gt_dict: dict[str, str], aug_gt_dict: dict[str, str] = None
     ) -> None:
-        # Shuffle gt_dict
-        gt_dict = self.shuffle_dict(gt_dict)
+        # Stable train and validation gt dicts from hashes of image paths
+        splits = self.split_assigner.split(gt_dict)
+        train_gt_dict = {key: gt_dict[key] for key in splits["train"]}
+        val_gt_dict = {key: gt_dict[key] for key in splits["val"]}
 
-        # Create train and validation gt dicts
-        num_train = int(len(gt_dict) * self.train_split)
-        #  num_val = int(len(gt_dict) * self.val_split)
-        train_gt_dict = {key: gt_dict[key] for key in list(gt_dict.keys())[:num_train]}
-        val_gt_dict = {key: gt_dict[key] for key in list(gt_dict.keys())[num_train:]}
-
-        # Update train_gt_dict with aug_gt_dict and shuffle
+        # Augmented images are always in train
         if aug_gt_dict is not None:
             train_gt_dict.update(aug_gt_dict)
-            train_gt_dict = self.shuffle_dict(train_gt_dict)
+            splits["train"] = list(train_gt_dict)
+
+        # Changes since the last build, everything for a new dataset
+        old_splits = {}
+        if self.incremental:
+            manifest = DatasetPartitioner.read_manifest(self.manifest_path)
+            old_splits = manifest.get("splits", {})
+        added, removed = DatasetPartitioner.diff_splits(old_splits, splits)
 
         # Copy data to corresponding folder
-        for gt_dict, set_dir in zip((train_gt_dict, val_gt_dict), self.dataset_dirs):
-            self.__copy_data(gt=gt_dict, set_dir=set_dir)
+        for split, gt_dict, set_dir in zip(
+            ("train", "val"), (train_gt_dict, val_gt_dict), self.dataset_dirs
+        ):
+            self.__copy_data(
+                gt=gt_dict,
+                set_dir=set_dir,
+                added=added[split],
+                removed=removed[split],
+            )
+
+        # Manifest of splits is written last, after all files are placed
+        DatasetPartitioner.write_manifest(self.manifest_path, splits)
 
     def create_dataset(self, source: str, use_aug=False) -> None:
         # Assert if right source
@@ -1,9 +1,10 @@
 import os
-import shutil
 import random
 from urllib.parse import unquote
 from tqdm import tqdm
 from digitex.core.processors.file import FileProcessor
+from digitex.core.handlers.shard import TarShardReader
+from digitex.core.partition import DatasetPartitioner, SplitAssigner
 from abc import ABC, abstractmethod
 
 import lmdb
@@ -20,14 +21,24 @@ class BaseDatasetCreator(ABC):
         dataset_dir: str,
         train_split: float = 0.8,
         max_text_length=31,
+        partition_mode: str = "auto",
+        incremental: bool = False,
     ) -> None:
         self.raw_dir = raw_dir
         self.dataset_dir = dataset_dir
+        self.manifest_path = os.path.join(dataset_dir, "manifest.json")
+
+        # Only changes of splits are placed into existing dataset
+        self.incremental = incremental
+
+        # Images of splits are linked to raw images if possible
+        self.partitioner = DatasetPartitioner(mode=partition_mode)
 
         self.chars_txt_path = os.path.join(raw_dir, "chars.txt")
         self.replaces_json_path = os.path.join(raw_dir, "replaces.json")
         self.charset_txt_path = os.path.join(dataset_dir, "charset.txt")
         self._charset = None
+        self._shard_readers = {}
 
         self._setup_splits(train_split)
         self.sources = ["ls", "synth"]
@@ -41,6 +52,9 @@ class BaseDatasetCreator(ABC):
     def _setup_splits(self, train_split: float) -> None:
         self.train_split = train_split
         self.val_split = 1 - train_split
+        self.split_assigner = SplitAssigner(
+            {"train": self.train_split, "val": self.val_split}
+        )
 
     @property
     def charset(self) -> set[str]:
@@ -49,6 +63,40 @@ class BaseDatasetCreator(ABC):
             self._charset = set(charset)
         return self._charset
 
+    def _get_shard_reader(self, image_path: str) -> TarShardReader | None:
+        images_dir = os.path.dirname(image_path)
+
+        # Check every images dir once, None for loose images
+        if images_dir not in self._shard_readers:
+            shard_reader = None
+            if TarShardReader.is_sharded(images_dir):
+                shard_reader = TarShardReader(images_dir)
+            self._shard_readers[images_dir] = shard_reader
+
+        return self._shard_readers[images_dir]
+
+    def _read_image(self, image_path: str) -> bytes:
+        shard_reader = self._get_shard_reader(image_path)
+        if shard_reader is not None:
+            return shard_reader.read(os.path.basename(image_path))
+
+        with open(image_path, "rb") as f:
+            return f.read()
+
+    def _get_image_size(self, image_path: str) -> int:
+        shard_reader = self._get_shard_reader(image_path)
+        if shard_reader is not None:
+            return shard_reader.index[os.path.basename(image_path)]["size"]
+
+        return os.path.getsize(image_path)
+
+    def _image_exists(self, image_path: str) -> bool:
+        shard_reader = self._get_shard_reader(image_path)
+        if shard_reader is not None:
+            return shard_reader.exists(os.path.basename(image_path))
+
+        return os.path.exists(image_path)
+
     @staticmethod
     def shuffle_dict(d: dict) -> dict:
         keys = list(d.keys())
@@ -76,13 +124,10 @@ class BaseDatasetCreator(ABC):
     def _partitionate_data(
         self, anns_dict: dict[str, str], aug_anns_dict: dict[str, str] = None
     ):
-        anns_dict = self.shuffle_dict(anns_dict)
-        num_train = int(len(anns_dict) * self.train_split)
-        train_keys = list(anns_dict.keys())[:num_train]
-        val_keys = list(anns_dict.keys())[num_train:]
-
-        train_anns_dict = {key: anns_dict[key] for key in train_keys}
-        val_anns_dict = {key: anns_dict[key] for key in val_keys}
+        # Stable splits from hashes of image paths
+        splits = self.split_assigner.split(anns_dict)
+        train_anns_dict = {key: anns_dict[key] for key in splits["train"]}
+        val_anns_dict = {key: anns_dict[key] for key in splits["val"]}
 
         if aug_anns_dict:
             train_anns_dict.update(aug_anns_dict)
@@ -97,49 +142,86 @@ class BaseDatasetCreator(ABC):
 
 class SimpleDatasetCreator(BaseDatasetCreator):
     def _setup_dataset_dirs(self) -> None:
-        os.mkdir(self.dataset_dir)
+        os.makedirs(self.dataset_dir, exist_ok=self.incremental)
         self.train_dir = os.path.join(self.dataset_dir, "train")
         self.val_dir = os.path.join(self.dataset_dir, "val")
         self.dataset_dirs = (self.train_dir, self.val_dir)
         for dir in self.dataset_dirs:
-            os.mkdir(dir)
             images_dir = os.path.join(dir, "images")
-            os.mkdir(images_dir)
+            os.makedirs(images_dir, exist_ok=self.incremental)
 
     def _copy_data(
-        self, anns_dict: dict[str, str], set_dir: str, images_per_folder: int = 10000
-    ) -> None:
+        self,
+        anns_dict: dict[str, str],
+        set_dir: str,
+        old_paths: dict[str, str],
+        removed: list[str],
+        images_per_folder: int = 10000,
+    ) -> dict[str, str]:
         dir_name = os.path.basename(set_dir)
         images_dir = os.path.join(set_dir, "images")
 
+        # Remove images which left the split
+        self.partitioner.remove_many(
+            [os.path.join(set_dir, old_paths[image_path]) for image_path in removed]
+        )
+
+        # Kept images stay in their subfolders, new ones fill the last subfolder
+        paths = {key: old_paths[key] for key in anns_dict if key in old_paths}
+        subfolder_counts = {}
+        for dst_image_path in paths.values():
+            subfolder_name = dst_image_path.split("/")[1]
+            count = subfolder_counts.get(subfolder_name, 0)
+            subfolder_counts[subfolder_name] = count + 1
+        subfolder_idx = max(map(int, subfolder_counts), default=0)
+        img_in_subfolder = subfolder_counts.get(str(subfolder_idx), 0)
+
         lines = []
         anns_dict = dict(sorted(anns_dict.items(), key=self.sort_anns_key))
-        subfolder_idx = img_in_subfolder = 0
 
-        for image_path, text in tqdm(
-            anns_dict.items(), desc=f"Partitioning {dir_name} data"
-        ):
+        # Pairs of every source, images in shards are placed by their reader
+        pairs = {}
+        for image_path, text in anns_dict.items():
+            if image_path in paths:
+                lines.append(f"{paths[image_path]}\t{text}")
+                continue
+
             if img_in_subfolder >= images_per_folder:
                 subfolder_idx += 1
                 img_in_subfolder = 0
             subfolder_name = str(subfolder_idx)
             subfolder_path = os.path.join(images_dir, subfolder_name)
 
-            if not os.path.exists(subfolder_path):
-                os.mkdir(subfolder_path)
+            if img_in_subfolder == 0:
+                os.makedirs(subfolder_path, exist_ok=True)
 
             src_image_path = os.path.join(self.raw_dir, image_path)
             image_basename = os.path.basename(image_path)
             dst_image_path = os.path.join("images", subfolder_name, image_basename)
             dst_image_path = os.path.normpath(dst_image_path).replace("\\", "/")
-            shutil.copyfile(src_image_path, os.path.join(set_dir, dst_image_path))
+            shard_reader = self._get_shard_reader(src_image_path)
+            if shard_reader is not None:
+                src_image_path = image_basename
+            pairs.setdefault(shard_reader, []).append(
+                (src_image_path, os.path.join(set_dir, dst_image_path))
+            )
 
+            paths[image_path] = dst_image_path
             lines.append(f"{dst_image_path}\t{text}")
             img_in_subfolder += 1
 
+        for shard_reader, source_pairs in pairs.items():
+            self.partitioner.place_many(
+                source_pairs,
+                shard_reader=shard_reader,
+                desc=f"Partitioning {dir_name} data",
+            )
+
         labels_txt_path = os.path.join(set_dir, "labels.txt")
         FileProcessor.write_txt(txt_path=labels_txt_path, lines=lines, newline=True)
 
+        return paths
+
     def create_dataset(self, source: str, use_aug=False) -> None:
         assert source in self.sources, (
             f"Source of raw images must be one of {self.sources}."
@@ -168,10 +250,31 @@ class SimpleDatasetCreator(BaseDatasetCreator):
         train_anns_dict, val_anns_dict = self._partitionate_data(
             anns_dict=anns_dict, aug_anns_dict=aug_anns_dict
         )
-        for an_dict, set_dir in zip(
-            (train_anns_dict, val_anns_dict), self.dataset_dirs
+        splits = {"train": list(train_anns_dict), "val": list(val_anns_dict)}
+
+        # Changes since the last build, dataset paths of images are kept
+        old_paths = {}
+        if self.incremental:
+            manifest = DatasetPartitioner.read_manifest(self.manifest_path)
+            old_paths = manifest.get("paths", {})
+        _, removed = DatasetPartitioner.diff_splits(
+            {split: list(split_paths) for split, split_paths in old_paths.items()},
+            splits,
+        )
+
+        paths = {}
+        for split, an_dict, set_dir in zip(
+            ("train", "val"), (train_anns_dict, val_anns_dict), self.dataset_dirs
         ):
-            self._copy_data(anns_dict=an_dict, set_dir=set_dir)
+            paths[split] = self._copy_data(
+                anns_dict=an_dict,
+                set_dir=set_dir,
+                old_paths=old_paths.get(split, {}),
+                removed=removed[split],
+            )
+
+        # Manifest of splits is written last, after all files are placed
+        DatasetPartitioner.write_manifest(self.manifest_path, splits, paths=paths)
         self._create_charset()
 
 
@@ -191,8 +294,8 @@ class LMDBDatasetCreator(BaseDatasetCreator):
     def _calculate_map_size(self, data_list):
         total_size = 0
         for imagePath, _ in data_list:
-            if os.path.exists(imagePath):
-                total_size += os.path.getsize(imagePath)
+            if self._image_exists(imagePath):
+                total_size += self._get_image_size(imagePath)
         # Add 50% buffer and minimum 128MB to avoid map full error
         return max(int(total_size * 1.5), 128 * 1024 * 1024)
 
@@ -206,10 +309,9 @@ class LMDBDatasetCreator(BaseDatasetCreator):
             data_list, desc=f"Partitioning {os.path.basename(outputPath)} data"
         ):
             try:
-                with open(image_path, "rb") as f:
-                    image_bin = f.read()
-                    buf = io.BytesIO(image_bin)
-                    w, h = Image.open(buf).size
+                image_bin = self._read_image(image_path)
+                buf = io.BytesIO(image_bin)
+                w, h = Image.open(buf).size
                 if checkValid:
                     if not self._is_image_valid(image_bin):
                         print("%s is not a valid image" % image_path)
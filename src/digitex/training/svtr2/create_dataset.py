@@ -45,6 +45,22 @@ parser.add_argument(
     "--train_split", default=0.9, type=float, help="Split of training dataset."
 )
 
+# Get an arg for how files of splits are placed
+parser.add_argument(
+    "--partition_mode",
+    default="auto",
+    type=str,
+    choices=["auto", "hardlink", "reflink", "symlink", "copy"],
+    help="How files of splits are placed, 'auto' links them if possible.",
+)
+
+# Get an arg for incremental rebuilds
+parser.add_argument(
+    "--incremental",
+    action="store_true",
+    help="Whether to place only changes of splits into existing dataset.",
+)
+
 # Get an arg for word length
 parser.add_argument(
     "--max_text_length", default=25, type=int, help="Max length of word in dataset."
@@ -87,6 +103,8 @@ def main() -> None:
         dataset_dir=DATASET_DIR,
         train_split=args.train_split,
         max_text_length=args.max_text_length,
+        partition_mode=args.partition_mode,
+        incremental=args.incremental,
     )
     dataset_creator.create_dataset(source=args.source, use_aug=args.use_aug)
 
@@ -4,14 +4,19 @@ from PIL import Image
 import numpy as np
 import cv2
 
-from tqdm import tqdm
-
 import supervision as sv
 import albumentations as A
 
 from digitex.core.handlers.label import LabelHandler
+from digitex.core.handlers.names import NameAllocator
 from digitex.core.processors.file import FileProcessor
-from digitex.core.utils import get_random_img
+from digitex.core.processors.aug import AugPipeline, get_default_transforms
+from digitex.core.utils import (
+    get_random_img,
+    seed_everything,
+    iter_augment_progress,
+    run_augment_workers,
+)
 
 from .data import DatasetCreator
 from .converter import Converter
@@ -19,7 +24,13 @@ from .annotation import Keypoint, KeypointsObject
 
 
 class Augmenter:
-    def __init__(self, raw_dir: str, dataset_dir: str) -> None:
+    def __init__(
+        self,
+        raw_dir: str,
+        dataset_dir: str,
+        profile: bool = False,
+        time_budget: float | None = None,
+    ) -> None:
         # Paths
         self.raw_dir = raw_dir
         self.dataset_dir = dataset_dir
@@ -32,49 +43,28 @@ class Augmenter:
         self._transforms = None
         self._augmenter = None
 
+        # Profiling and time budget (seconds per sample) of AugPipeline
+        self.profile = profile
+        self.time_budget = time_budget
+
+        # Set in workers of multi-process augmentation
+        self.seed = None
+        self.worker_idx = None
+        self.progress_queue = None
+        self.name_allocator = None
+
         self.__id2label = None
         self.__label2id = None
 
     @property
-    def transforms(self) -> A.Compose:
+    def transforms(self) -> list[A.BasicTransform]:
         if self._transforms is None:
-            self._transforms = [
-                A.AdditiveNoise(p=0.3),
-                A.Downscale(scale_range=[0.4, 0.9], p=0.3),
-                A.RGBShift(p=0.3),
-                A.RingingOvershoot(p=0.3),
-                A.Spatter(mean=[0.5, 0.6], p=0.2),
-                A.ToGray(p=0.4),
-                A.ChannelShuffle(p=0.3),
-                A.Emboss(p=0.3),
-                A.GaussNoise(std_range=[0.05, 0.15], p=0.3),
-                A.HueSaturationValue(p=0.3),
-                A.MedianBlur(p=0.3),
-                A.PlanckianJitter(p=0.3),
-                A.RandomBrightnessContrast(p=0.3),
-                A.RandomShadow(shadow_intensity_range=[0.1, 0.4], p=0.3),
-                A.SaltAndPepper(amount=[0.01, 0.03], p=0.2),
-                A.GaussianBlur(blur_limit=6, p=0.3),
-                A.ISONoise(p=0.2),
-                A.MotionBlur(p=0.3),
-                A.PlasmaBrightnessContrast(p=0.3),
-                A.RandomFog(p=0.3),
-                A.Sharpen(p=0.4),
-                A.Blur(p=0.3),
-                A.Illumination(p=0.3),
-                A.CLAHE(p=0.3),
-                A.Posterize(p=0.3),
-                A.Affine(scale=[0.92, 1.08], fill=255, p=0.4),
-                A.CoarseDropout(fill=255, p=0.1),
-                A.Pad(padding=[15, 15], fill=255, p=0.4),
-                A.RandomScale(p=0.4),
-                A.SafeRotate(limit=(-3, 3), fill=255, p=0.4),
-            ]
+            self._transforms = get_default_transforms()
 
         return self._transforms
 
     @property
-    def augmenter(self) -> None:
+    def augmenter(self) -> AugPipeline:
         return self._augmenter
 
     @augmenter.setter
@@ -97,16 +87,12 @@ class Augmenter:
         return self.__label2id
 
     def find_name(self, img_name: str) -> str:
-        name = os.path.splitext(img_name)[0]
+        # Train dir is scanned once, next names come from counters
+        if self.name_allocator is None:
+            self.name_allocator = NameAllocator(self.train_dir, self.img_ext)
 
-        increment = 1
-        while True:
-            aug_name = f"{name}_aug_{increment}"
-            filename = f"{aug_name}{self.img_ext}"
-            filepath = os.path.join(self.train_dir, filename)
-            if not os.path.exists(filepath):
-                return aug_name
-            increment += 1
+        name = os.path.splitext(img_name)[0]
+        return self.name_allocator.allocate(name)
 
     def save_anns(self) -> None:
         pass
@@ -124,11 +110,114 @@ class Augmenter:
         self.save_image(name, img)
         self.save_anns(name, points_dict)
 
+    def _setup_shard(
+        self,
+        seed: int | None,
+        worker_idx: int | None,
+        name_counters: dict[str, int] | None = None,
+        num_workers: int = 1,
+    ) -> None:
+        # Transforms are rebuilt with seed of the shard
+        self.seed = seed
+        self.worker_idx = worker_idx
+        self._augmenter = None
+        seed_everything(seed)
+
+        # Workers reserve disjoint name numbers over counters scanned once
+        self.name_allocator = NameAllocator(
+            self.train_dir,
+            self.img_ext,
+            counters=name_counters,
+            worker_idx=worker_idx or 0,
+            num_workers=num_workers,
+        )
+
+    def _create_pipeline(self, keypoints: bool) -> AugPipeline:
+        return AugPipeline(
+            self.transforms,
+            keypoints=keypoints,
+            seed=self.seed,
+            profile=self.profile,
+            time_budget=self.time_budget,
+        )
+
+    def print_profile(self) -> None:
+        if self.profile and self._augmenter is not None:
+            self._augmenter.print_report()
+
+    def list_images(self) -> list[str]:
+        return sorted(
+            img_name
+            for img_name in os.listdir(self.train_dir)
+            if img_name.endswith(self.img_ext)
+        )
+
+    def _augment_shard(
+        self,
+        num_images: int,
+        seed: int | None = None,
+        worker_idx: int | None = None,
+        images_listdir: list[str] | None = None,
+        name_counters: dict[str, int] | None = None,
+        num_workers: int = 1,
+    ) -> int:
+        pass
+
+    def augment(
+        self, num_images: int, workers: int = 1, seed: int | None = None
+    ) -> None:
+        # Images and names are listed once, so workers don't see each other
+        images_listdir = self.list_images()
+        name_counters = NameAllocator.scan(self.train_dir, self.img_ext)
+
+        if workers == 1:
+            self._augment_shard(
+                num_images,
+                seed,
+                images_listdir=images_listdir,
+                name_counters=name_counters,
+            )
+            return
+
+        run_augment_workers(
+            self,
+            num_images,
+            workers,
+            seed,
+            images_listdir=images_listdir,
+            name_counters=name_counters,
+            num_workers=workers,
+        )
+
 
 class OBB_PolygonAugmenter(Augmenter):
-    def __init__(self, raw_dir: str, dataset_dir: str, anns_type: str) -> None:
-        super().__init__(raw_dir, dataset_dir)
+    def __init__(
+        self,
+        raw_dir: str,
+        dataset_dir: str,
+        anns_type: str,
+        aug_mode: str = "keypoints",
+        profile: bool = False,
+        time_budget: float | None = None,
+    ) -> None:
+        super().__init__(raw_dir, dataset_dir, profile, time_budget)
         self.anns_type = anns_type
+        self.augmenter_kwargs = {
+            "raw_dir": raw_dir,
+            "dataset_dir": dataset_dir,
+            "anns_type": anns_type,
+            "aug_mode": aug_mode,
+            "profile": profile,
+            "time_budget": time_budget,
+        }
+
+        # Polygon vertices go through transforms as keypoints or as masks
+        self.aug_modes = ["keypoints", "masks"]
+        if aug_mode not in self.aug_modes:
+            raise ValueError(f"aug_mode must be one of {self.aug_modes}.")
+
+        self.aug_mode = aug_mode
+        self._keypoints_augmenter = None
 
         self.preprocess_funcs = {
             "polygon": Converter.point_to_polygon,
@@ -148,11 +237,33 @@ class OBB_PolygonAugmenter(Augmenter):
         self.postprocess_func = self.postprocess_funcs[anns_type]
 
     @property
-    def augmenter(self) -> A.Compose:
+    def augmenter(self) -> AugPipeline:
         if self._augmenter is None:
-            augmenter = A.Compose(self.transforms)
+            self._augmenter = self._create_pipeline(keypoints=False)
+
+        return self._augmenter
 
-        return augmenter
+    def _setup_shard(
+        self,
+        seed: int | None,
+        worker_idx: int | None,
+        name_counters: dict[str, int] | None = None,
+        num_workers: int = 1,
+    ) -> None:
+        super()._setup_shard(seed, worker_idx, name_counters, num_workers)
+        self._keypoints_augmenter = None
+
+    @property
+    def keypoints_augmenter(self) -> AugPipeline:
+        if self._keypoints_augmenter is None:
+            self._keypoints_augmenter = self._create_pipeline(keypoints=True)
+
+        return self._keypoints_augmenter
+
+    def print_profile(self) -> None:
+        super().print_profile()
+        if self.profile and self._keypoints_augmenter is not None:
+            self._keypoints_augmenter.print_report()
 
     def save_anns(self, name: str, points_dict: dict[int, list]) -> None:
         filename = f"{name}{self.anns_ext}"
@@ -170,7 +281,7 @@ class OBB_PolygonAugmenter(Augmenter):
                     line = f"{class_idx} {pts}\n"
                     file.write(line)
 
-    def create_masks(
+    def create_polygons(
         self, img_name: str, img_width: int, img_height: int
     ) -> None | dict[int, list]:
         anns_name = os.path.splitext(img_name)[0] + ".txt"
@@ -181,20 +292,64 @@ class OBB_PolygonAugmenter(Augmenter):
         if not points_dict:
             return None
 
-        masks_dict = {key: [] for key in points_dict.keys()}
-
-        # Iterate through points, preprocess and convert to mask
+        # Iterate through points and preprocess them to absolute polygons
+        polygons_dict = {key: [] for key in points_dict.keys()}
         for class_idx, points in points_dict.items():
             for point in points:
                 polygon = self.preprocess_func(point, img_width, img_height)
+                polygons_dict[class_idx].append(polygon)
 
-                # Convert polygon to mask
-                mask = sv.polygon_to_mask(polygon, (img_width, img_height))
+        return polygons_dict
+
+    def create_masks(
+        self, img_name: str, img_width: int, img_height: int
+    ) -> None | dict[int, list]:
+        polygons_dict = self.create_polygons(img_name, img_width, img_height)
+
+        if polygons_dict is None:
+            return None
 
+        # Convert polygons to masks
+        masks_dict = {key: [] for key in polygons_dict.keys()}
+        for class_idx, polygons in polygons_dict.items():
+            for polygon in polygons:
+                mask = sv.polygon_to_mask(polygon, (img_width, img_height))
                 masks_dict[class_idx].append(mask)
 
         return masks_dict
 
+    @staticmethod
+    def clip_polygon(
+        polygon: np.ndarray, img_width: int, img_height: int
+    ) -> None | np.ndarray:
+        # Polygon inside image is kept as is
+        img_size = np.array((img_width, img_height))
+        if (polygon >= 0).all() and (polygon <= img_size).all():
+            return polygon
+
+        # Visible part is traced on mask cropped to object ROI, not whole image
+        x_min, y_min = np.clip(np.floor(polygon.min(axis=0)), 0, img_size).astype(int)
+        x_max, y_max = np.clip(np.ceil(polygon.max(axis=0)), 0, img_size).astype(int)
+        if x_max - x_min < 1 or y_max - y_min < 1:
+            return None
+
+        roi_polygon = polygon - np.array((x_min, y_min))
+        mask = sv.polygon_to_mask(roi_polygon, (x_max - x_min, y_max - y_min))
+        polygon = OBB_PolygonAugmenter.clip_polygon_from_mask(mask)
+        if polygon is None:
+            return None
+
+        return polygon + np.array((x_min, y_min))
+
+    @staticmethod
+    def clip_polygon_from_mask(mask: np.ndarray) -> None | np.ndarray:
+        # Largest contour of mask, None if object is out of image
+        polygons = sv.mask_to_polygons(mask.astype(bool))
+        if not polygons:
+            return None
+
+        return max(polygons, key=cv2.contourArea)
+
     def create_anns(
         self, masks_dict: dict[int, list], img_width: int, img_height: int
     ) -> None | dict[int, list]:
@@ -213,6 +368,67 @@ class OBB_PolygonAugmenter(Augmenter):
 
         return points_dict
 
+    def create_anns_from_polygons(
+        self, polygons_dict: dict[int, list], img_width: int, img_height: int
+    ) -> None | dict[int, list]:
+        if polygons_dict is None:
+            return None
+
+        points_dict = {key: [] for key in polygons_dict.keys()}
+        for class_idx, polygons in polygons_dict.items():
+            for polygon in polygons:
+                anns = self.postprocess_func(polygon, img_width, img_height)
+                points_dict[class_idx].append(anns)
+
+        return points_dict
+
+    def augment_img_polygons(
+        self, img: np.ndarray, polygons_dict: dict[int, list] = None
+    ) -> tuple[np.ndarray, None] | tuple[np.ndarray, dict[int, list]]:
+        # Case if no polygons_dict
+        if polygons_dict is None:
+            transf = self.augmenter(image=img)
+            transf_img = transf["image"]
+
+            return (transf_img, None)
+
+        # Vertices of all polygons are transformed as keypoints, their index
+        # goes in an extra column, which albumentations keeps
+        coords = []
+        for polygons in polygons_dict.values():
+            for polygon in polygons:
+                for vertex in polygon:
+                    coords.append((vertex[0], vertex[1], len(coords)))
+
+        transf = self.keypoints_augmenter(image=img, keypoints=coords)
+        transf_img = transf["image"]
+        transf_kps = np.asarray(transf["keypoints"], dtype=np.float32).reshape(-1, 3)
+        transf_height, transf_width = transf_img.shape[:2]
+
+        # Vertices removed by a transform (dropout holes) are matched back by
+        # index, so the same pass gives polygons of surviving vertices
+        transf_coords = np.full((len(coords), 2), np.nan, dtype=np.float32)
+        transf_coords[transf_kps[:, 2].astype(int)] = transf_kps[:, :2]
+
+        # Split vertices back to polygons, objects out of image are dropped
+        transf_polygons_dict = {key: [] for key in polygons_dict.keys()}
+        i = 0
+        for class_idx, polygons in polygons_dict.items():
+            for polygon in polygons:
+                transf_polygon = transf_coords[i : i + len(polygon)]
+                transf_polygon = transf_polygon[~np.isnan(transf_polygon[:, 0])]
+                i += len(polygon)
+                if len(transf_polygon) < 3:
+                    continue
+
+                transf_polygon = self.clip_polygon(
+                    transf_polygon, transf_width, transf_height
+                )
+                if transf_polygon is not None:
+                    transf_polygons_dict[class_idx].append(transf_polygon)
+
+        return transf_img, transf_polygons_dict
+
     def augment_img(
         self, img: np.ndarray, masks_dict: dict[int, list] = None
     ) -> tuple[np.ndarray, None] | tuple[np.ndarray, dict[int, list]]:
@@ -243,19 +459,40 @@ class OBB_PolygonAugmenter(Augmenter):
 
         return transf_img, transf_masks_dict
 
-    def augment(self, num_images: int) -> None:
-        images_listdir = [
-            img_name
-            for img_name in os.listdir(self.train_dir)
-            if img_name.endswith(".jpg")
-        ]
-
-        for _ in tqdm(range(num_images), desc="Augmenting images"):
+    def _augment_shard(
+        self,
+        num_images: int,
+        seed: int | None = None,
+        worker_idx: int | None = None,
+        images_listdir: list[str] | None = None,
+        name_counters: dict[str, int] | None = None,
+        num_workers: int = 1,
+    ) -> int:
+        self._setup_shard(seed, worker_idx, name_counters, num_workers)
+        images_listdir = images_listdir or self.list_images()
+
+        for _ in iter_augment_progress(num_images, self.progress_queue):
             # Get random img
             img_name, img = get_random_img(self.train_dir, images_listdir)
+            orig_height, orig_width = img.shape[:2]
+
+            if self.aug_mode == "keypoints":
+                polygons_dict = self.create_polygons(img_name, orig_width, orig_height)
+
+                # Augment
+                transf_img, transf_polygons_dict = self.augment_img_polygons(
+                    img, polygons_dict
+                )
+                transf_height, transf_width = transf_img.shape[:2]
+
+                # Create anns
+                transf_points_dict = self.create_anns_from_polygons(
+                    transf_polygons_dict, transf_width, transf_height
+                )
+                self.save(img_name, transf_img, transf_points_dict)
+                continue
 
             # Create masks
-            orig_height, orig_width = img.shape[:2]
             masks_dict = self.create_masks(img_name, orig_width, orig_height)
 
             # Augment
@@ -268,25 +505,40 @@ class OBB_PolygonAugmenter(Augmenter):
             )
             self.save(img_name, transf_img, transf_points_dict)
 
+        self.print_profile()
+
+        return num_images
+
 
 class KeypointAugmenter(Augmenter):
-    def __init__(self, raw_dir: str, dataset_dir: str, anns_type: str) -> None:
-        super().__init__(raw_dir, dataset_dir)
+    def __init__(
+        self,
+        raw_dir: str,
+        dataset_dir: str,
+        anns_type: str,
+        profile: bool = False,
+        time_budget: float | None = None,
+    ) -> None:
+        super().__init__(raw_dir, dataset_dir, profile, time_budget)
 
         self.anns_type = anns_type
+        self.augmenter_kwargs = {
+            "raw_dir": raw_dir,
+            "dataset_dir": dataset_dir,
+            "anns_type": anns_type,
+            "profile": profile,
+            "time_budget": time_budget,
+        }
 
         if anns_type != "keypoint":
             raise ValueError(f"anns_type must be 'keypoint'.")
 
     @property
-    def augmenter(self) -> A.Compose:
+    def augmenter(self) -> AugPipeline:
         if self._augmenter is None:
-            augmenter = A.Compose(
-                self.transforms,
-                keypoint_params=A.KeypointParams(format="xy", remove_invisible=False),
-            )
+            self._augmenter = self._create_pipeline(keypoints=True)
 
-        return augmenter
+        return self._augmenter
 
     def save_anns(self, name: str, kps_objs: list[KeypointsObject]) -> None:
         filename = f"{name}{self.anns_ext}"
@@ -428,14 +680,19 @@ class KeypointAugmenter(Augmenter):
 
         return transf_img, transf_coords
 
-    def augment(self, num_images) -> None:
-        images_listdir = [
-            img_name
-            for img_name in os.listdir(self.train_dir)
-            if img_name.endswith(".jpg")
-        ]
-
-        for _ in tqdm(range(num_images), desc="Augmenting images"):
+    def _augment_shard(
+        self,
+        num_images: int,
+        seed: int | None = None,
+        worker_idx: int | None = None,
+        images_listdir: list[str] | None = None,
+        name_counters: dict[str, int] | None = None,
+        num_workers: int = 1,
+    ) -> int:
+        self._setup_shard(seed, worker_idx, name_counters, num_workers)
+        images_listdir = images_listdir or self.list_images()
+
+        for _ in iter_augment_progress(num_images, self.progress_queue):
             # Get random img
             img_name, img = get_random_img(self.train_dir, images_listdir)
             orig_height, orig_width = img.shape[:2]
@@ -462,3 +719,7 @@ class KeypointAugmenter(Augmenter):
 
             # Save annotation
             self.save(img_name, transf_img, transf_abs_kps_objs)
+
+        self.print_profile()
+
+        return num_images
@@ -1,8 +1,9 @@
 from typing import LiteralString, List, Dict
 
 import os
-import shutil
-import random
+
+from digitex.core.handlers.shard import TarShardReader
+from digitex.core.partition import DatasetPartitioner, SplitAssigner
 
 from .annotation import AnnotationCreator
 
@@ -12,10 +13,16 @@ class DatasetCreator:
                  raw_dir,
                  dataset_dir,
                  num_keypoints=None,
-                 train_split=0.8) -> None:
+                 train_split=0.8,
+                 partition_mode="auto",
+                 incremental=False) -> None:
 
         self.raw_dir = raw_dir
         self.dataset_dir = dataset_dir
+        self.manifest_path = os.path.join(dataset_dir, "manifest.json")
+
+        # Only changes of splits are placed into existing dataset
+        self.incremental = incremental
 
         self.__images_path = None  # Raw images
         self.__labels_path = None  # Raw labels
@@ -25,6 +32,7 @@ class DatasetCreator:
         self.__test_dir = None
 
         self.__images_labels_dict = None
+        self.__shard_reader = None
         self.__classes_path = None
         self.__data_yaml_path = None
 
@@ -38,6 +46,12 @@ class DatasetCreator:
         self.train_split = train_split
         self.val_split = 0.6 * (1 - self.train_split)
         self.test_split = 1 - self.train_split - self.val_split
+        self.split_assigner = SplitAssigner({"train": self.train_split,
+                                             "val": self.val_split,
+                                             "test": self.test_split})
+
+        # Files of splits are linked to raw files if possible
+        self.partitioner = DatasetPartitioner(mode=partition_mode)
 
         self.anns_creator = AnnotationCreator(raw_dir=raw_dir,
                                               id2label=self.id2label,
@@ -60,6 +74,16 @@ class DatasetCreator:
 
         return self.__labels_path
 
+    @property
+    def shard_reader(self) -> TarShardReader | None:
+        '''
+        Reader of raw images if they are stored in tar shards
+        '''
+        if self.__shard_reader is None and TarShardReader.is_sharded(self.images_path):
+            self.__shard_reader = TarShardReader(self.images_path)
+
+        return self.__shard_reader
+
     @property
     def train_dir(self) -> LiteralString | str:
         if self.__train_dir is None:
@@ -132,29 +156,30 @@ class DatasetCreator:
 
         return self.__images_labels_dict
 
-    def __create_images_labels_dict(self, shuffle=True) -> Dict[str, str]:
-        # List of all images and labels in directory
-        images = os.listdir(self.images_path)
+    def __create_images_labels_dict(self) -> Dict[str, str]:
+        # List of all images and labels in directory or shards
+        if self.shard_reader is not None:
+            images = self.shard_reader.listdir()
+        else:
+            images = os.listdir(self.images_path)
         labels = os.listdir(self.labels_path)
 
         # Create a dictionary to store the images and labels names
         images_labels = {}
         for image in images:
-            label = image.rstrip('.jpg') + '.txt'
+            label = DatasetCreator.get_label_name(image)
 
             if label in labels:
                 images_labels[image] = label
             else:
                 images_labels[image] = None
 
-        if shuffle:
-            # Shuffle the data
-            keys = list(images_labels.keys())
-            random.shuffle(keys)
-            images_labels = {key: images_labels[key] for key in keys}
-
         return images_labels
 
+    @staticmethod
+    def get_label_name(image) -> str:
+        return image.rstrip('.jpg') + '.txt'
+
     @staticmethod
     def read_classes_file(classes_path) -> List[str]:
         with open(classes_path, 'r') as classes_file:
@@ -182,55 +207,55 @@ class DatasetCreator:
             if anns_type == "keypoint":
                 yaml_file.write(f"kpt_shape: [{self.num_keypoints}, 3]")
 
-    @staticmethod
-    def copy_files_from_dict(key,
-                             value,
-                             images_path,
-                             labels_path,
-                             copy_to) -> None:
-
-        shutil.copyfile(os.path.join(images_path, key),
-                        os.path.join(copy_to, key))
-        if value is not None:
-            shutil.copyfile(os.path.join(labels_path, value),
-                            os.path.join(copy_to, value))
-
     def partitionate_data(self):
         # Dict with images and labels
         data = self.images_labels_dict
 
-        # Create the train, validation, and test datasets
-        num_train = int(len(data) * self.train_split)
-        num_val = int(len(data) * self.val_split)
-        num_test = int(len(data) * self.test_split)
-
-        train_data = {key: data[key] for key in list(data.keys())[:num_train]}
-        val_data = {key: data[key] for key in list(
-            data.keys())[num_train:num_train+num_val]}
-        test_data = {key: data[key] for key in list(
-            data.keys())[num_train+num_val:num_train+num_val+num_test]}
-
-        # Copy the images and labels to the train, validation, and test folders
-        for key, value in train_data.items():
-            DatasetCreator.copy_files_from_dict(key=key,
-                                                value=value,
-                                                images_path=self.images_path,
-                                                labels_path=self.labels_path,
-                                                copy_to=self.train_dir)
-
-        for key, value in val_data.items():
-            DatasetCreator.copy_files_from_dict(key=key,
-                                                value=value,
-                                                images_path=self.images_path,
-                                                labels_path=self.labels_path,
-                                                copy_to=self.val_dir)
-
-        for key, value in test_data.items():
-            DatasetCreator.copy_files_from_dict(key=key,
-                                                value=value,
-                                                images_path=self.images_path,
-                                                labels_path=self.labels_path,
-                                                copy_to=self.test_dir)
+        # Stable train, validation, and test datasets from hashes of image names
+        splits = self.split_assigner.split(sorted(data))
+        split_dirs = {"train": self.train_dir,
+                      "val": self.val_dir,
+                      "test": self.test_dir}
+
+        # Changes since the last build, everything for a new dataset
+        old_splits = {}
+        if self.incremental:
+            old_splits = DatasetPartitioner.read_manifest(
+                self.manifest_path).get("splits", {})
+        else:
+            # Files of an earlier build may belong to other splits now
+            for split_dir in split_dirs.values():
+                self.partitioner.remove_many(
+                    [os.path.join(split_dir, name) for name in os.listdir(split_dir)])
+        added, removed = DatasetPartitioner.diff_splits(old_splits, splits)
+
+        # Link or copy the images and labels to the split folders
+        for split, split_dir in split_dirs.items():
+            # Labels are small and can be edited, so all of them are placed again
+            self.partitioner.remove_many(
+                [os.path.join(split_dir, key) for key in removed[split]] +
+                [os.path.join(split_dir, DatasetCreator.get_label_name(key))
+                 for key in removed[split] + splits[split]])
+
+            if self.shard_reader is not None:
+                images_pairs = [(key, os.path.join(split_dir, key))
+                                for key in added[split]]
+            else:
+                images_pairs = [(os.path.join(self.images_path, key),
+                                 os.path.join(split_dir, key))
+                                for key in added[split]]
+            labels_pairs = [(os.path.join(self.labels_path, data[key]),
+                             os.path.join(split_dir, data[key]))
+                            for key in splits[split] if data[key] is not None]
+
+            self.partitioner.place_many(images_pairs,
+                                        shard_reader=self.shard_reader,
+                                        desc=f"Partitioning {split} images")
+            self.partitioner.place_many(labels_pairs,
+                                        desc=f"Partitioning {split} labels")
+
+        # Manifest of splits is written last, after all files are placed
+        DatasetPartitioner.write_manifest(self.manifest_path, splits)
 
     def create(self, anns_type: str) -> None:
         # Check if annotation type is supported
@@ -28,14 +28,56 @@ parser.add_argument(
     "--num_keypoints", default=30, type=int, help="Number of keypoints per object."
 )
 
+parser.add_argument(
+    "--partition_mode",
+    default="auto",
+    type=str,
+    choices=["auto", "hardlink", "reflink", "symlink", "copy"],
+    help="How files of splits are placed, 'auto' links them if possible.",
+)
+
+parser.add_argument(
+    "--incremental",
+    action="store_true",
+    help="Whether to place only changes of splits into existing dataset.",
+)
+
 parser.add_argument(
     "--augment", action="store_true", help="Whether to augment train data."
 )
 
+parser.add_argument(
+    "--aug_mode",
+    default="keypoints",
+    type=str,
+    help="How obb and polygon anns are augmented, one of ['keypoints', 'masks']",
+)
+
 parser.add_argument(
     "--aug_images", default=100, type=int, help="How many augmented images to create."
 )
 
+parser.add_argument(
+    "--aug_workers", default=1, type=int, help="Processes to augment images with."
+)
+
+parser.add_argument(
+    "--aug_seed", default=None, type=int, help="Seed of augmentation, per worker."
+)
+
+parser.add_argument(
+    "--aug_profile",
+    action="store_true",
+    help="Whether to print time and hit rate of every transform.",
+)
+
+parser.add_argument(
+    "--aug_time_budget",
+    default=None,
+    type=float,
+    help="Seconds of transforms per image, costly transforms are cut to fit.",
+)
+
 parser.add_argument(
     "--visualize", action="store_true", help="Whether to visualize data."
 )
@@ -50,10 +92,17 @@ args = parser.parse_args()
 # Setup hyperparameters
 DATA_SUBDIR = args.data_subdir
 TRAIN_SPLIT = args.train_split
+PARTITION_MODE = args.partition_mode
+INCREMENTAL = args.incremental
 ANNS_TYPE = args.anns_type
 NUM_KEYPOINTS = args.num_keypoints
 AUGMENT = args.augment
+AUG_MODE = args.aug_mode
 AUG_IMAGES = args.aug_images
+AUG_WORKERS = args.aug_workers
+AUG_SEED = args.aug_seed
+AUG_PROFILE = args.aug_profile
+AUG_TIME_BUDGET = args.aug_time_budget
 VISUALIZE = args.visualize
 VIS_IMAGES = args.vis_images
 
@@ -71,6 +120,8 @@ def main() -> None:
         dataset_dir=DATASET_DIR,
         num_keypoints=NUM_KEYPOINTS,
         train_split=TRAIN_SPLIT,
+        partition_mode=PARTITION_MODE,
+        incremental=INCREMENTAL,
     )
     dataset_creator.create(anns_type=ANNS_TYPE)
 
@@ -78,13 +129,22 @@ def main() -> None:
     if AUGMENT:
         if ANNS_TYPE in ["obb", "polygon"]:
             augmenter = OBB_PolygonAugmenter(
-                raw_dir=RAW_DIR, dataset_dir=DATASET_DIR, anns_type=ANNS_TYPE
+                raw_dir=RAW_DIR,
+                dataset_dir=DATASET_DIR,
+                anns_type=ANNS_TYPE,
+                aug_mode=AUG_MODE,
+                profile=AUG_PROFILE,
+                time_budget=AUG_TIME_BUDGET,
             )
         elif ANNS_TYPE == "keypoint":
             augmenter = KeypointAugmenter(
-                raw_dir=RAW_DIR, dataset_dir=DATASET_DIR, anns_type=ANNS_TYPE
+                raw_dir=RAW_DIR,
+                dataset_dir=DATASET_DIR,
+                anns_type=ANNS_TYPE,
+                profile=AUG_PROFILE,
+                time_budget=AUG_TIME_BUDGET,
             )
-        augmenter.augment(num_images=AUG_IMAGES)
+        augmenter.augment(num_images=AUG_IMAGES, workers=AUG_WORKERS, seed=AUG_SEED)
 
     # Visualize dataset
     if VISUALIZE: